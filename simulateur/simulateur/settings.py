@@ -161,6 +161,8 @@ else:  # Default to sqlite
             }
         }
     }
+    # SQLite has no covering indexes: the included columns of the price history index are dropped
+    SILENCED_SYSTEM_CHECKS = ["models.W040"]
 
 # Static and media files configuration
 STATIC_URL = config("STATIC_URL", default='/static/')
@@ -417,6 +419,36 @@ CACHES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Simulation engine settings
+PRICE_WRITER_FLUSH_TICKS = config("PRICE_WRITER_FLUSH_TICKS", cast=int, default=10)
+PRICE_WRITER_FLUSH_INTERVAL_MS = config("PRICE_WRITER_FLUSH_INTERVAL_MS", cast=int, default=500)
+PRICE_WRITER_MAX_PENDING_TICKS = config("PRICE_WRITER_MAX_PENDING_TICKS", cast=int, default=1000)
+PRICE_WRITER_BATCH_SIZE = config("PRICE_WRITER_BATCH_SIZE", cast=int, default=1000)
+PRICE_WRITER_MAX_RETRIES = config("PRICE_WRITER_MAX_RETRIES", cast=int, default=5)
+PRICE_WRITER_RETRY_BACKOFF_MS = config("PRICE_WRITER_RETRY_BACKOFF_MS", cast=int, default=100)  # doubled on each retry
+SIMULATION_TICK_POLICY = config("SIMULATION_TICK_POLICY", default="skip")  # "skip" or "catch_up"
+SIMULATION_MAX_CATCH_UP_TICKS = config("SIMULATION_MAX_CATCH_UP_TICKS", cast=int, default=10)
+SIMULATION_LATENESS_HISTORY = config("SIMULATION_LATENESS_HISTORY", cast=int, default=1000)
+SIMULATION_CONTROL_FALLBACK_POLL = config("SIMULATION_CONTROL_FALLBACK_POLL", cast=int, default=60)  # seconds
+SIMULATION_WORKER_MAX_RESTARTS = config("SIMULATION_WORKER_MAX_RESTARTS", cast=int, default=5)
+SIMULATION_WORKER_STOP_TIMEOUT = config("SIMULATION_WORKER_STOP_TIMEOUT", cast=int, default=10)  # seconds
+ORDER_GATEWAY_MAX_PENDING = config("ORDER_GATEWAY_MAX_PENDING", cast=int, default=10000)
+ORDER_GATEWAY_LEDGER_RESYNC_EVERY = config("ORDER_GATEWAY_LEDGER_RESYNC_EVERY", cast=int, default=100)  # drains
+ORDER_JOURNAL_DIR = config("ORDER_JOURNAL_DIR", default="")  # empty disables the order journal
+ORDER_JOURNAL_SEGMENT_SIZE = config("ORDER_JOURNAL_SEGMENT_SIZE", cast=int, default=64 * 1024 * 1024)  # bytes
+ORDER_JOURNAL_SNAPSHOT_EVERY = config("ORDER_JOURNAL_SNAPSHOT_EVERY", cast=int, default=100000)  # records
+MARKET_MAKER_ENABLED = config("MARKET_MAKER_ENABLED", cast=bool, default=True)
+MARKET_MAKER_USERNAME = config("MARKET_MAKER_USERNAME", default="market-maker")
+MARKET_MAKER_QUOTE_SIZE = config("MARKET_MAKER_QUOTE_SIZE", cast=int, default=10)  # shares per side
+MARKET_MAKER_MAX_INVENTORY = config("MARKET_MAKER_MAX_INVENTORY", cast=int, default=1000)  # shares per stock
+MARKET_MAKER_CAPITAL = config("MARKET_MAKER_CAPITAL", cast=float, default=1000000)  # cash for bids
+MARKET_MAKER_VOLATILITY_WINDOW = config("MARKET_MAKER_VOLATILITY_WINDOW", cast=int, default=20)  # ticks
+ORDER_BOOK_DEPTH_LEVELS = config("ORDER_BOOK_DEPTH_LEVELS", cast=int, default=10)  # price levels per side
+ORDER_BOOK_DEPTH_INTERVAL_MS = config("ORDER_BOOK_DEPTH_INTERVAL_MS", cast=int, default=250)
+PRICE_HISTORY_MAX_POINTS = config("PRICE_HISTORY_MAX_POINTS", cast=int, default=1000)  # candles per chart series
+PRICE_HISTORY_ARCHIVE_DIR = config("PRICE_HISTORY_ARCHIVE_DIR", default=os.path.join(BASE_DIR, "price_history_archive"))
+PRICE_HISTORY_EXPORT_DIR = config("PRICE_HISTORY_EXPORT_DIR", default=os.path.join(BASE_DIR, "price_history_export"))
+
 
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
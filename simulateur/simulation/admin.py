@@ -14,8 +14,11 @@ from .models import (
     StockPortfolio,
     News,
     Order,
+    OrderRequest,
     JoinLink,
     StockPriceHistory,
+    StockPriceRollup,
+    StockQuote,
     SimulationManager,
 )
 
@@ -32,6 +35,9 @@ admin.site.register(Trigger)
 admin.site.register(StockPortfolio)
 admin.site.register(News)
 admin.site.register(Order)
+admin.site.register(OrderRequest)
 admin.site.register(JoinLink)
 admin.site.register(StockPriceHistory)
+admin.site.register(StockPriceRollup)
+admin.site.register(StockQuote)
 admin.site.register(SimulationManager)
@@ -4,18 +4,38 @@ from collections import defaultdict
 from decimal import Decimal
 
 from django.contrib.auth.decorators import login_required
-from django.db import transaction
-from django.db.models import Sum, Q
+from django.db.models import OuterRef, Q, Sum
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views import View
-from simulation.logic.BuySellQueue import buy_sell_queue
+from simulation.logic.ledger import OrderRejected
+from simulation.logic.order_book import BUY, SELL
+from simulation.logic.order_gateway import order_gateway
+from simulation.logic.settlement import Execution, execute_trade
 from simulation.models import Portfolio, Stock, Order, TransactionHistory, SimulationManager, StockPriceHistory, \
-    StockPortfolio
+    StockPortfolio, StockQuote
 from simulation.serializers import PortfolioSerializer
 from simulation.models import UserProfile, Team
 
 
+def submit_order(side, user_profile, stock, amount, price, simulation_manager):
+    """Hand a dynamic-trading order to the gateway and acknowledge it once it is queued for the engine."""
+    try:
+        order_request = order_gateway.submit(side, user_profile, stock, amount, float(price), simulation_manager)
+    except OrderRejected as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'accepted', 'order_id': order_request.id})
+
+
+def execute_order(side, user_profile, stock, amount, price, simulation_manager, price_history=None):
+    """Execute a static-trading order right away, checked against the user's locked portfolio."""
+    try:
+        order = execute_trade(Execution(side, user_profile, stock, amount, price, simulation_manager, price_history))
+    except OrderRejected as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'order_id': order.id})
+
+
 class PortfolioView(View):
     @method_decorator(login_required)
     def get(self, request, user_id):
@@ -38,7 +58,7 @@ class BuyStock(View):
             amount = int(data['amount'])
 
             # Get the latest price from StockPriceHistory
-            latest_price_history = StockPriceHistory.objects.filter(stock=stock).order_by('-timestamp').first()
+            latest_price_history = StockPriceHistory.latest(simulation_manager, stock)
             if not latest_price_history:
                 return JsonResponse({'status': 'error', 'message': 'No price history available for this stock'},
                                     status=404)
@@ -52,46 +72,10 @@ class BuyStock(View):
             if amount <= 0:
                 return JsonResponse({'status': 'error', 'message': 'Amount must be greater than zero'}, status=400)
 
-            total_cost = amount * price
-            user_portfolio = Portfolio.objects.get_or_create(owner=user_profile,simulation_manager=simulation_manager)[0]
-            if user_portfolio.balance < total_cost:
-                return JsonResponse({'status': 'error', 'message': 'Insufficient funds'}, status=400)
-
-            with transaction.atomic():
-                # Create an order
-                order = Order.objects.create(
-                    user=user_profile,
-                    stock=stock,
-                    quantity=amount,
-                    price=price,
-                    transaction_type='BUY'
-                )
-
-                # Logic to buy stock
-                buy_sell_queue.add_to_buy_queue(user_profile, stock, amount, price, simulation_manager)
-
-                # Deduct the amount from the user's 
-               
-                user_portfolio.balance -= total_cost
-                user_portfolio.save()
-
-                # Add the stock to the StockPortfolio or update the existing quantity
-                stock_portfolio, created = StockPortfolio.objects.get_or_create(
-                    portfolio=user_portfolio,
-                    stock=stock,
-                    defaults={'quantity': amount, 'latest_price_history': latest_price_history}
-                )
-
-                if not created:
-                    stock_portfolio.quantity += amount
-                    stock_portfolio.latest_price_history = latest_price_history  # Update the latest price history
-                    stock_portfolio.save()
-
-                # Retrieve the transaction history record and add the order
-                transaction_history = TransactionHistory.objects.get(simulation_manager=simulation_manager)
-                transaction_history.orders.add(order)
-
-            return JsonResponse({'status': 'success', 'order_id': order.id})
+            if simulation_manager.simulation_settings.stock_trading_logic == "dynamic":
+                return submit_order(BUY, user_profile, stock, amount, price, simulation_manager)
+
+            return execute_order(BUY, user_profile, stock, amount, price, simulation_manager, latest_price_history)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON data'}, status=400)
         except Stock.DoesNotExist:
@@ -115,46 +99,17 @@ class SellStock(View):
             if amount <= 0:
                 return JsonResponse({'status': 'error', 'message': 'Amount must be greater than zero'}, status=400)
 
-            portfolio = Portfolio.objects.filter(owner=user_profile, simulation_manager=simulation_manager).first()
-            if not portfolio:
-                return JsonResponse({'status': 'error', 'message': 'Portfolio not found for this simulation manager'},
-                                    status=404)
-
-            stock_portfolio = StockPortfolio.objects.filter(portfolio=portfolio, stock=stock).first()
-            if not stock_portfolio or stock_portfolio.quantity < amount:
-                return JsonResponse({'status': 'error', 'message': 'Insufficient stock holdings'}, status=400)
-
-            latest_price_history = StockPriceHistory.objects.filter(stock=stock).order_by('-timestamp').first()
+            latest_price_history = StockPriceHistory.latest(simulation_manager, stock)
             if not latest_price_history:
                 return JsonResponse({'status': 'error', 'message': 'No price history available for this stock'},
                                     status=404)
 
             price = Decimal(data.get('price', latest_price_history.close_price))
 
-            with transaction.atomic():
-                order = Order.objects.create(
-                    user=user_profile,
-                    stock=stock,
-                    quantity=amount,
-                    price=price,
-                    transaction_type='SELL'
-                )
-
-                buy_sell_queue.add_to_sell_queue(user_profile, stock, amount, price, simulation_manager)
-
-                portfolio.balance += amount * price
-                portfolio.save()
+            if simulation_manager.simulation_settings.stock_trading_logic == "dynamic":
+                return submit_order(SELL, user_profile, stock, amount, price, simulation_manager)
 
-                stock_portfolio.quantity -= amount
-                stock_portfolio.save()
-
-                if stock_portfolio.quantity == 0:
-                    stock_portfolio.delete()
-
-                transaction_history = TransactionHistory.objects.get(simulation_manager=simulation_manager)
-                transaction_history.orders.add(order)
-
-            return JsonResponse({'status': 'success', 'order_id': order.id})
+            return execute_order(SELL, user_profile, stock, amount, price, simulation_manager)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON data'}, status=400)
         except Stock.DoesNotExist:
@@ -165,15 +120,30 @@ class SellStock(View):
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
+class CancelOrder(View):
+    @method_decorator(login_required)
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            order_request = order_gateway.request_cancel(request.user.userprofile, int(data['order_id']))
+            return JsonResponse({'status': order_request.status, 'order_id': order_request.id})
+        except OrderRejected as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return JsonResponse({'status': 'error', 'message': 'Invalid JSON data'}, status=400)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
 class StockPrice(View):
     def get(self, request, stock_id):
         try:
-            simulation_manager_id = request.GET.get('simulation_manager_id', 1)
+            simulation_manager = SimulationManager.objects.get(id=request.GET.get('simulation_manager_id', 1))
             # Fetch the stock based on ID
-            stock = SimulationManager.objects.get(id=simulation_manager_id).stocks.get(id=stock_id)
+            stock = simulation_manager.stocks.select_related('company').get(id=stock_id)
 
             # Get the latest price history for the stock
-            latest_price_history = StockPriceHistory.objects.filter(stock=stock).order_by('-timestamp').first()
+            latest_price_history = StockPriceHistory.latest(simulation_manager, stock)
             if not latest_price_history:
                 return JsonResponse({
                     'status': 'error',
@@ -220,8 +190,10 @@ class StockHoldings(View):
                 return JsonResponse({'status': 'error', 'message': 'Portfolio not found for this simulation manager'},
                                     status=404)
 
-            # Get all stock portfolios related to this portfolio
-            stock_portfolios = StockPortfolio.objects.filter(portfolio=portfolio)
+            # Get all stock portfolios related to this portfolio, with the latest close of each stock
+            stock_portfolios = StockPortfolio.objects.filter(portfolio=portfolio).select_related(
+                'stock__company', 'latest_price_history'
+            ).annotate(latest_close=StockQuote.latest_close(simulation_manager, OuterRef('stock_id')))
 
             holdings_data = []
 
@@ -229,9 +201,7 @@ class StockHoldings(View):
             for stock_portfolio in stock_portfolios:
                 stock = stock_portfolio.stock
 
-                # Get the latest price history
-                latest_price_history = StockPriceHistory.objects.filter(stock=stock).order_by('-timestamp').first()
-                latest_price = latest_price_history.close_price if latest_price_history else None
+                latest_price = stock_portfolio.latest_close
 
                 # Calculate the price when bought (initial price)
                 initial_price = stock_portfolio.latest_price_history.close_price if stock_portfolio.latest_price_history else None
@@ -1,10 +1,13 @@
+import os
 from datetime import timezone
 
 from rest_framework import status
 from django.utils import timezone
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from simulation.logic.columnar import CONTENT_TYPES, FORMATS, PARQUET_FORMAT, TABLES, export_path, pa, stream_table
 from simulation.models import SimulationManager, Scenario, Stock, Team, Event, Trigger, News, SimulationSettings
 from simulation.serializers import SimulationSettingsSerializer
 
@@ -183,6 +186,31 @@ class SimulationManagerNews(APIView):
         news_data = [{'id': news_item.id, 'title': news_item.title} for news_item in news]
         return Response({'status': 'success', 'data': news_data}, status=status.HTTP_200_OK)
 
+class SimulationManagerHistoryExport(APIView):
+    def get(self, request, simulation_manager_id, table, *args, **kwargs):
+        simulation_manager = get_object_or_404(SimulationManager, id=simulation_manager_id)
+        # Not ``format``, which DRF reserves for the renderer of JSON responses
+        file_format = request.query_params.get('file_format', PARQUET_FORMAT)
+        if table not in TABLES or file_format not in FORMATS:
+            return Response(
+                {'status': 'error', 'message': f'Export one of {", ".join(TABLES)} as {" or ".join(FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if pa is None:
+            return Response(
+                {'status': 'error', 'message': 'Parquet and Arrow exports are not available on this server.'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+
+        # Streamed one chunk of rows at a time, so large runs neither buffer in memory nor time out
+        response = StreamingHttpResponse(
+            stream_table(simulation_manager.id, table, file_format), content_type=CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{os.path.basename(export_path(simulation_manager.id, table, file_format))}"'
+        )
+        return response
+
 class ChangeSimulationManagerState(APIView):
     def post(self, request, simulation_manager_id, *args, **kwargs):
         simulation_manager = get_object_or_404(SimulationManager, id=simulation_manager_id)
@@ -1,8 +1,11 @@
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from simulation.models import Stock, StockPriceHistory, Company, SimulationManager
+from simulation.logic.rollups import get_candles, parse_resolution
+from simulation.models import Stock, Company, SimulationManager
 
 
 class StockManagement(APIView):
@@ -116,15 +119,26 @@ class StockPriceHistoryView(APIView):
             return Response({'status': 'error', 'message': 'Simulation manager ID is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
         simulation_manager = get_object_or_404(SimulationManager, id=simulation_manager_id)
-        stock = get_object_or_404(Stock, id=stock_id, company__simulation_manager=simulation_manager)
-
-        price_histories = StockPriceHistory.objects.filter(stock=stock).order_by('timestamp')
-        price_history_data = [{
-            'timestamp': price_history.timestamp,
-            'open_price': price_history.open_price,
-            'high_price': price_history.high_price,
-            'low_price': price_history.low_price,
-            'close_price': price_history.close_price
-        } for price_history in price_histories]
-
-        return Response({'status': 'success', 'data': price_history_data}, status=status.HTTP_200_OK)
\ No newline at end of file
+        stock = get_object_or_404(Stock, id=stock_id, scenarios_stocks=simulation_manager)
+
+        # Optional ISO 8601 range; the resolution is picked from the range unless one is requested
+        try:
+            start, end = (
+                self.parse_timestamp(request.query_params.get(name)) for name in ('start', 'end')
+            )
+            resolution = parse_resolution(request.query_params.get('resolution'))
+        except ValueError as e:
+            return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        price_history_data = get_candles(stock, start, end, resolution, simulation_manager)
+
+        return Response({'status': 'success', 'data': price_history_data}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def parse_timestamp(value):
+        if not value:
+            return None
+        timestamp = parse_datetime(value)
+        if timestamp is None:
+            raise ValueError(f"Invalid timestamp: {value}")
+        return timezone.make_aware(timestamp) if timezone.is_naive(timestamp) else timestamp
\ No newline at end of file
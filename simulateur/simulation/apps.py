@@ -6,4 +6,5 @@ class SimulationConfig(AppConfig):
     name = "simulation"
 
     def ready(self):
-        pass
+        # Connect the receivers that push state and settings changes to running engines
+        from simulation.logic import control  # noqa: F401
@@ -1,6 +1,8 @@
 import json
 import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
+from simulation.channels.encoding import StockFrameEncoder, JSON_FORMAT
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +11,12 @@ class SimulationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = f'simulation_{self.room_name}'
+        # Tickers this socket receives stock updates for, None means every ticker of the simulation
+        self.tickers = None
+        self.excluded_tickers = set()
+        # Wire format of stock updates, opted into with ?format=delta or ?format=msgpack
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.encoder = StockFrameEncoder(query.get('format', [JSON_FORMAT])[0])
 
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -16,6 +24,8 @@ class SimulationConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
+        if self.encoder.compact:
+            await self.send(text_data=json.dumps(self.encoder.schema()))
         logger.debug(f"WebSocket connection established for room {self.room_group_name}")
 
     async def disconnect(self, close_code):
@@ -38,6 +48,8 @@ class SimulationConsumer(AsyncWebsocketConsumer):
 
             message_handlers = {
                 'stock': self.stock_update,
+                'subscribe': self.handle_subscribe,
+                'unsubscribe': self.handle_unsubscribe,
                 'news': self.handle_news,
                 'trigger': self.handle_trigger,
                 'event': self.handle_event,
@@ -55,12 +67,74 @@ class SimulationConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error handling message: {e}")
 
+    def is_subscribed(self, ticker):
+        if ticker in self.excluded_tickers:
+            return False
+        return self.tickers is None or ticker in self.tickers
+
+    async def handle_subscribe(self, data):
+        # The first subscription narrows the stream to the given tickers, without tickers it
+        # goes back to receiving every ticker
+        tickers = data.get('tickers')
+        if tickers is None:
+            self.tickers = None
+            self.excluded_tickers = set()
+        else:
+            self.tickers = (self.tickers or set()) | set(tickers)
+            self.excluded_tickers -= set(tickers)
+        await self.send_subscription()
+
+    async def handle_unsubscribe(self, data):
+        # Unsubscribing without tickers stops all stock updates
+        tickers = data.get('tickers')
+        if tickers is None:
+            self.tickers = set()
+            self.excluded_tickers = set()
+        elif self.tickers is None:
+            self.excluded_tickers |= set(tickers)
+        else:
+            self.tickers -= set(tickers)
+        await self.send_subscription()
+
+    async def send_subscription(self):
+        await self.send(text_data=json.dumps({
+            'type': 'subscription',
+            'tickers': None if self.tickers is None else sorted(self.tickers),
+            'excluded': sorted(self.excluded_tickers)
+        }))
+
+    async def send_stocks(self, stocks):
+        text_frames, bytes_frames = self.encoder.encode(stocks)
+        for frame in text_frames:
+            await self.send(text_data=frame)
+        for frame in bytes_frames:
+            await self.send(bytes_data=frame)
+
     # Add this method to handle "stock" messages
     async def stock_update(self, event):
         data = event['message']
-        await self.send(text_data=json.dumps(data))
+        if not self.is_subscribed(data.get('ticker')):
+            return
+        await self.send_stocks([data])
         logger.debug(f"Sent stock update in room {self.room_group_name}: {data}")
 
+    async def stock_snapshot(self, event):
+        # One channel layer message per tick, unpacked into the usual per-stock frames
+        stocks = [data for data in event['message']['stocks'] if self.is_subscribed(data['ticker'])]
+        await self.send_stocks(stocks)
+        logger.debug(f"Sent stock snapshot of {len(stocks)} stocks in room {self.room_group_name}")
+
+    async def depth_update(self, event):
+        books = [book for book in event['message']['books'] if self.is_subscribed(book['ticker'])]
+        if not books:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'depth',
+            'timestamp': event['message']['timestamp'],
+            'books': books
+        }))
+        logger.debug(f"Sent depth of {len(books)} books in room {self.room_group_name}")
+
     async def handle_news(self, data):
         news_message = data.get('message', 'No news message provided')
         await self.channel_layer.group_send(
@@ -0,0 +1,76 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack ships with channels-redis
+    msgpack = None
+
+JSON_FORMAT = "json"
+DELTA_FORMAT = "delta"
+MSGPACK_FORMAT = "msgpack"
+FORMATS = (JSON_FORMAT, DELTA_FORMAT, MSGPACK_FORMAT)
+
+# Order of the fields in compact frames, announced to the client in the schema handshake
+STOCK_FIELDS = (
+    "simulation_manager", "ticker", "name", "type", "open", "high", "low", "close", "current", "timestamp"
+)
+
+
+def negotiate_format(requested):
+    """Return the wire format to use for a requested one, falling back to what is available."""
+    if requested not in FORMATS:
+        return JSON_FORMAT
+    if requested == MSGPACK_FORMAT and msgpack is None:
+        return DELTA_FORMAT
+    return requested
+
+
+class StockFrameEncoder:
+    """
+    Per-connection encoder of stock updates.
+
+    The ``json`` format sends one JSON object per stock, as before. The compact formats send
+    one frame per batch of updates, a list with one entry per stock:
+    ``[id, field_index, value, field_index, value, ...]`` where only the fields that changed
+    since the last frame sent on the connection are present (a stock seen for the first time
+    carries every field). Field indices refer to ``STOCK_FIELDS``. ``delta`` frames are JSON
+    text, ``msgpack`` frames are the same lists packed as MessagePack binary.
+    """
+
+    def __init__(self, wire_format=JSON_FORMAT):
+        self.format = negotiate_format(wire_format)
+        self.last_values = {}
+
+    @property
+    def compact(self):
+        return self.format != JSON_FORMAT
+
+    def schema(self):
+        return {"type": "schema", "format": self.format, "fields": list(STOCK_FIELDS)}
+
+    def delta(self, data):
+        last = self.last_values.get(data["id"])
+        values = [data.get(field) for field in STOCK_FIELDS]
+        self.last_values[data["id"]] = values
+
+        entry = [data["id"]]
+        for index, value in enumerate(values):
+            if last is None or last[index] != value:
+                entry.extend((index, value))
+        return entry
+
+    def encode(self, updates):
+        """
+        Encode stock updates into ``(text_frames, bytes_frames)`` for ``send``.
+
+        Stocks that did not change at all since the last frame are left out of compact frames.
+        """
+        if not self.compact:
+            return [json.dumps(data) for data in updates], []
+
+        entries = [entry for entry in (self.delta(data) for data in updates) if len(entry) > 1]
+        if not entries:
+            return [], []
+        if self.format == MSGPACK_FORMAT:
+            return [], [msgpack.packb(entries)]
+        return [json.dumps(entries, separators=(",", ":"))], []
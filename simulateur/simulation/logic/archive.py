@@ -0,0 +1,144 @@
+import csv
+import gzip
+import logging
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from simulation.models import SimulationManager, StockPriceHistory
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = getattr(settings, "PRICE_HISTORY_ARCHIVE_DIR", "price_history_archive")
+CHUNK_SIZE = 10000
+
+ARCHIVE_FIELDS = (
+    "stock_id", "timestamp", "open_price", "high_price", "low_price", "close_price", "volatility", "liquidity"
+)
+
+
+def archive_paths(simulation_manager_id, directory=ARCHIVE_DIR):
+    """Archive files of a simulation, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    prefix = f"simulation_{simulation_manager_id}_"
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(prefix) and name.endswith(".csv.gz")
+    )
+
+
+def archived_simulations(directory=ARCHIVE_DIR):
+    """Ids of the simulations that have price history in cold storage."""
+    if not os.path.isdir(directory):
+        return set()
+    return {
+        int(name.split("_")[1]) for name in os.listdir(directory)
+        if name.startswith("simulation_") and name.endswith(".csv.gz")
+    }
+
+
+def archivable(simulation_manager_id):
+    """
+    Hot price history of a simulation that can move to cold storage. Rows still referenced as
+    the purchase price of a holding stay hot, since deleting them would delete the holding.
+    """
+    return StockPriceHistory.objects.filter(
+        simulation_manager_id=simulation_manager_id, stock_portfolios__isnull=True
+    )
+
+
+def archive_simulation(simulation_manager_id, directory=ARCHIVE_DIR, chunk_size=CHUNK_SIZE):
+    """
+    Move the price history of a simulation to a gzip-compressed CSV file in ``directory``.
+
+    Rows are streamed to a temporary file that is renamed once complete, and only the rows
+    written to it are then deleted from the table. Each call writes a new file, so archiving
+    the same simulation again only moves the rows written since. The rollups are kept, so the
+    charts of an archived simulation still work at a one minute resolution or coarser.
+
+    Only finished simulations are archived: the engine of a running one could write rows, or
+    make them the purchase price of a holding, while they are being moved. Raises
+    ``ValueError`` otherwise.
+
+    Returns the number of archived rows.
+    """
+    if not SimulationManager.objects.filter(
+        id=simulation_manager_id, state=SimulationManager.ScenarioState.FINISHED
+    ).exists():
+        raise ValueError(f"Simulation {simulation_manager_id} is not finished, its price history is still in use")
+    rows = archivable(simulation_manager_id).order_by("id")
+    last_id = rows.values_list("id", flat=True).last()
+    if last_id is None:
+        return 0
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory, f"simulation_{simulation_manager_id}_{timezone.now().strftime('%Y%m%dT%H%M%S%f')}.csv.gz"
+    )
+    count = 0
+    with gzip.open(f"{path}.tmp", "wt", newline="") as archive:
+        writer = csv.writer(archive)
+        for row in rows.filter(id__lte=last_id).values_list(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size):
+            writer.writerow((row[0], row[1].isoformat(), *row[2:]))
+            count += 1
+    os.replace(f"{path}.tmp", path)
+
+    try:
+        with transaction.atomic():
+            while True:
+                ids = list(archivable(simulation_manager_id).filter(id__lte=last_id).values_list(
+                    "id", flat=True
+                )[:chunk_size])
+                if not ids:
+                    break
+                StockPriceHistory.objects.filter(id__in=ids).delete()
+    except Exception:
+        # The rows are still in the table: drop the file so they are not archived twice
+        os.remove(path)
+        raise
+    logger.info(f"Archived {count} price history rows of simulation {simulation_manager_id} to {path}")
+    return count
+
+
+def finished_simulations():
+    """Ids of the finished simulations that still have archivable price history."""
+    return list(SimulationManager.objects.filter(
+        state=SimulationManager.ScenarioState.FINISHED,
+        id__in=StockPriceHistory.objects.filter(stock_portfolios__isnull=True).values("simulation_manager_id"),
+    ).values_list("id", flat=True))
+
+
+def restore_simulation(simulation_manager_id, directory=ARCHIVE_DIR, chunk_size=CHUNK_SIZE):
+    """Load the archived price history of a simulation back into the table and remove its archive files."""
+    paths = archive_paths(simulation_manager_id, directory)
+    count = 0
+    with transaction.atomic():
+        for path in paths:
+            with gzip.open(path, "rt", newline="") as archive:
+                batch = []
+                for row in csv.reader(archive):
+                    batch.append(StockPriceHistory(
+                        simulation_manager_id=simulation_manager_id,
+                        stock_id=int(row[0]),
+                        timestamp=datetime.fromisoformat(row[1]),
+                        open_price=float(row[2]),
+                        high_price=float(row[3]),
+                        low_price=float(row[4]),
+                        close_price=float(row[5]),
+                        volatility=float(row[6]),
+                        liquidity=float(row[7]),
+                    ))
+                    if len(batch) == chunk_size:
+                        StockPriceHistory.objects.bulk_create(batch)
+                        count += len(batch)
+                        batch = []
+                StockPriceHistory.objects.bulk_create(batch)
+                count += len(batch)
+    for path in paths:
+        os.remove(path)
+    logger.info(f"Restored {count} price history rows of simulation {simulation_manager_id}")
+    return count
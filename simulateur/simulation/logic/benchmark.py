@@ -0,0 +1,169 @@
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from simulation.logic.broker import Broker
+from simulation.logic.order_book import BUY, SELL
+from simulation.models import (
+    Company, Portfolio, Scenario, SimulationManager, SimulationSettings, Stock, UserProfile
+)
+
+MEMORY_BACKEND = "memory"
+DATABASE_BACKEND = "database"
+BACKENDS = (MEMORY_BACKEND, DATABASE_BACKEND)
+
+MID_PRICE = 100.0
+SPREAD = 1.0
+
+
+def random_batch(rng, count, buy_probability=0.5, buy_offset=(-SPREAD, SPREAD), sell_offset=(-SPREAD, SPREAD)):
+    """Return ``(is_buy, quantities, prices)`` arrays of ``count`` limit orders around ``MID_PRICE``."""
+    is_buy = rng.random(count) < buy_probability
+    quantities = rng.integers(1, 11, count)
+    prices = np.where(
+        is_buy,
+        MID_PRICE + rng.uniform(*buy_offset, count),
+        MID_PRICE + rng.uniform(*sell_offset, count),
+    )
+    return is_buy, quantities, np.round(prices, 2)
+
+
+def uniform_flow(rng, ticks, orders_per_tick):
+    """Both sides at a steady rate, priced uniformly around the mid."""
+    for _ in range(ticks):
+        yield random_batch(rng, orders_per_tick)
+
+
+def bursty_flow(rng, ticks, orders_per_tick):
+    """A trickle of orders with a burst ten times the rate on about one tick in ten."""
+    for _ in range(ticks):
+        count = orders_per_tick * 10 if rng.random() < 0.1 else max(1, orders_per_tick // 10)
+        yield random_batch(rng, count)
+
+
+def one_sided_flow(rng, ticks, orders_per_tick):
+    """Only bids below the mid: nothing trades and the books keep growing."""
+    for _ in range(ticks):
+        yield random_batch(rng, orders_per_tick, buy_probability=1.0, buy_offset=(-SPREAD, 0))
+
+
+def crossing_flow(rng, ticks, orders_per_tick):
+    """Bids above the mid and asks below it, so almost every order trades."""
+    for _ in range(ticks):
+        yield random_batch(rng, orders_per_tick, buy_offset=(0, SPREAD), sell_offset=(-SPREAD, 0))
+
+
+FLOWS = {
+    "uniform": uniform_flow,
+    "bursty": bursty_flow,
+    "one_sided": one_sided_flow,
+    "crossing": crossing_flow,
+}
+
+
+@dataclass
+class BenchmarkResult:
+    flow: str
+    backend: str
+    orders: int = 0
+    fills: int = 0
+    queries: int = 0
+    elapsed: float = 0.0
+    latencies: list = field(default_factory=list)  # Seconds per matching pass
+
+    @property
+    def orders_per_second(self):
+        return self.orders / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def queries_per_fill(self):
+        return self.queries / self.fills if self.fills else 0.0
+
+    def latency_percentile(self, percentile):
+        """Matching pass latency at ``percentile``, in milliseconds."""
+        if not self.latencies:
+            return 0.0
+        return float(np.percentile(self.latencies, percentile)) * 1000
+
+
+def memory_fixtures(tickers, traders):
+    """Plain stand-ins for the order owners and assets: matching only, nothing is settled."""
+    return [f"TCK{i}" for i in range(tickers)], [f"trader{i}" for i in range(traders)], None
+
+
+def database_fixtures(tickers, traders):
+    """Create a dynamic-trading simulation with ``tickers`` stocks and funded ``traders``."""
+    company = Company.objects.create(name="Benchmark Company")
+    stocks = Stock.objects.bulk_create([
+        Stock(company=company, ticker=f"TCK{i}") for i in range(tickers)
+    ])
+    simulation_manager = SimulationManager.objects.create(
+        scenario=Scenario.objects.create(name="Benchmark"),
+        simulation_settings=SimulationSettings.objects.create(stock_trading_logic="dynamic"),
+    )
+    users = [
+        UserProfile.objects.create(user=User.objects.create(username=f"benchmark-trader-{i}"))
+        for i in range(traders)
+    ]
+    Portfolio.objects.bulk_create([
+        Portfolio(owner=user, simulation_manager=simulation_manager, balance=Decimal(1000000))
+        for user in users
+    ])
+    return stocks, users, simulation_manager
+
+
+def replay(broker, flow, rng, ticks, orders_per_tick, assets, users, simulation_manager, backend):
+    result = BenchmarkResult(flow, backend)
+    match = broker.process_queues if backend == DATABASE_BACKEND else broker.match_books
+    for is_buy, quantities, prices in FLOWS[flow](rng, ticks, orders_per_tick):
+        asset_indexes = rng.integers(0, len(assets), len(prices))
+        user_indexes = rng.integers(0, len(users), len(prices))
+
+        start = time.perf_counter()
+        for buy, quantity, price, asset_index, user_index in zip(
+            is_buy, quantities, prices, asset_indexes, user_indexes
+        ):
+            asset = assets[asset_index]
+            broker.get_queue(getattr(asset, "ticker", asset)).add(
+                BUY if buy else SELL, users[user_index], asset, int(quantity), float(price), simulation_manager
+            )
+
+        match_start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            fills = match()
+        end = time.perf_counter()
+
+        result.orders += len(prices)
+        result.fills += len(fills)
+        result.queries += len(queries)
+        result.latencies.append(end - match_start)
+        result.elapsed += end - start
+    return result
+
+
+def run_benchmark(flow, backend=MEMORY_BACKEND, ticks=100, orders_per_tick=100, tickers=4, traders=20, seed=0):
+    """
+    Replay a synthetic order flow against a fresh broker and measure it.
+
+    With the memory backend the books are only matched. With the database backend every
+    matching pass is settled against the configured database inside a transaction that is
+    rolled back at the end, so the benchmark leaves no rows behind.
+    """
+    if flow not in FLOWS:
+        raise ValueError(f"Unknown order flow: {flow}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown benchmark backend: {backend}")
+
+    rng = np.random.default_rng(seed)
+    broker = Broker(f"benchmark-{flow}")
+    if backend == MEMORY_BACKEND:
+        return replay(broker, flow, rng, ticks, orders_per_tick, *memory_fixtures(tickers, traders), backend)
+    with transaction.atomic():
+        result = replay(broker, flow, rng, ticks, orders_per_tick, *database_fixtures(tickers, traders), backend)
+        transaction.set_rollback(True)
+    return result
@@ -1,5 +1,23 @@
-from simulation.logic import BuySellQueue
-from simulation.models import Stock
+import logging
+from dataclasses import dataclass
+
+from django.db import DatabaseError
+from django.db.models import F
+
+from simulation.logic.BuySellQueue import BuySellQueue
+from simulation.logic.settlement import settle_fills
+from simulation.models import StockPriceHistory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Quote:
+    """Reference prices of a ticker: the bid/ask band of the last candle and the last trade."""
+    bid: float
+    ask: float
+    last: float
+
 
 class Broker:
     def __init__(self, name):
@@ -7,50 +25,113 @@ class Broker:
         self.k = 0.5  # Market maker's risk tolerance and desired profit margin.
         self.c = 0.01  # Fixed costs or other market-specific adjustments.
         self.queues = {}
+        self.fill_listeners = []
+        # Reference prices per ticker, kept up to date by the engine ticks and the fills
+        self.quotes = {}
 
     def get_queue(self, ticker):
+        """Return the order book of ``ticker``, creating it on first use."""
         if ticker not in self.queues:
             self.queues[ticker] = BuySellQueue()
         return self.queues[ticker]
 
-    def adjust_client_price(self, best_bid, best_ask, spread, transaction_type):
-        midprice = (best_bid + best_ask) / 2
-        if transaction_type == "buy":
-            ask_price = midprice + spread / 2
-            return ask_price
-        else:
-            bid_price = midprice - spread / 2
-            return bid_price
-
-    def get_best_prices(self, asset):
-        stock = Stock.objects.get(ticker=asset)
-        best_bid = stock.low_price
-        best_ask = stock.high_price
-        return best_bid, best_ask
-
-    def add_to_buysell_queue(self, user, asset, amount, price, transaction_type):
-        stock_queue = self.get_queue(asset)
-        best_bid, best_ask = self.get_best_prices(asset)
-        spread = 0.01 * amount  # TODO: Make the spread constant a simulation_settings parameter
-
-        if transaction_type == "buy":
-            adjusted_price = self.adjust_client_price(best_bid, best_ask, spread, "buy")
-            stock_queue.add_to_buy_queue(user, asset, amount, adjusted_price)
-            if adjusted_price > best_ask:
-                stock = Stock.objects.get(ticker=asset)
-                stock.high_price = adjusted_price
-                stock.save()
-        else:
-            adjusted_price = self.adjust_client_price(best_bid, best_ask, spread, "sell")
-            stock_queue.add_to_sell_queue(user, asset, amount, adjusted_price)
-            if adjusted_price < best_bid:
-                stock = Stock.objects.get(ticker=asset)
-                stock.low_price = adjusted_price
-                stock.save()
+    def get_quote(self, ticker, simulation_manager=None):
+        """
+        Return the reference prices of ``ticker``, loading its latest candle the first time it is
+        seen: the latest candle of ``simulation_manager``, else the latest reference candle.
+        """
+        quote = self.quotes.get(ticker)
+        if quote is None:
+            candle = StockPriceHistory.visible_to(simulation_manager).filter(stock__ticker=ticker).order_by(
+                F('simulation_manager').asc(nulls_last=True), '-timestamp', '-id'
+            ).values_list('low_price', 'high_price', 'close_price').first()
+            if candle is None:
+                raise ValueError(f"No reference price for {ticker}")
+            quote = self.quotes[ticker] = Quote(*candle)
+        return quote
+
+    def update_quotes(self, tickers, candles):
+        """Move the reference prices of ``tickers`` to the candles of an engine tick."""
+        for ticker, low, high, close in zip(tickers, candles["Low"], candles["High"], candles["Close"]):
+            self.quotes[ticker] = Quote(float(low), float(high), float(close))
+
+    def record_trades(self, ticker, fills):
+        """Move the reference prices of ``ticker`` to its trades."""
+        for fill in fills:
+            quote = self.quotes.get(ticker)
+            if quote is None:
+                self.quotes[ticker] = Quote(fill.price, fill.price, fill.price)
+                continue
+            quote.last = fill.price
+            quote.bid = min(quote.bid, fill.price)
+            quote.ask = max(quote.ask, fill.price)
+
+    def get_best_prices(self, asset, simulation_manager=None):
+        """Return the best bid and ask of ``asset``: the top of its book, else its reference prices."""
+        book = self.queues.get(asset)
+        best_bid = book.best_bid() if book is not None else None
+        best_ask = book.best_ask() if book is not None else None
+        if best_bid is None or best_ask is None:
+            quote = self.get_quote(asset, simulation_manager)
+            return (
+                best_bid.price if best_bid is not None else quote.bid,
+                best_ask.price if best_ask is not None else quote.ask,
+            )
+        return best_bid.price, best_ask.price
+
+    def match_books(self):
+        """
+        Match every order book without settling, move the reference prices to the trades and
+        return all fills ordered by ticker, then execution sequence.
+        """
+        matched = self.match_all()
+        for ticker, ticker_fills in matched.items():
+            self.record_trades(ticker, ticker_fills)
+        return [fill for ticker_fills in matched.values() for fill in ticker_fills]
+
+    def match_all(self):
+        """
+        Match every order book and return ``{ticker: fills}`` for the books that traded, by ticker.
+
+        The books are matched one after the other: matching is pure Python and holds the GIL,
+        so a thread pool would only add scheduling latency. Simulations are spread over cores by
+        the start_simulation supervisor instead.
+        """
+        matched = {}
+        for ticker in sorted(self.queues):
+            ticker_fills = self.queues[ticker].match()
+            if ticker_fills:
+                matched[ticker] = ticker_fills
+        return matched
 
     def process_queues(self):
-        for queue in self.queues.values():
-            queue.process_queues()
+        """
+        Match all books and settle the fills of every ticker in one batch.
+
+        The books are only matched in memory until the settlement transaction commits: if it
+        fails, the fills are undone so their orders rest in the books again, with their ledger
+        reservations, and neither the reference prices nor the fill listeners see them. A
+        database error is logged and the orders are matched again on the next pass; any other
+        error is raised.
+        """
+        matched = self.match_all()
+        fills = [fill for ticker_fills in matched.values() for fill in ticker_fills]
+        try:
+            transactions = settle_fills(fills)
+        except Exception as e:
+            for ticker, ticker_fills in matched.items():
+                self.queues[ticker].unmatch(ticker_fills)
+            if not isinstance(e, DatabaseError):
+                raise
+            logger.error(f"Settlement of {len(fills)} fills failed, their orders were put back in the books",
+                         exc_info=True)
+            return []
+
+        for ticker, ticker_fills in matched.items():
+            self.record_trades(ticker, ticker_fills)
+        for listener in self.fill_listeners:
+            listener(fills)
+        return transactions
 
 
 broker = Broker("Algo")
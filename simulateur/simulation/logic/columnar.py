@@ -0,0 +1,238 @@
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from simulation.logic.rollups import roll_up
+from simulation.models import Order, OrderRequest, SimulationManager, SimulationSettings, Stock, StockPriceHistory
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is only needed by the columnar exports
+    pa = pq = None
+
+EXPORT_DIR = getattr(settings, "PRICE_HISTORY_EXPORT_DIR", "price_history_export")
+CHUNK_SIZE = 10000
+
+PARQUET_FORMAT = "parquet"
+ARROW_FORMAT = "arrow"
+FORMATS = (PARQUET_FORMAT, ARROW_FORMAT)
+CONTENT_TYPES = {
+    PARQUET_FORMAT: "application/vnd.apache.parquet",
+    ARROW_FORMAT: "application/vnd.apache.arrow.stream",
+}
+
+CANDLES = "candles"
+ORDERS = "orders"
+FILLS = "fills"
+# Columns of each exported table: (column, queryset lookup, arrow type)
+TABLES = {
+    CANDLES: (
+        ("ticker", "stock__ticker", "string"),
+        ("timestamp", "timestamp", "timestamp"),
+        ("open_price", "open_price", "float64"),
+        ("high_price", "high_price", "float64"),
+        ("low_price", "low_price", "float64"),
+        ("close_price", "close_price", "float64"),
+        ("volatility", "volatility", "float64"),
+        ("liquidity", "liquidity", "float64"),
+    ),
+    # Orders submitted to the engine, whatever became of them
+    ORDERS: (
+        ("id", "id", "int64"),
+        ("timestamp", "timestamp", "timestamp"),
+        ("user_id", "user_id", "int64"),
+        ("ticker", "stock__ticker", "string"),
+        ("side", "side", "string"),
+        ("quantity", "quantity", "int64"),
+        ("price", "price", "float64"),
+        ("status", "status", "string"),
+    ),
+    # Settled fills, recorded as one BUY and one SELL order each
+    FILLS: (
+        ("id", "id", "int64"),
+        ("timestamp", "timestamp", "timestamp"),
+        ("user_id", "user_id", "int64"),
+        ("ticker", "stock__ticker", "string"),
+        ("transaction_type", "transaction_type", "string"),
+        ("quantity", "quantity", "int64"),
+        ("price", "price", "float64"),
+    ),
+}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImproperlyConfigured("pyarrow is required for Parquet and Arrow files: pip install pyarrow")
+
+
+def schema(table):
+    require_pyarrow()
+    types = {
+        "string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "timestamp": pa.timestamp("us", "UTC")
+    }
+    return pa.schema([(column, types[arrow_type]) for column, _, arrow_type in TABLES[table]])
+
+
+def table_queryset(simulation_manager_id, table):
+    """Rows of ``table`` recorded by a simulation, oldest first. Shared reference history is not exported."""
+    if table == CANDLES:
+        queryset = StockPriceHistory.objects.filter(simulation_manager_id=simulation_manager_id)
+    elif table == ORDERS:
+        queryset = OrderRequest.objects.filter(simulation_manager_id=simulation_manager_id)
+    else:
+        # A simulation with several transaction histories would list its fills once per history
+        queryset = Order.objects.filter(transactions__simulation_manager_id=simulation_manager_id).distinct()
+    return queryset.order_by("timestamp", "id").values_list(*(lookup for _, lookup, _ in TABLES[table]))
+
+
+def record_batches(simulation_manager_id, table, chunk_size=CHUNK_SIZE):
+    """
+    Yield the rows of ``table`` of a simulation as Arrow record batches of at most ``chunk_size``
+    rows. The rows are read through ``iterator()``, a server-side cursor on PostgreSQL, so only
+    one chunk is in memory at a time.
+    """
+    table_schema = schema(table)
+    rows = table_queryset(simulation_manager_id, table).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), table_schema)],
+            schema=table_schema,
+        )
+
+
+def open_writer(sink, table, file_format):
+    if file_format == PARQUET_FORMAT:
+        return pq.ParquetWriter(sink, schema(table), compression="zstd")
+    return pa.ipc.new_stream(sink, schema(table))
+
+
+def export_path(simulation_manager_id, table, file_format, directory=EXPORT_DIR):
+    return os.path.join(directory, f"simulation_{simulation_manager_id}_{table}.{file_format}")
+
+
+def export_table(simulation_manager_id, table, file_format=PARQUET_FORMAT, directory=EXPORT_DIR,
+                 chunk_size=CHUNK_SIZE):
+    """
+    Write ``table`` of a simulation to a Parquet file (one row group per chunk) or an Arrow IPC
+    stream in ``directory``, through a temporary file renamed once complete.
+
+    Returns the path and the number of rows written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = export_path(simulation_manager_id, table, file_format, directory)
+    count = 0
+    with open_writer(f"{path}.tmp", table, file_format) as writer:
+        for batch in record_batches(simulation_manager_id, table, chunk_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    os.replace(f"{path}.tmp", path)
+    return path, count
+
+
+class StreamSink:
+    """Write-only file object that keeps what a writer wrote until it is drained into a response."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_table(simulation_manager_id, table, file_format=PARQUET_FORMAT, chunk_size=CHUNK_SIZE):
+    """Yield ``table`` of a simulation encoded as Parquet or an Arrow IPC stream, one chunk of rows at a time."""
+    sink = StreamSink()
+    with open_writer(sink, table, file_format) as writer:
+        for batch in record_batches(simulation_manager_id, table, chunk_size):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def read_batches(path, chunk_size=CHUNK_SIZE):
+    """Yield the record batches of a Parquet file or an Arrow IPC stream."""
+    require_pyarrow()
+    if path.endswith(f".{PARQUET_FORMAT}"):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+        return
+    with pa.memory_map(path) as source:
+        yield from pa.ipc.open_stream(source)
+
+
+def find_stocks(simulation_manager, tickers):
+    """Stocks by ticker, preferring those already in the simulation since tickers are not unique."""
+    stocks = {}
+    for stock in Stock.objects.filter(ticker__in=tickers).order_by("id"):
+        stocks.setdefault(stock.ticker, stock)
+    stocks.update({stock.ticker: stock for stock in simulation_manager.stocks.filter(ticker__in=tickers)})
+    missing = set(tickers) - stocks.keys()
+    if missing:
+        raise ValueError(f"Unknown tickers: {', '.join(sorted(missing))}")
+    return stocks
+
+
+@transaction.atomic
+def import_candles(path, simulation_manager, chunk_size=CHUNK_SIZE):
+    """
+    Load the candles of an exported run into ``simulation_manager`` and roll them up, one
+    chunk at a time. Stocks are matched by ticker and added to the simulation.
+
+    Returns the number of imported candles.
+    """
+    stocks = {}
+    count = 0
+    for batch in read_batches(path, chunk_size):
+        rows = batch.to_pylist()
+        tickers = {row["ticker"] for row in rows} - stocks.keys()
+        if tickers:
+            found = find_stocks(simulation_manager, tickers)
+            simulation_manager.stocks.add(*found.values())
+            stocks.update(found)
+        roll_up(StockPriceHistory.objects.bulk_create([
+            StockPriceHistory(
+                simulation_manager=simulation_manager,
+                stock=stocks[row["ticker"]],
+                timestamp=row["timestamp"],
+                open_price=row["open_price"],
+                high_price=row["high_price"],
+                low_price=row["low_price"],
+                close_price=row["close_price"],
+                volatility=row["volatility"],
+                liquidity=row["liquidity"],
+            )
+            for row in rows
+        ], batch_size=chunk_size))
+        count += len(rows)
+    return count
+
+
+@transaction.atomic
+def seed_simulation(path, scenario, chunk_size=CHUNK_SIZE):
+    """Create a simulation of ``scenario`` whose history starts from the candles of an exported run."""
+    simulation_manager = SimulationManager.objects.create(
+        scenario=scenario, simulation_settings=SimulationSettings.objects.create()
+    )
+    return simulation_manager, import_candles(path, simulation_manager, chunk_size)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from simulation.models import SimulationManager, SimulationSettings
+
+logger = logging.getLogger(__name__)
+
+CONTROL_MESSAGE_TYPE = "simulation.control"
+
+_local_channels = defaultdict(set)
+_local_channels_lock = threading.Lock()
+
+
+def control_group_name(simulation_manager_id):
+    return f"simulation_control_{simulation_manager_id}"
+
+
+def notify_simulation_change(simulation_manager_id, state=None, settings_changed=False):
+    """
+    Push a state or settings change to the engines running ``simulation_manager_id``.
+
+    Engines in this process are notified directly; engines in other processes receive the
+    message through the channel layer group of the simulation.
+    """
+    message = {
+        "simulation_manager": simulation_manager_id,
+        "state": state,
+        "settings_changed": settings_changed,
+        "origin": os.getpid(),
+    }
+
+    with _local_channels_lock:
+        local_channels = list(_local_channels[simulation_manager_id])
+    for control_channel in local_channels:
+        control_channel.deliver(message)
+
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            control_group_name(simulation_manager_id),
+            {"type": CONTROL_MESSAGE_TYPE, "message": message},
+        )
+    except Exception as e:
+        logger.error(f"Error publishing control message for simulation {simulation_manager_id}: {e}")
+
+
+class ControlChannel:
+    """
+    Mailbox through which a running engine receives state and settings changes.
+
+    ``wait`` blocks until a message arrives (or the timeout expires), which lets the engine
+    sleep between ticks and still react to a stop within milliseconds.
+    """
+
+    def __init__(self, simulation_manager_id, channel_layer=None, use_channel_layer=True):
+        self.simulation_manager_id = simulation_manager_id
+        self.channel_layer = channel_layer
+        self.use_channel_layer = use_channel_layer
+        self.messages = queue.Queue()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.listener = None
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        self.stop_event.clear()
+        with _local_channels_lock:
+            _local_channels[self.simulation_manager_id].add(self)
+
+        if self.use_channel_layer and self.channel_layer is None:
+            try:
+                self.channel_layer = get_channel_layer()
+            except Exception as e:
+                logger.error(f"No channel layer for simulation {self.simulation_manager_id} control: {e}")
+        if self.use_channel_layer and self.channel_layer is not None:
+            self.listener = threading.Thread(
+                target=asyncio.run, args=(self.listen(),),
+                name=f"simulation-control-{self.simulation_manager_id}", daemon=True
+            )
+            self.listener.start()
+
+    def stop(self):
+        if not self.started:
+            return
+        self.started = False
+        self.stop_event.set()
+        with _local_channels_lock:
+            _local_channels[self.simulation_manager_id].discard(self)
+        if self.listener is not None:
+            self.listener.join(timeout=2)
+            self.listener = None
+
+    async def listen(self):
+        try:
+            channel_name = await self.channel_layer.new_channel()
+            await self.channel_layer.group_add(control_group_name(self.simulation_manager_id), channel_name)
+        except Exception as e:
+            logger.error(f"Control channel for simulation {self.simulation_manager_id} is unavailable: {e}")
+            return
+
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    event = await asyncio.wait_for(self.channel_layer.receive(channel_name), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                message = event.get("message", {})
+                # Messages published by this process were already delivered locally
+                if message.get("origin") != os.getpid():
+                    self.deliver(message)
+        except Exception as e:
+            logger.error(f"Control channel for simulation {self.simulation_manager_id} stopped: {e}")
+        finally:
+            try:
+                await self.channel_layer.group_discard(control_group_name(self.simulation_manager_id), channel_name)
+            except Exception:
+                pass
+
+    def deliver(self, message):
+        self.messages.put(message)
+        self.wakeup.set()
+
+    def wait(self, timeout=None):
+        """Block until a message is pending or ``timeout`` seconds have elapsed."""
+        return self.wakeup.wait(timeout)
+
+    def drain(self):
+        """Return and clear the pending messages."""
+        self.wakeup.clear()
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+
+@receiver(post_save, sender=SimulationManager)
+def simulation_manager_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: notify_simulation_change(instance.id, state=instance.state))
+
+
+@receiver(post_save, sender=SimulationSettings)
+def simulation_settings_saved(sender, instance, **kwargs):
+    try:
+        simulation_manager_id = instance.simulationmanager.id
+    except SimulationManager.DoesNotExist:
+        return
+    transaction.on_commit(lambda: notify_simulation_change(simulation_manager_id, settings_changed=True))
@@ -0,0 +1,128 @@
+import threading
+from decimal import Decimal
+
+from simulation.logic.order_book import BUY, SELL
+from simulation.models import Portfolio, StockPortfolio
+
+
+class OrderRejected(Exception):
+    pass
+
+
+class PositionLedger:
+    """
+    Cash and share positions of every user of one dynamic simulation, kept in memory by the
+    engine running it.
+
+    The ledger is rebuilt from ``Portfolio`` and ``StockPortfolio`` with two queries the
+    first time it is used, and again by each ``load``; a user seen for the first time
+    afterwards is loaded on its own. A user without a portfolio has nothing available and is
+    looked up again next time, so a portfolio created later is picked up.
+    ``reserve`` checks and debits a position in one step under the ledger lock, so concurrent
+    orders can never spend the same cash or shares twice, and ``release`` gives a reservation
+    back. The database stays the record, written by the settlement of fills, which the order
+    gateway also applies to the ledger.
+    """
+
+    def __init__(self, simulation_manager_id):
+        self.simulation_manager_id = simulation_manager_id
+        self.cash = {}  # Available cash per user id
+        self.shares = {}  # Available shares per (user id, stock id)
+        self.users = set()
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def load(self):
+        """Rebuild the positions from the database."""
+        with self.lock:
+            self.cash = {}
+            self.shares = {}
+            for owner_id, balance in Portfolio.objects.filter(
+                simulation_manager_id=self.simulation_manager_id, owner__isnull=False
+            ).values_list("owner_id", "balance"):
+                self.cash[owner_id] = balance
+            for owner_id, stock_id, quantity in StockPortfolio.objects.filter(
+                portfolio__simulation_manager_id=self.simulation_manager_id, portfolio__owner__isnull=False
+            ).values_list("portfolio__owner_id", "stock_id", "quantity"):
+                self.shares[(owner_id, stock_id)] = quantity
+            self.users = set(self.cash)
+            self.loaded = True
+
+    def ensure_user(self, user_id):
+        """Load the positions of a user the ledger has not seen yet. The caller holds ``lock``."""
+        if not self.loaded:
+            self.load()
+        if user_id in self.users:
+            return
+
+        portfolio = Portfolio.objects.filter(
+            owner_id=user_id, simulation_manager_id=self.simulation_manager_id
+        ).first()
+        if portfolio is None:
+            self.cash.setdefault(user_id, Decimal(0))
+            return
+        self.cash[user_id] = portfolio.balance
+        for stock_id, quantity in StockPortfolio.objects.filter(portfolio=portfolio).values_list(
+            "stock_id", "quantity"
+        ):
+            self.shares[(user_id, stock_id)] = quantity
+        self.users.add(user_id)
+
+    def available_cash(self, user_id):
+        with self.lock:
+            self.ensure_user(user_id)
+            return self.cash[user_id]
+
+    def available_shares(self, user_id, stock_id):
+        with self.lock:
+            self.ensure_user(user_id)
+            return self.shares.get((user_id, stock_id), 0)
+
+    def reserve(self, side, user_id, stock_id, quantity, price, check=True):
+        """Debit what an order of ``side`` needs. Raises ``OrderRejected`` when it is not available."""
+        with self.lock:
+            self.ensure_user(user_id)
+            if side == BUY:
+                cost = Decimal(str(price)) * quantity
+                if check and self.cash[user_id] < cost:
+                    raise OrderRejected("Insufficient funds")
+                self.cash[user_id] -= cost
+            else:
+                key = (user_id, stock_id)
+                if check and self.shares.get(key, 0) < quantity:
+                    raise OrderRejected("Insufficient stock holdings")
+                self.shares[key] = self.shares.get(key, 0) - quantity
+
+    def release(self, side, user_id, stock_id, quantity, price):
+        """Give back what ``reserve`` debited."""
+        self.reserve(side, user_id, stock_id, -quantity, price, check=False)
+
+    def credit(self, user_id, stock_id, cash=0, shares=0):
+        """Add the proceeds of an execution to a user, unless the ledger will load them from the database."""
+        with self.lock:
+            if user_id not in self.users:
+                return
+            if cash:
+                self.cash[user_id] += cash
+            if shares:
+                self.shares[(user_id, stock_id)] = self.shares.get((user_id, stock_id), 0) + shares
+
+
+class Ledgers:
+    """The ledgers of every simulation of the engine, created on first use."""
+
+    def __init__(self):
+        self.ledgers = {}
+        self.lock = threading.Lock()
+
+    def get(self, simulation_manager_id):
+        with self.lock:
+            ledger = self.ledgers.get(simulation_manager_id)
+            if ledger is None:
+                ledger = self.ledgers[simulation_manager_id] = PositionLedger(simulation_manager_id)
+            return ledger
+
+    def clear(self):
+        with self.lock:
+            self.ledgers.clear()
+
@@ -0,0 +1,161 @@
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from simulation.logic.order_book import BUY, SELL
+from simulation.logic.utils import get_stock_volatility
+from simulation.models import Portfolio, UserProfile
+
+logger = logging.getLogger(__name__)
+
+MARKET_MAKER_USERNAME = getattr(settings, "MARKET_MAKER_USERNAME", "market-maker")
+QUOTE_SIZE = getattr(settings, "MARKET_MAKER_QUOTE_SIZE", 10)
+MAX_INVENTORY = getattr(settings, "MARKET_MAKER_MAX_INVENTORY", 1000)
+CAPITAL = getattr(settings, "MARKET_MAKER_CAPITAL", 1000000)
+VOLATILITY_WINDOW = getattr(settings, "MARKET_MAKER_VOLATILITY_WINDOW", 20)
+
+
+class MarketMaker:
+    """
+    House liquidity provider that quotes both sides of every book of a simulation each tick.
+
+    The quotes of all stocks are priced in one vectorized pass around a reservation price
+    that leans against the current inventory:
+
+        sigma       = volatility of the last ``window`` reference prices
+        reservation = mid * (1 - k * sigma * inventory / max_inventory)
+        half spread = mid * (k * sigma + c) / 2
+
+    where ``k`` and ``c`` are the broker's risk tolerance and fixed costs. Until ``window``
+    prices have been seen, the stock's configured volatility is used instead.
+
+    Quote sizes are capped so that no fill can take the inventory past ``max_inventory`` in
+    either direction, and bids are only posted while the cash left, ``capital`` plus the
+    proceeds of the sales minus the cost of the purchases, covers them all. A side at its
+    limit is not quoted.
+
+    Every call to ``quote`` first books what was filled out of the previous quotes (their
+    remaining quantity is read from the book, so no fill callback is needed), cancels what is
+    left of them and posts the new ones. Quotes are rested and cancelled through the order
+    ``gateway``, which reserves and journals them, and settle against the maker's portfolio in
+    the simulation, funded with ``capital`` when it is created.
+    """
+
+    def __init__(self, gateway, simulation_manager, quote_size=QUOTE_SIZE, max_inventory=MAX_INVENTORY,
+                 window=VOLATILITY_WINDOW, capital=CAPITAL):
+        self.gateway = gateway
+        self.broker = gateway.broker
+        self.simulation_manager = simulation_manager
+        self.quote_size = quote_size
+        self.max_inventory = max_inventory
+        self.capital = capital
+        self.cash = float(capital)
+        self.window = max(2, window)
+        self.user = None
+        self.index = {}
+        self.inventory = np.empty(0, dtype=float)
+        self.history = np.empty((0, self.window), dtype=float)
+        self.samples = np.empty(0, dtype=np.int64)
+        self.volatility = np.empty(0, dtype=float)
+        # Resting quotes per ticker: [(order, posted quantity), ...]
+        self.resting = {}
+
+    def get_user(self):
+        """
+        Return the maker's profile, creating it and its funded portfolio in the simulation the
+        first time. Quotes of a previous run rebuilt from the journal are cancelled.
+        """
+        if self.user is None:
+            user, _ = User.objects.get_or_create(username=MARKET_MAKER_USERNAME)
+            self.user, _ = UserProfile.objects.get_or_create(user=user)
+            portfolio, _ = Portfolio.objects.get_or_create(
+                owner=self.user, simulation_manager=self.simulation_manager, defaults={"balance": self.capital}
+            )
+            self.cash = float(portfolio.balance)
+            self.cancel_recovered()
+        return self.user
+
+    def cancel_recovered(self):
+        """Cancel the maker's orders of the simulation that rest in the books without being tracked."""
+        for ticker, book in list(self.broker.queues.items()):
+            for order in list(book.orders.values()):
+                if (order.order_id < 0 and order.user == self.user
+                        and order.simulation_manager == self.simulation_manager):
+                    self.gateway.cancel(ticker, order.order_id)
+
+    def get_positions(self, stocks, mids):
+        """Return the rows of ``stocks``, adding the ones seen for the first time."""
+        missing = [i for i, stock in enumerate(stocks) if stock.id not in self.index]
+        if missing:
+            start = len(self.inventory)
+            for offset, i in enumerate(missing):
+                self.index[stocks[i].id] = start + offset
+            self.inventory = np.concatenate([self.inventory, np.zeros(len(missing))])
+            self.history = np.vstack([self.history, np.repeat(mids[missing, None], self.window, axis=1)])
+            self.samples = np.concatenate([self.samples, np.zeros(len(missing), dtype=np.int64)])
+            self.volatility = np.concatenate([
+                self.volatility, np.array([stocks[i].volatility for i in missing], dtype=float)
+            ])
+        return np.array([self.index[stock.id] for stock in stocks], dtype=np.int64)
+
+    def compute_quotes(self, positions, mids):
+        """Return ``(bids, asks, bid_sizes, ask_sizes)`` for the stocks at ``positions``."""
+        history = np.roll(self.history[positions], -1, axis=1)
+        history[:, -1] = mids
+        self.history[positions] = history
+        self.samples[positions] += 1
+
+        sigma = np.where(
+            self.samples[positions] >= self.window,
+            get_stock_volatility(history),
+            self.volatility[positions],
+        )
+        inventory = self.inventory[positions]
+        skew = np.clip(inventory / self.max_inventory, -1, 1)
+        reservation = mids * (1 - self.broker.k * sigma * skew)
+        half_spread = mids * (self.broker.k * sigma + self.broker.c) / 2
+
+        bids = np.round(reservation - half_spread, 2)
+        asks = np.round(reservation + half_spread, 2)
+        bid_sizes = np.clip(self.max_inventory - inventory, 0, self.quote_size).astype(np.int64)
+        ask_sizes = np.clip(self.max_inventory + inventory, 0, self.quote_size).astype(np.int64)
+        # Bids that would all fill past the cash left are not posted
+        bid_sizes[np.cumsum(bid_sizes * np.maximum(bids, 0)) > self.cash] = 0
+        return bids, asks, bid_sizes, ask_sizes
+
+    def quote(self, stocks, mids):
+        """Replace the quotes of ``stocks`` around their reference prices ``mids``."""
+        if not stocks:
+            return
+        mids = np.asarray(mids, dtype=float)
+        positions = self.get_positions(stocks, mids)
+        user = self.get_user()
+        self.book_fills()
+
+        quoted = mids > 0  # Stocks without a price yet are not quoted
+        bids, asks, bid_sizes, ask_sizes = self.compute_quotes(positions[quoted], mids[quoted])
+        for i, stock in enumerate(np.asarray(stocks, dtype=object)[quoted]):
+            orders = []
+            for side, price, size in ((BUY, bids[i], bid_sizes[i]), (SELL, asks[i], ask_sizes[i])):
+                if size > 0 and price > 0:
+                    order = self.gateway.rest(side, user, stock, int(size), float(price), self.simulation_manager)
+                    orders.append((order, order.quantity))
+            self.resting[stock.ticker] = orders
+
+    def book_fills(self):
+        """Add what was executed out of the resting quotes to the inventory and cash, and cancel the rest."""
+        for ticker, orders in self.resting.items():
+            for order, posted in orders:
+                filled = posted - order.quantity if order.side == BUY else order.quantity - posted
+                if filled:
+                    self.inventory[self.index[order.asset.id]] += filled
+                    self.cash -= filled * order.price
+                if order.quantity:
+                    self.gateway.cancel(ticker, order.order_id)
+        self.resting = {}
+
+    def withdraw(self):
+        """Pull every resting quote out of the books."""
+        self.book_fills()
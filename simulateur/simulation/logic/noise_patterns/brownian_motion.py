@@ -5,9 +5,12 @@ from simulation.logic.noise_patterns.noise_strategy import NoiseStrategy
 class BrownianMotion(NoiseStrategy):
 
     def generate_noise(self, price, fluctuation_rate, time_index=None):
-        open_price = price
-        change = np.random.normal(loc=0, scale=fluctuation_rate)
-        close_price = open_price + change
-        high_price = max(open_price, close_price) + np.random.uniform(0, fluctuation_rate * 2)
-        low_price = min(open_price, close_price) - np.random.uniform(0, fluctuation_rate * 2)
-        return {'Open': open_price, 'High': high_price, 'Low': low_price, 'Close': close_price}
+        return self.generate_single(price, fluctuation_rate, time_index)
+
+    def generate_noise_batch(self, prices, fluctuation_rates, time_index=None, stock_ids=None):
+        open_prices, fluctuation_rates = self.as_arrays(prices, fluctuation_rates)
+        size = open_prices.shape
+        close_prices = open_prices + np.random.normal(loc=0, scale=fluctuation_rates, size=size)
+        high_prices = np.maximum(open_prices, close_prices) + np.random.uniform(0, fluctuation_rates * 2, size=size)
+        low_prices = np.minimum(open_prices, close_prices) - np.random.uniform(0, fluctuation_rates * 2, size=size)
+        return {'Open': open_prices, 'High': high_prices, 'Low': low_prices, 'Close': close_prices}
@@ -6,8 +6,13 @@ class Fbm(NoiseStrategy):
 
     def generate_noise(self, price, fluctuation_rate, time_index=None):
         """Generate a candlestick using fractional Brownian motion."""
-        open_price = price
-        high_price = open_price + np.random.uniform(0, fluctuation_rate * 5)
-        low_price = open_price - np.random.uniform(0, fluctuation_rate * 5)
-        close_price = low_price + np.random.uniform(0, (high_price - low_price))
-        return {'Open': open_price, 'High': high_price, 'Low': low_price, 'Close': close_price}
+        return self.generate_single(price, fluctuation_rate, time_index)
+
+    def generate_noise_batch(self, prices, fluctuation_rates, time_index=None, stock_ids=None):
+        """Generate one fractional Brownian motion candlestick per price."""
+        open_prices, fluctuation_rates = self.as_arrays(prices, fluctuation_rates)
+        size = open_prices.shape
+        high_prices = open_prices + np.random.uniform(0, fluctuation_rates * 5, size=size)
+        low_prices = open_prices - np.random.uniform(0, fluctuation_rates * 5, size=size)
+        close_prices = low_prices + np.random.uniform(0, 1, size=size) * (high_prices - low_prices)
+        return {'Open': open_prices, 'High': high_prices, 'Low': low_prices, 'Close': close_prices}
@@ -23,22 +23,32 @@ class MonteCarlo(NoiseStrategy):
         :param time_index: Optional index to represent the time (not used in this example).
         :return: A dictionary containing the open, high, low, and close prices.
         """
+        return self.generate_single(price, fluctuation_rate, time_index)
+
+    def generate_noise_batch(self, prices, fluctuation_rates, time_index=None, stock_ids=None):
+        """
+        Run the Monte Carlo simulation for every price at once.
+
+        :param prices: Array of current asset prices.
+        :param fluctuation_rates: Volatility of each asset's returns (scalar or array).
+        :param time_index: Optional index to represent the time (not used in this example).
+        :return: A dictionary of open, high, low and close price arrays.
+        """
+        open_prices, fluctuation_rates = self.as_arrays(prices, fluctuation_rates)
         dt = 1 / self.time_horizon  # Assuming daily steps
-        simulated_paths = np.zeros((self.time_horizon, self.num_simulations))
-        simulated_paths[0] = price
-
-        # Run the simulation
-        for t in range(1, self.time_horizon):
-            random_shocks = np.random.normal(loc=0, scale=1, size=self.num_simulations)
-            simulated_paths[t] = simulated_paths[t - 1] * np.exp(
-                (0 - 0.5 * fluctuation_rate ** 2) * dt + fluctuation_rate * np.sqrt(dt) * random_shocks
-            )
+        paths = np.broadcast_to(open_prices, (self.num_simulations,) + open_prices.shape).copy()
 
-        # Extract the final simulated prices and calculate OHLC
-        final_prices = simulated_paths[-1]
-        close_price = np.mean(final_prices)
-        high_price = np.max(final_prices)
-        low_price = np.min(final_prices)
-        open_price = price
+        # Run the simulation, one row of shocks per path and stock
+        for _ in range(1, self.time_horizon):
+            random_shocks = np.random.normal(loc=0, scale=1, size=paths.shape)
+            paths *= np.exp(
+                (0 - 0.5 * fluctuation_rates ** 2) * dt + fluctuation_rates * np.sqrt(dt) * random_shocks
+            )
 
-        return {'Open': open_price, 'High': high_price, 'Low': low_price, 'Close': close_price}
+        # Aggregate the final simulated prices of each stock into OHLC
+        return {
+            'Open': open_prices,
+            'High': paths.max(axis=0),
+            'Low': paths.min(axis=0),
+            'Close': paths.mean(axis=0),
+        }
@@ -1,7 +1,40 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
+
+OHLC_KEYS = ('Open', 'High', 'Low', 'Close')
+
 
 class NoiseStrategy(ABC):
     @abstractmethod
     def generate_noise(self, price, fluctuation_rate, time_index=None):
         pass
+
+    def generate_noise_batch(self, prices, fluctuation_rates, time_index=None, stock_ids=None):
+        """
+        Generate one candlestick per price.
+
+        :param prices: Array of last prices, one per stock.
+        :param fluctuation_rates: Scalar or array of fluctuation rates broadcastable to ``prices``.
+        :param time_index: Optional index of the current tick.
+        :param stock_ids: Optional ids of the stocks, for strategies that give each stock its own series.
+        :return: A dictionary mapping 'Open', 'High', 'Low' and 'Close' to float arrays.
+        """
+        prices, fluctuation_rates = self.as_arrays(prices, fluctuation_rates)
+        candles = [
+            self.generate_noise(price, rate, time_index)
+            for price, rate in zip(prices, fluctuation_rates)
+        ]
+        return {key: np.array([candle[key] for candle in candles], dtype=float) for key in OHLC_KEYS}
+
+    @staticmethod
+    def as_arrays(prices, fluctuation_rates):
+        """Coerce prices and fluctuation rates to float arrays of the same shape."""
+        prices = np.asarray(prices, dtype=float)
+        fluctuation_rates = np.broadcast_to(np.asarray(fluctuation_rates, dtype=float), prices.shape)
+        return prices, fluctuation_rates
+
+    def generate_single(self, price, fluctuation_rate, time_index=None):
+        """Run ``generate_noise_batch`` for one price and unpack the result to scalars."""
+        candles = self.generate_noise_batch([price], [fluctuation_rate], time_index)
+        return {key: float(candles[key][0]) for key in OHLC_KEYS}
@@ -2,22 +2,34 @@ import noise
 import numpy as np
 from simulation.logic.noise_patterns.noise_strategy import NoiseStrategy
 
+# Offset between the noise curves of stocks with consecutive ids so they do not move in lockstep.
+STOCK_PHASE_OFFSET = 7.31
+
 
 class Perlin(NoiseStrategy):
     def generate_noise(self, price, fluctuation_rate, time_index=None):
         """Generate a candlestick using Perlin noise."""
-        open_price = price
-        change = noise.pnoise1(time_index * 0.1) * fluctuation_rate * 10
-        close_price = open_price + change
-        high_price = max(open_price, close_price) + np.random.uniform(
-            0, fluctuation_rate * 2
-        )
-        low_price = min(open_price, close_price) - np.random.uniform(
-            0, fluctuation_rate * 2
-        )
+        return self.generate_single(price, fluctuation_rate, time_index)
+
+    def generate_noise_batch(self, prices, fluctuation_rates, time_index=None, stock_ids=None):
+        """
+        Generate one Perlin noise candlestick per price, each stock sampling the phase of its id
+        so that its series does not change when other stocks are added, removed or reordered.
+        Without ``stock_ids`` the prices are phased by their position.
+        """
+        open_prices, fluctuation_rates = self.as_arrays(prices, fluctuation_rates)
+        size = open_prices.shape
+        if stock_ids is None:
+            stock_ids = np.arange(open_prices.size)
+        positions = (time_index or 0) * 0.1 + np.asarray(stock_ids, dtype=float).ravel() * STOCK_PHASE_OFFSET
+        # The noise library only exposes a scalar sampler; everything else is vectorized.
+        samples = np.fromiter((noise.pnoise1(x) for x in positions), dtype=float, count=positions.size)
+        close_prices = open_prices + samples.reshape(size) * fluctuation_rates * 10
+        high_prices = np.maximum(open_prices, close_prices) + np.random.uniform(0, fluctuation_rates * 2, size=size)
+        low_prices = np.minimum(open_prices, close_prices) - np.random.uniform(0, fluctuation_rates * 2, size=size)
         return {
-            "Open": open_price,
-            "High": high_price,
-            "Low": low_price,
-            "Close": close_price,
+            "Open": open_prices,
+            "High": high_prices,
+            "Low": low_prices,
+            "Close": close_prices,
         }
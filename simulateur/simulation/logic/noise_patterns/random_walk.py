@@ -6,9 +6,14 @@ class RandomWalk(NoiseStrategy):
 
     def generate_noise(self, price, fluctuation_rate, time_index=None):
         """Generate a candlestick using a random walk."""
-        open_price = price
-        change = np.random.choice([-1, 1]) * np.random.uniform(0, fluctuation_rate * 5)
-        close_price = open_price + change
-        high_price = max(open_price, close_price)
-        low_price = min(open_price, close_price)
-        return {'Open': open_price, 'High': high_price, 'Low': low_price, 'Close': close_price}
+        return self.generate_single(price, fluctuation_rate, time_index)
+
+    def generate_noise_batch(self, prices, fluctuation_rates, time_index=None, stock_ids=None):
+        """Generate one random walk step per price."""
+        open_prices, fluctuation_rates = self.as_arrays(prices, fluctuation_rates)
+        size = open_prices.shape
+        change = np.random.choice([-1, 1], size=size) * np.random.uniform(0, fluctuation_rates * 5, size=size)
+        close_prices = open_prices + change
+        high_prices = np.maximum(open_prices, close_prices)
+        low_prices = np.minimum(open_prices, close_prices)
+        return {'Open': open_prices, 'High': high_prices, 'Low': low_prices, 'Close': close_prices}
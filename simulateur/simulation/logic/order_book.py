@@ -0,0 +1,179 @@
+import itertools
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sortedcontainers import SortedDict
+
+BUY = "BUY"
+SELL = "SELL"
+
+
+@dataclass(eq=False)
+class BookOrder:
+    order_id: int
+    side: str
+    user: Any
+    asset: Any
+    quantity: int
+    price: float
+    simulation_manager: Any = None
+    sequence: int = 0
+
+
+@dataclass
+class Fill:
+    buy_order: BookOrder
+    sell_order: BookOrder
+    quantity: int
+    price: float
+    sequence: int = 0
+
+
+class OrderBook:
+    """
+    Limit order book of one ticker with price-time priority.
+
+    Both ladders are ``SortedDict`` price levels (bids keyed by negated price so that the best
+    level comes first on both sides) holding FIFO deques of resting orders, which makes
+    inserting at a new level O(log n) and at an existing level O(1). ``match`` crosses the
+    book while the best bid reaches the best ask; trades happen at the price of the resting
+    (older) order and partially filled orders keep their place in the queue. Orders that do
+    not cross stay in the book until they are matched or cancelled.
+
+    The total quantity of every price level is maintained as orders are added, cancelled and
+    filled, and ``version`` is bumped on every mutation, so aggregated depth is read straight
+    from the ladders and publishers can tell when it changed.
+    """
+
+    def __init__(self):
+        self.bids = SortedDict()
+        self.asks = SortedDict()
+        self.orders = {}
+        self.totals = {BUY: {}, SELL: {}}  # Total quantity per ladder key
+        self.version = 0
+        self.order_ids = itertools.count(1)
+        self.sequence = itertools.count()
+        self.fill_sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, side, user, asset, quantity, price, simulation_manager=None, order_id=None):
+        """Rest a new limit order in the book and return it."""
+        if side not in (BUY, SELL):
+            raise ValueError(f"Unknown order side: {side}")
+        if quantity <= 0:
+            raise ValueError("Order quantity must be positive")
+
+        order = BookOrder(
+            order_id=order_id if order_id is not None else next(self.order_ids),
+            side=side,
+            user=user,
+            asset=asset,
+            quantity=quantity,
+            price=price,
+            simulation_manager=simulation_manager,
+            sequence=next(self.sequence),
+        )
+        if order.order_id in self.orders:
+            raise ValueError(f"Duplicate order id: {order.order_id}")
+
+        ladder, key = self.level_of(order)
+        level = ladder.get(key)
+        if level is None:
+            level = ladder[key] = deque()
+        level.append(order)
+        self.orders[order.order_id] = order
+        self.adjust_total(order.side, key, order.quantity)
+        return order
+
+    def cancel(self, order_id):
+        """Remove a resting order. Returns the cancelled order, or None if it is not in the book."""
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+
+        ladder, key = self.level_of(order)
+        level = ladder[key]
+        level.remove(order)
+        if not level:
+            del ladder[key]
+        self.adjust_total(order.side, key, -order.quantity)
+        return order
+
+    def level_of(self, order):
+        if order.side == BUY:
+            return self.bids, -order.price
+        return self.asks, order.price
+
+    def best_bid(self):
+        if not self.bids:
+            return None
+        return self.bids.peekitem(0)[1][0]
+
+    def best_ask(self):
+        if not self.asks:
+            return None
+        return self.asks.peekitem(0)[1][0]
+
+    def match(self):
+        """Cross the book and return the fills, in execution order."""
+        fills = []
+        while self.bids and self.asks:
+            buy_order = self.best_bid()
+            sell_order = self.best_ask()
+            if buy_order.price < sell_order.price:
+                break
+
+            resting = buy_order if buy_order.sequence < sell_order.sequence else sell_order
+            quantity = min(buy_order.quantity, sell_order.quantity)
+            fills.append(Fill(buy_order, sell_order, quantity, resting.price, next(self.fill_sequence)))
+
+            for order in (buy_order, sell_order):
+                order.quantity -= quantity
+                self.adjust_total(order.side, self.level_of(order)[1], -quantity)
+                if order.quantity == 0:
+                    self.pop_head(order)
+        return fills
+
+    def unmatch(self, fills):
+        """
+        Undo ``fills`` returned by the last ``match``: their quantity goes back to both orders
+        and the orders they emptied are put back at the head of their level, as before the pass.
+        """
+        for fill in reversed(fills):
+            for order in (fill.buy_order, fill.sell_order):
+                ladder, key = self.level_of(order)
+                if order.quantity == 0:
+                    level = ladder.get(key)
+                    if level is None:
+                        level = ladder[key] = deque()
+                    level.appendleft(order)
+                    self.orders[order.order_id] = order
+                order.quantity += fill.quantity
+                self.adjust_total(order.side, key, fill.quantity)
+
+    def adjust_total(self, side, key, quantity):
+        totals = self.totals[side]
+        total = totals.get(key, 0) + quantity
+        if total:
+            totals[key] = total
+        else:
+            del totals[key]
+        self.version += 1
+
+    def pop_head(self, order):
+        ladder, key = self.level_of(order)
+        level = ladder[key]
+        level.popleft()
+        if not level:
+            del ladder[key]
+        del self.orders[order.order_id]
+
+    def depth(self, side, levels: Optional[int] = None):
+        """Return ``[(price, total quantity), ...]`` of a side, best level first."""
+        ladder = self.bids if side == BUY else self.asks
+        keys = ladder.keys() if levels is None else ladder.keys()[:levels]
+        totals = self.totals[side]
+        return [(abs(key), totals[key]) for key in keys]
@@ -0,0 +1,338 @@
+import logging
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from simulation.logic.broker import broker
+from simulation.logic.ledger import Ledgers, OrderRejected
+from simulation.logic.order_book import BUY, SELL
+from simulation.logic.order_journal import OrderJournals, ORDER_RECORD
+from simulation.models import OrderRequest, Portfolio, SimulationManager, Stock, StockPortfolio, UserProfile
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING_ORDERS = getattr(settings, "ORDER_GATEWAY_MAX_PENDING", 10000)
+LEDGER_RESYNC_EVERY = getattr(settings, "ORDER_GATEWAY_LEDGER_RESYNC_EVERY", 100)
+
+
+class OrderGateway:
+    """
+    Entry point of client orders for dynamic trading.
+
+    The web processes and the engine are separate processes, so orders travel through the
+    ``OrderRequest`` table. ``submit`` runs in the web process: it validates an order and
+    inserts it as a pending request, refusing it while ``max_pending`` requests of the
+    simulation are waiting; ``request_cancel`` cancels a pending request or flags an accepted
+    one for the engine. The engine running the simulation is the single consumer:
+    ``drain`` claims the pending requests with ``select_for_update(skip_locked=True)`` right
+    before matching, reserves their cash or shares in the simulation's position ledger, which
+    only the engine keeps, and rests the accepted ones in the broker's books in id order. It
+    also pulls the orders flagged for cancellation out of the books and releases what they held.
+    Settled fills are fed back through ``apply_fills`` so that the ledger follows the executions.
+    Every ``resync_every`` drains, the ledger is reloaded from the database to pick up the
+    balances and holdings changed outside the engine (deposits, admin edits, static trades).
+
+    The market maker's quotes go through ``rest`` and ``cancel`` too, so its reservations,
+    fills and journal entries are handled like those of any other order.
+
+    With ``journals``, the accepted orders, cancels and fills of each simulation are journaled
+    and its books are snapshotted periodically; the first drain of a simulation after a restart
+    rebuilds its books and reservations from its journal, which the engine keeps locked.
+    """
+
+    def __init__(self, broker, max_pending=MAX_PENDING_ORDERS, journals=None, ledgers=None,
+                 resync_every=LEDGER_RESYNC_EVERY):
+        self.broker = broker
+        self.max_pending = max_pending
+        self.resync_every = resync_every
+        self.drains = {}  # Drains per simulation since its ledger was last reloaded
+        self.journals = journals
+        self.recovered = set()  # Ids of the simulations whose books were rebuilt
+        # Cash and shares available per simulation, net of what pending orders have reserved
+        self.ledgers = ledgers if ledgers is not None else Ledgers()
+        # House orders (the market maker's quotes) take negative ids so they never collide with requests
+        self.next_house_id = -1
+        self.lock = threading.Lock()
+        broker.fill_listeners.append(self.apply_fills)
+
+    def submit(self, side, user, stock, quantity, price, simulation_manager):
+        """Validate an order and queue it for the engine, returning its ``OrderRequest``. Raises ``OrderRejected``."""
+        if side not in (BUY, SELL):
+            raise OrderRejected(f"Unknown order side: {side}")
+        if quantity <= 0:
+            raise OrderRejected("Amount must be greater than zero")
+
+        check_positions(side, user, stock, quantity, price, simulation_manager)
+        # The simulation row lock makes counting and inserting atomic across web processes
+        with transaction.atomic():
+            SimulationManager.objects.select_for_update().values_list("id").get(id=simulation_manager.id)
+            if OrderRequest.objects.filter(
+                simulation_manager=simulation_manager, status=OrderRequest.Status.PENDING
+            ).count() >= self.max_pending:
+                raise OrderRejected("Order queue is full, try again later")
+            return OrderRequest.objects.create(
+                simulation_manager=simulation_manager, user=user, stock=stock, side=side, quantity=quantity,
+                price=price,
+            )
+
+    def request_cancel(self, user, order_request_id):
+        """
+        Cancel one of ``user``'s orders from the web process and return its ``OrderRequest``.
+        A pending request is cancelled right away, an accepted one is flagged for the engine.
+        Raises ``OrderRejected``.
+        """
+        with transaction.atomic():
+            request = OrderRequest.objects.select_for_update().filter(id=order_request_id, user=user).first()
+            if request is None:
+                raise OrderRejected("Order not found")
+            if request.status == OrderRequest.Status.PENDING:
+                request.status = OrderRequest.Status.CANCELLED
+            elif request.status == OrderRequest.Status.ACCEPTED:
+                request.status = OrderRequest.Status.CANCELLING
+            else:
+                raise OrderRejected(f"Order is {request.get_status_display().lower()}, it cannot be cancelled")
+            request.save(update_fields=["status"])
+        return request
+
+    def reserve(self, side, user, stock, price, simulation_manager, quantity, check=True):
+        self.ledgers.get(simulation_manager.id).reserve(side, user.id, stock.id, quantity, price, check=check)
+
+    def release(self, side, user, stock, price, simulation_manager, quantity):
+        self.ledgers.get(simulation_manager.id).release(side, user.id, stock.id, quantity, price)
+
+    def journal(self, simulation_manager_id):
+        """Return the journal of a simulation, or None when journaling is off."""
+        if self.journals is None:
+            return None
+        return self.journals.get(simulation_manager_id)
+
+    def rest(self, side, user, stock, quantity, price, simulation_manager):
+        """
+        Rest a house order in its book, reserve and journal it like a drained request and return
+        it. The market maker checks its own limits and sells short, so nothing is refused here.
+        Must be called from the simulation thread.
+        """
+        with self.lock:
+            order_id = self.next_house_id
+            self.next_house_id -= 1
+            self.reserve(side, user, stock, price, simulation_manager, quantity, check=False)
+            journal = self.journal(simulation_manager.id)
+            if journal is not None:
+                journal.record_order(
+                    order_id, side, stock.ticker, user.id, stock.id, quantity, price, simulation_manager.id
+                )
+            return self.broker.get_queue(stock.ticker).add(
+                side, user, stock, quantity, price, simulation_manager, order_id=order_id
+            )
+
+    def cancel(self, ticker, order_id):
+        """Cancel a resting order and release its reservation. Must be called from the simulation thread."""
+        with self.lock:
+            return self.cancel_resting(ticker, order_id)
+
+    def cancel_resting(self, ticker, order_id):
+        """Pull an order out of its book, release its reservation and journal it. The caller holds ``lock``."""
+        order = self.broker.get_queue(ticker).cancel(order_id)
+        if order is None:
+            return None
+        self.release(order.side, order.user, order.asset, order.price, order.simulation_manager, order.quantity)
+        journal = self.journal(order.simulation_manager.id)
+        if journal is not None:
+            journal.record_cancel(order_id)
+        return order
+
+    def drain(self, simulation_manager_id):
+        """
+        Claim the pending requests of a simulation and rest the accepted ones in the broker's
+        books, returning them. Must be called from the engine running the simulation.
+
+        The requests are journaled before their new status is committed: a request that is
+        still pending after a crash is found in the books rebuilt from the journal and is not
+        reserved twice. Requests flagged for cancellation are cancelled once the claim commits.
+        """
+        with self.lock:
+            self.ensure_recovered(simulation_manager_id)
+            drains = self.drains.get(simulation_manager_id, 0) + 1
+            if self.resync_every and drains >= self.resync_every:
+                self.resync(simulation_manager_id)
+                drains = 0
+            self.drains[simulation_manager_id] = drains
+            journal = self.journal(simulation_manager_id)
+            accepted = []
+            reserved = []
+            cancelled = []
+            try:
+                with transaction.atomic():
+                    cancelled = self.claim_cancels(simulation_manager_id)
+                    requests = list(OrderRequest.objects.select_for_update(skip_locked=True, of=("self",)).filter(
+                        simulation_manager_id=simulation_manager_id, status=OrderRequest.Status.PENDING
+                    ).select_related("user", "stock", "simulation_manager__simulation_settings").order_by(
+                        "id"
+                    )[:self.max_pending])
+                    for request in requests:
+                        if request.id not in self.broker.get_queue(request.stock.ticker).orders:
+                            try:
+                                self.reserve(request.side, request.user, request.stock, request.price,
+                                             request.simulation_manager, request.quantity)
+                            except OrderRejected as e:
+                                request.status, request.message = OrderRequest.Status.REJECTED, str(e)
+                                continue
+                            reserved.append(request)
+                        request.status = OrderRequest.Status.ACCEPTED
+                        accepted.append(request)
+                        if journal is not None:
+                            journal.record_order(
+                                request.id, request.side, request.stock.ticker, request.user.id, request.stock.id,
+                                request.quantity, request.price, simulation_manager_id,
+                            )
+                    OrderRequest.objects.bulk_update(requests, ["status", "message"])
+            except Exception:
+                for request in reserved:
+                    self.release(request.side, request.user, request.stock, request.price,
+                                 request.simulation_manager, request.quantity)
+                raise
+
+            for request in reserved:
+                self.broker.get_queue(request.stock.ticker).add(
+                    request.side, request.user, request.stock, request.quantity, request.price,
+                    request.simulation_manager, order_id=request.id,
+                )
+            for request in cancelled:
+                self.cancel_resting(request.stock.ticker, request.id)
+        return accepted
+
+    def resync(self, simulation_manager_id):
+        """
+        Reload the ledger of a simulation from the database, which settlement keeps up to date,
+        and reserve what its resting orders hold again. The caller holds ``lock``.
+        """
+        ledger = self.ledgers.get(simulation_manager_id)
+        with ledger.lock:
+            ledger.load()
+            for book in self.broker.queues.values():
+                for order in book.orders.values():
+                    if order.simulation_manager is not None and order.simulation_manager.id == simulation_manager_id:
+                        self.reserve(order.side, order.user, order.asset, order.price, order.simulation_manager,
+                                     order.quantity, check=False)
+
+    def claim_cancels(self, simulation_manager_id):
+        """
+        Mark the requests of a simulation flagged for cancellation as cancelled, or as accepted
+        again when they no longer rest in a book, and return the ones to pull out of the books.
+        The caller holds ``lock`` and runs in a transaction.
+        """
+        requests = list(OrderRequest.objects.select_for_update(skip_locked=True, of=("self",)).filter(
+            simulation_manager_id=simulation_manager_id, status=OrderRequest.Status.CANCELLING
+        ).select_related("stock"))
+        resting = []
+        for request in requests:
+            if request.id in self.broker.get_queue(request.stock.ticker).orders:
+                request.status = OrderRequest.Status.CANCELLED
+                resting.append(request)
+            else:
+                request.status, request.message = OrderRequest.Status.ACCEPTED, "Order was already filled"
+        OrderRequest.objects.bulk_update(requests, ["status", "message"])
+        return resting
+
+    def apply_fills(self, fills):
+        """Update the ledgers with settled fills."""
+        with self.lock:
+            for fill in fills:
+                buy_order, sell_order = fill.buy_order, fill.sell_order
+                simulation_manager = buy_order.simulation_manager or sell_order.simulation_manager
+                if simulation_manager is None:
+                    continue
+                ledger = self.ledgers.get(simulation_manager.id)
+                stock_id = buy_order.asset.id
+                price = Decimal(str(fill.price))
+
+                # The buy order reserved its limit price, refund the price improvement
+                ledger.credit(
+                    buy_order.user.id, stock_id,
+                    cash=(Decimal(str(buy_order.price)) - price) * fill.quantity, shares=fill.quantity,
+                )
+                ledger.credit(sell_order.user.id, stock_id, cash=price * fill.quantity)
+
+            if self.journals is None:
+                return
+            journaled = set()
+            for fill in fills:
+                simulation_manager = fill.buy_order.simulation_manager or fill.sell_order.simulation_manager
+                if simulation_manager is None:
+                    continue
+                self.journal(simulation_manager.id).record_fill(
+                    fill.buy_order.order_id, fill.sell_order.order_id, fill.quantity
+                )
+                journaled.add(simulation_manager.id)
+            for simulation_manager_id in journaled:
+                if self.journal(simulation_manager_id).snapshot_due:
+                    self.snapshot(simulation_manager_id)
+
+    def snapshot(self, simulation_manager_id):
+        """Snapshot the resting orders of a simulation into its journal. The caller holds ``lock``."""
+        orders = []
+        for ticker, book in self.broker.queues.items():
+            for order in book.orders.values():
+                if order.simulation_manager is None or order.simulation_manager.id != simulation_manager_id:
+                    continue
+                orders.append([
+                    ORDER_RECORD, order.order_id, order.side, ticker, order.user.id, order.asset.id,
+                    order.quantity, order.price, order.simulation_manager.id,
+                ])
+        # Requests not drained yet are still pending in the database
+        orders.sort(key=lambda order: order[1])
+        self.journal(simulation_manager_id).write_snapshot(orders, max([1] + [order[1] + 1 for order in orders]))
+
+    def ensure_recovered(self, simulation_manager_id):
+        """
+        Rebuild the books of a simulation from its journal the first time the gateway drains it.
+        The caller holds ``lock``.
+        """
+        if simulation_manager_id in self.recovered or self.journals is None:
+            return
+        orders, _ = self.journal(simulation_manager_id).load()
+        self.recovered.add(simulation_manager_id)
+        if not orders:
+            return
+
+        users = UserProfile.objects.in_bulk({order[4] for order in orders})
+        stocks = Stock.objects.in_bulk({order[5] for order in orders})
+        simulation_manager = SimulationManager.objects.select_related("simulation_settings").filter(
+            id=simulation_manager_id
+        ).first()
+        for _, order_id, side, ticker, user_id, stock_id, quantity, price, _ in orders:
+            user = users.get(user_id)
+            stock = stocks.get(stock_id)
+            if user is None or stock is None or simulation_manager is None:
+                logger.warning(f"Dropping journaled order {order_id}, its user, stock or simulation is gone")
+                continue
+            self.broker.get_queue(ticker).add(
+                side, user, stock, quantity, price, simulation_manager, order_id=order_id
+            )
+            self.reserve(side, user, stock, price, simulation_manager, quantity, check=False)
+            self.next_house_id = min(self.next_house_id, order_id - 1)
+        logger.info(f"Recovered {len(orders)} resting orders of simulation {simulation_manager_id} from its journal")
+
+
+def check_positions(side, user, stock, quantity, price, simulation_manager):
+    """
+    Refuse early an order that the user's balance or holdings cannot cover. The engine's
+    ledger, which also counts the cash and shares held by open orders, has the final say.
+    """
+    if side == BUY:
+        balance = Portfolio.objects.filter(owner=user, simulation_manager=simulation_manager).values_list(
+            "balance", flat=True
+        ).first()
+        if balance is None or balance < Decimal(str(price)) * quantity:
+            raise OrderRejected("Insufficient funds")
+    else:
+        held = StockPortfolio.objects.filter(
+            portfolio__owner=user, portfolio__simulation_manager=simulation_manager, stock=stock
+        ).values_list("quantity", flat=True).first()
+        if held is None or held < quantity:
+            raise OrderRejected("Insufficient stock holdings")
+
+
+order_gateway = OrderGateway(broker, journals=OrderJournals.from_settings())
@@ -0,0 +1,268 @@
+import logging
+import mmap
+import os
+import struct
+
+import msgpack
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, the journal is not locked there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIR = getattr(settings, "ORDER_JOURNAL_DIR", "")
+SEGMENT_SIZE = getattr(settings, "ORDER_JOURNAL_SEGMENT_SIZE", 64 * 1024 * 1024)
+SNAPSHOT_EVERY = getattr(settings, "ORDER_JOURNAL_SNAPSHOT_EVERY", 100000)
+
+ORDER_RECORD = "O"
+CANCEL_RECORD = "C"
+FILL_RECORD = "F"
+
+
+class JournalLocked(Exception):
+    pass
+
+
+class OrderJournal:
+    """
+    Append-only, memory-mapped journal of order book events.
+
+    Every accepted order, cancel and fill is appended as a length-prefixed MessagePack
+    record. The payload is written before its length, so a record only becomes visible once
+    it is complete and a crash in the middle of an append leaves the journal readable. Writes
+    go to the page cache through the mapping and survive a crash of the process.
+
+    ``write_snapshot`` stores the resting orders in a separate file (written to a temporary
+    file, then renamed) and starts a new journal generation, so that recovery only replays
+    the events recorded since the last snapshot. A journal whose generation is older than the
+    snapshot (crash between the rename and the reset) is ignored.
+
+    A journal has a single writer: ``open`` takes an exclusive ``flock`` on a lock file of the
+    directory, held until ``close``, and raises ``JournalLocked`` while another process has the
+    journal open. The lock is released by the kernel if the process dies.
+    """
+
+    HEADER = struct.Struct("<8sQ")
+    MAGIC = b"SIMJRNL1"
+    LENGTH = struct.Struct("<I")
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, snapshot_every=SNAPSHOT_EVERY):
+        self.directory = directory
+        self.path = os.path.join(directory, "orders.journal")
+        self.snapshot_path = os.path.join(directory, "books.snapshot")
+        self.lock_path = os.path.join(directory, "journal.lock")
+        self.segment_size = segment_size
+        self.snapshot_every = snapshot_every
+        self.lock_file = None
+        self.file = None
+        self.map = None
+        self.offset = self.HEADER.size
+        self.generation = 0
+        self.records = 0
+
+    @property
+    def is_open(self):
+        return self.map is not None
+
+    def open(self):
+        if self.is_open:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock()
+        try:
+            self.open_map()
+        except Exception:
+            self.unlock()
+            raise
+
+    def lock(self):
+        self.lock_file = open(self.lock_path, "a+b")
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.unlock()
+            raise JournalLocked(f"{self.directory} is in use by another process")
+
+    def unlock(self):
+        # Closing the file releases the lock
+        self.lock_file.close()
+        self.lock_file = None
+
+    def open_map(self):
+        if not os.path.exists(self.path):
+            with open(self.path, "wb") as journal_file:
+                journal_file.write(self.HEADER.pack(self.MAGIC, 0))
+                journal_file.truncate(self.segment_size)
+
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.generation = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{self.path} is not an order journal")
+
+        self.offset = self.HEADER.size
+        self.records = 0
+        for _ in self.read():
+            self.records += 1
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+        self.map = None
+        self.file = None
+        self.unlock()
+
+    def append(self, record):
+        payload = msgpack.packb(record)
+        size = self.LENGTH.size + len(payload)
+        if self.offset + size + self.LENGTH.size > len(self.map):
+            self.grow(size)
+
+        self.map[self.offset + self.LENGTH.size:self.offset + size] = payload
+        self.LENGTH.pack_into(self.map, self.offset, len(payload))
+        self.offset += size
+        self.records += 1
+
+    def grow(self, size):
+        new_size = len(self.map) + max(self.segment_size, size + self.LENGTH.size)
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(new_size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def read(self):
+        """Yield the records of the current generation and move ``offset`` past the last one."""
+        offset = self.HEADER.size
+        end = len(self.map)
+        while offset + self.LENGTH.size <= end:
+            (length,) = self.LENGTH.unpack_from(self.map, offset)
+            if length == 0 or offset + self.LENGTH.size + length > end:
+                break
+            start = offset + self.LENGTH.size
+            yield msgpack.unpackb(self.map[start:start + length])
+            offset = start + length
+            self.offset = offset
+
+    def record_order(self, order_id, side, ticker, user_id, stock_id, quantity, price, simulation_manager_id):
+        self.append([ORDER_RECORD, order_id, side, ticker, user_id, stock_id, quantity, price,
+                     simulation_manager_id])
+
+    def record_cancel(self, order_id):
+        self.append([CANCEL_RECORD, order_id])
+
+    def record_fill(self, buy_order_id, sell_order_id, quantity):
+        self.append([FILL_RECORD, buy_order_id, sell_order_id, quantity])
+
+    @property
+    def snapshot_due(self):
+        return self.records >= self.snapshot_every
+
+    def write_snapshot(self, orders, next_sequence):
+        """Persist the resting ``orders`` (order records with their remaining quantity) and reset the journal."""
+        generation = self.generation + 1
+        temporary_path = f"{self.snapshot_path}.tmp"
+        with open(temporary_path, "wb") as snapshot_file:
+            snapshot_file.write(msgpack.packb({
+                "generation": generation,
+                "next_sequence": next_sequence,
+                "orders": orders,
+            }))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+
+        self.map[self.HEADER.size:self.offset] = bytes(self.offset - self.HEADER.size)
+        self.HEADER.pack_into(self.map, 0, self.MAGIC, generation)
+        self.map.flush()
+        self.generation = generation
+        self.offset = self.HEADER.size
+        self.records = 0
+        logger.info(f"Order journal snapshot of {len(orders)} resting orders, generation {generation}")
+
+    def load(self):
+        """Return ``(orders, next_sequence)`` rebuilt from the snapshot and the journal."""
+        snapshot = {"generation": 0, "next_sequence": 1, "orders": []}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as snapshot_file:
+                snapshot = msgpack.unpackb(snapshot_file.read(), strict_map_key=False)
+
+        records = []
+        if self.generation == snapshot["generation"]:
+            records = list(self.read())
+        elif self.generation < snapshot["generation"]:
+            logger.warning("Order journal is older than the snapshot, ignoring it")
+        return replay(snapshot["orders"], records, snapshot["next_sequence"])
+
+
+class OrderJournals:
+    """
+    The journals of the simulations run by an engine, one directory per simulation, opened
+    on first use. Several engines can share ``directory`` as long as each simulation is run
+    by one of them.
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, snapshot_every=SNAPSHOT_EVERY):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.snapshot_every = snapshot_every
+        self.journals = {}
+
+    @classmethod
+    def from_settings(cls):
+        """Return the journals configured by ``ORDER_JOURNAL_DIR``, or None when journaling is off."""
+        if not JOURNAL_DIR:
+            return None
+        return cls(JOURNAL_DIR)
+
+    def get(self, simulation_manager_id):
+        """Return the open journal of a simulation. Raises ``JournalLocked`` if another engine runs it."""
+        journal = self.journals.get(simulation_manager_id)
+        if journal is None:
+            journal = OrderJournal(
+                os.path.join(self.directory, f"simulation_{simulation_manager_id}"),
+                segment_size=self.segment_size, snapshot_every=self.snapshot_every,
+            )
+            journal.open()
+            self.journals[simulation_manager_id] = journal
+        return journal
+
+    def close(self):
+        for journal in self.journals.values():
+            journal.close()
+        self.journals.clear()
+
+
+def replay(orders, records, next_sequence=1):
+    """
+    Apply journal ``records`` on top of snapshot ``orders``.
+
+    Returns the resting order records (``[ORDER_RECORD, order_id, side, ticker, user_id,
+    stock_id, remaining quantity, price, simulation_manager_id]``) sorted by order id, which
+    is their arrival order, and the next sequence id to hand out.
+    """
+    resting = {order[1]: list(order) for order in orders}
+    for record in records:
+        kind = record[0]
+        if kind == ORDER_RECORD:
+            resting[record[1]] = list(record)
+            next_sequence = max(next_sequence, record[1] + 1)
+        elif kind == CANCEL_RECORD:
+            resting.pop(record[1], None)
+        elif kind == FILL_RECORD:
+            _, buy_order_id, sell_order_id, quantity = record
+            for order_id in (buy_order_id, sell_order_id):
+                order = resting.get(order_id)
+                if order is None:
+                    continue
+                order[6] -= quantity
+                if order[6] <= 0:
+                    del resting[order_id]
+    return [resting[order_id] for order_id in sorted(resting)], next_sequence
@@ -0,0 +1,90 @@
+import numpy as np
+from django.db.models import OuterRef, Subquery
+
+from simulation.models import Stock, StockPriceHistory
+
+
+class PriceState:
+    """
+    Last OHLC candle of every stock driven by a simulation.
+
+    Candles are kept in parallel NumPy arrays; ``index`` maps a stock id to its row. The
+    state is seeded from the database once, from the history visible to
+    ``simulation_manager_id`` when given, and then updated in place by the engine, so
+    reading the latest price never costs a query.
+    """
+
+    FIELDS = ('open', 'high', 'low', 'close')
+
+    def __init__(self, simulation_manager_id=None):
+        self.simulation_manager_id = simulation_manager_id
+        self.stock_ids = np.empty(0, dtype=np.int64)
+        self.index = {}
+        self.open = np.empty(0, dtype=float)
+        self.high = np.empty(0, dtype=float)
+        self.low = np.empty(0, dtype=float)
+        self.close = np.empty(0, dtype=float)
+        self.seeded = np.empty(0, dtype=bool)  # False until the stock has at least one candle
+
+    def __len__(self):
+        return len(self.stock_ids)
+
+    def __contains__(self, stock_id):
+        return stock_id in self.index
+
+    def ensure(self, stock_ids):
+        """Add the stocks that are not tracked yet, seeding them from their latest candle."""
+        missing = [stock_id for stock_id in dict.fromkeys(stock_ids) if stock_id not in self.index]
+        if not missing:
+            return
+
+        latest = self.load_latest_candles(missing)
+        start = len(self.stock_ids)
+        self.stock_ids = np.concatenate([self.stock_ids, np.asarray(missing, dtype=np.int64)])
+        for offset, stock_id in enumerate(missing):
+            self.index[stock_id] = start + offset
+
+        rows = [latest.get(stock_id) for stock_id in missing]
+        for position, field in enumerate(self.FIELDS):
+            values = np.array([row[position] if row else 0.0 for row in rows], dtype=float)
+            setattr(self, field, np.concatenate([getattr(self, field), values]))
+        self.seeded = np.concatenate([self.seeded, np.array([row is not None for row in rows], dtype=bool)])
+
+    def load_latest_candles(self, stock_ids):
+        """Return ``{stock_id: (open, high, low, close)}`` for the latest candle of each stock."""
+        if self.simulation_manager_id is None:
+            latest_id = Subquery(StockPriceHistory.objects.filter(
+                stock=OuterRef('pk')
+            ).order_by('-timestamp', '-id').values('id')[:1])
+        else:
+            latest_id = StockPriceHistory.latest_value(self.simulation_manager_id, OuterRef('pk'), 'id')
+        latest_ids = Stock.objects.filter(id__in=stock_ids).annotate(
+            latest_id=latest_id
+        ).exclude(latest_id=None).values_list('latest_id', flat=True)
+
+        return {
+            stock_id: (open_price, high_price, low_price, close_price)
+            for stock_id, open_price, high_price, low_price, close_price in
+            StockPriceHistory.objects.filter(id__in=list(latest_ids)).values_list(
+                'stock_id', 'open_price', 'high_price', 'low_price', 'close_price'
+            )
+        }
+
+    def positions(self, stock_ids):
+        """Return the row of each stock id as an index array."""
+        return np.fromiter((self.index[stock_id] for stock_id in stock_ids), dtype=np.intp, count=len(stock_ids))
+
+    def update(self, positions, candles):
+        """Overwrite the rows at ``positions`` with a batch of candles keyed 'Open'/'High'/'Low'/'Close'."""
+        self.open[positions] = candles['Open']
+        self.high[positions] = candles['High']
+        self.low[positions] = candles['Low']
+        self.close[positions] = candles['Close']
+        self.seeded[positions] = True
+
+    def get(self, stock_id):
+        """Return the last candle of a stock as a dictionary, or None if it has no history."""
+        position = self.index.get(stock_id)
+        if position is None or not self.seeded[position]:
+            return None
+        return {field: float(getattr(self, field)[position]) for field in self.FIELDS}
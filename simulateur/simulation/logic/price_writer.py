@@ -0,0 +1,193 @@
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from simulation.logic.rollups import roll_up
+from simulation.models import StockPriceHistory, StockQuote
+
+logger = logging.getLogger(__name__)
+
+FLUSH_TICKS = getattr(settings, "PRICE_WRITER_FLUSH_TICKS", 10)
+FLUSH_INTERVAL_MS = getattr(settings, "PRICE_WRITER_FLUSH_INTERVAL_MS", 500)
+MAX_PENDING_TICKS = getattr(settings, "PRICE_WRITER_MAX_PENDING_TICKS", 1000)
+BATCH_SIZE = getattr(settings, "PRICE_WRITER_BATCH_SIZE", 1000)
+MAX_RETRIES = getattr(settings, "PRICE_WRITER_MAX_RETRIES", 5)
+RETRY_BACKOFF_MS = getattr(settings, "PRICE_WRITER_RETRY_BACKOFF_MS", 100)
+
+FLUSH = object()  # Queue marker that makes the writer persist what it holds right away
+
+
+class PriceHistoryWriter:
+    """
+    Write-behind buffer for ``StockPriceHistory`` rows.
+
+    The engine hands over the candles of one tick with ``write``; a background thread
+    collects them and persists them with ``bulk_create`` every ``flush_ticks`` ticks or
+    every ``flush_interval_ms`` milliseconds, whichever comes first, then folds them into
+    the price rollups. At most ``max_pending_ticks`` ticks are buffered: once the database
+    falls that far behind, ``write`` blocks until the writer catches up.
+
+    A write failing on a database error is retried ``max_retries`` times, waiting
+    ``retry_backoff_ms`` milliseconds doubled on each attempt. Rows that still could not be
+    written are kept and retried with the next flush, so an outage slows the writer down
+    into backpressure instead of losing history.
+
+    When the background thread is not running, ``write`` persists the rows inline and raises
+    once the retries are exhausted.
+    """
+
+    thread_name = "price-history-writer"
+
+    def __init__(self, model=StockPriceHistory, flush_ticks=FLUSH_TICKS, flush_interval_ms=FLUSH_INTERVAL_MS,
+                 max_pending_ticks=MAX_PENDING_TICKS, batch_size=BATCH_SIZE, max_retries=MAX_RETRIES,
+                 retry_backoff_ms=RETRY_BACKOFF_MS):
+        self.model = model
+        self.flush_ticks = max(1, flush_ticks)
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff_ms / 1000
+        self.unsaved = []
+        self.pending = queue.Queue(maxsize=max_pending_ticks)
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.close_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name=self.thread_name, daemon=True)
+        self.thread.start()
+
+    def write(self, rows):
+        """Queue the rows of one tick, blocking while the buffer is full."""
+        if not rows:
+            return
+        if not self.running:
+            self.persist(rows)
+            return
+        if self.pending.full():
+            logger.warning("Price history writer is falling behind, applying backpressure")
+        self.pending.put(rows)
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        if self.running:
+            self.pending.put(FLUSH)
+            self.pending.join()
+
+    def close(self):
+        """Flush the buffer and stop the background thread."""
+        with self.close_lock:
+            if not self.running:
+                return
+            self.stop_event.set()
+            self.flush()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        try:
+            while not (self.stop_event.is_set() and self.pending.empty()):
+                items = self.collect()
+                rows = self.unsaved + [row for tick in items if tick is not FLUSH for row in tick]
+                try:
+                    if rows:
+                        self.persist(rows)
+                        self.unsaved = []
+                except DatabaseError:
+                    logger.error(f"Could not persist {len(rows)} {self.model.__name__} rows, keeping them for the "
+                                 f"next flush", exc_info=True)
+                    self.unsaved = rows
+                finally:
+                    for _ in items:
+                        self.pending.task_done()
+        finally:
+            if self.unsaved:
+                logger.error(f"Writer stopped with {len(self.unsaved)} unsaved {self.model.__name__} rows")
+            connection.close()
+
+    def collect(self):
+        """
+        Gather queued ticks until ``flush_ticks`` are available, ``flush_interval`` has
+        elapsed or a flush is requested.
+        """
+        items = []
+        ticks = 0
+        deadline = time.monotonic() + self.flush_interval
+        while ticks < self.flush_ticks:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            if item is FLUSH:
+                break
+            ticks += 1
+        return items
+
+    def persist(self, rows):
+        """Write ``rows`` with ``save``, retrying on database errors. Raises the last error."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.save(rows)
+                logger.debug(f"Persisted {len(rows)} {self.model.__name__} rows")
+                return
+            except DatabaseError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                logger.warning(f"Error persisting {self.model.__name__} rows ({e}), retrying in {delay:.3f}s")
+                # The failed attempt may have numbered some rows before it was rolled back
+                for row in rows:
+                    row.pk = None
+                    row._state.adding = True
+                time.sleep(delay)
+
+    def save(self, rows):
+        """Insert the candles and fold them into the rollups, both or neither."""
+        with transaction.atomic():
+            self.model.objects.bulk_create(rows, batch_size=self.batch_size)
+            roll_up(rows)
+
+
+QUOTE_FIELDS = ["open_price", "high_price", "low_price", "close_price", "timestamp"]
+
+
+def upsert_quotes(quotes, batch_size=BATCH_SIZE):
+    """Insert or overwrite the ``StockQuote`` of each (simulation, stock), keeping the last one given."""
+    latest = {(quote.simulation_manager_id, quote.stock_id): quote for quote in quotes}
+    StockQuote.objects.bulk_create(
+        list(latest.values()),
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["simulation_manager", "stock"],
+        update_fields=QUOTE_FIELDS,
+    )
+
+
+class StockQuoteWriter(PriceHistoryWriter):
+    """
+    Write-behind buffer for ``StockQuote`` rows. The quotes of every buffered tick are
+    collapsed to the latest one of each stock and written with a single upsert.
+    """
+
+    thread_name = "stock-quote-writer"
+
+    def __init__(self, **kwargs):
+        super().__init__(model=StockQuote, **kwargs)
+
+    def save(self, rows):
+        upsert_quotes(rows, self.batch_size)
@@ -0,0 +1,187 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+
+from simulation.logic.archive import ARCHIVE_DIR, archived_simulations
+from simulation.models import StockPriceHistory, StockPriceRollup
+
+MAX_POINTS = getattr(settings, "PRICE_HISTORY_MAX_POINTS", 1000)
+
+RAW = "raw"
+AUTO = "auto"
+# Bar length of each rollup resolution in seconds, finest first
+RESOLUTIONS = {
+    StockPriceRollup.Resolution.ONE_MINUTE: 60,
+    StockPriceRollup.Resolution.FIVE_MINUTES: 300,
+    StockPriceRollup.Resolution.ONE_HOUR: 3600,
+    StockPriceRollup.Resolution.ONE_DAY: 86400,
+}
+CANDLE_FIELDS = ("timestamp", "open_price", "high_price", "low_price", "close_price")
+BAR_FIELDS = ("simulation_manager", "stock", "resolution", *CANDLE_FIELDS)
+# Conflict target of the bars of a simulation and of the reference bars, see StockPriceRollup.Meta
+SIMULATION_BAR_KEY = "(simulation_manager_id, stock_id, resolution, timestamp)"
+REFERENCE_BAR_KEY = "(stock_id, resolution, timestamp) WHERE simulation_manager_id IS NULL"
+
+
+def period_start(timestamp, seconds):
+    """Start of the period of ``seconds`` that contains ``timestamp``, aligned on the epoch in UTC."""
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def merge(bar, candle):
+    """Extend ``bar`` with a later ``candle``: the open is kept, the close is the candle's."""
+    bar.high_price = max(bar.high_price, candle.high_price)
+    bar.low_price = min(bar.low_price, candle.low_price)
+    bar.close_price = candle.close_price
+
+
+@transaction.atomic
+def roll_up(candles):
+    """
+    Fold raw ``StockPriceHistory`` candles into the bars of every rollup resolution, per
+    simulation and stock.
+
+    The candles are aggregated in memory first, then upserted with ``upsert_bars``, so
+    concurrent writers opening the same bar merge into it instead of failing on the unique
+    constraint. Candles are expected to be newer than the bars they extend.
+    """
+    bars = {}
+    for candle in sorted(candles, key=lambda candle: candle.timestamp):
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (candle.simulation_manager_id, candle.stock_id, resolution,
+                   period_start(candle.timestamp, seconds))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = StockPriceRollup(
+                    simulation_manager_id=candle.simulation_manager_id,
+                    stock_id=candle.stock_id,
+                    resolution=resolution,
+                    timestamp=key[3],
+                    open_price=candle.open_price,
+                    high_price=candle.high_price,
+                    low_price=candle.low_price,
+                    close_price=candle.close_price,
+                )
+            else:
+                merge(bar, candle)
+    upsert_bars([bar for bar in bars.values() if bar.simulation_manager_id is None], REFERENCE_BAR_KEY)
+    upsert_bars([bar for bar in bars.values() if bar.simulation_manager_id is not None], SIMULATION_BAR_KEY)
+
+
+def upsert_bars(bars, conflict_key):
+    """
+    Insert ``bars``, or merge each into the stored bar of its period in the same statement:
+    the stored open is kept, the high and low are widened and the close is replaced.
+    Django's ``update_conflicts`` can only overwrite columns and cannot target the partial
+    constraint of the reference bars, hence the SQL.
+    """
+    if not bars:
+        return
+    fields = [StockPriceRollup._meta.get_field(name) for name in BAR_FIELDS]
+    table = connection.ops.quote_name(StockPriceRollup._meta.db_table)
+    greatest, least = ("MAX", "MIN") if connection.vendor == "sqlite" else ("GREATEST", "LEAST")
+    row = f"({', '.join(['%s'] * len(fields))})"
+    batch_size = connection.ops.bulk_batch_size(fields, bars)
+    with connection.cursor() as cursor:
+        for start in range(0, len(bars), batch_size):
+            batch = bars[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(connection.ops.quote_name(field.column) for field in fields)}) "
+                f"VALUES {', '.join([row] * len(batch))} "
+                f"ON CONFLICT {conflict_key} DO UPDATE SET "
+                f"high_price = {greatest}({table}.high_price, excluded.high_price), "
+                f"low_price = {least}({table}.low_price, excluded.low_price), "
+                f"close_price = excluded.close_price",
+                [field.get_db_prep_save(getattr(bar, field.attname), connection) for bar in batch for field in fields],
+            )
+
+
+def rebuild_rollups(stock_ids=None, chunk_size=10000, archive_directory=ARCHIVE_DIR):
+    """
+    Recompute the rollups of ``stock_ids`` (every stock by default) from their raw candles, in
+    one transaction. The rollups of the simulations archived to ``archive_directory`` are left
+    alone: their raw candles are no longer in the table.
+    """
+    archived = archived_simulations(archive_directory)
+    history = StockPriceHistory.objects.exclude(simulation_manager_id__in=archived).order_by("timestamp", "id")
+    rollups = StockPriceRollup.objects.exclude(simulation_manager_id__in=archived)
+    if stock_ids is not None:
+        history = history.filter(stock_id__in=stock_ids)
+        rollups = rollups.filter(stock_id__in=stock_ids)
+
+    chunk = []
+    count = 0
+    with transaction.atomic():
+        rollups.delete()
+        for candle in history.only("simulation_manager_id", "stock_id", *CANDLE_FIELDS).iterator(
+            chunk_size=chunk_size
+        ):
+            chunk.append(candle)
+            if len(chunk) == chunk_size:
+                roll_up(chunk)
+                count += len(chunk)
+                chunk = []
+        roll_up(chunk)
+    return count + len(chunk)
+
+
+def parse_resolution(value):
+    """Validate a requested resolution. ``None``, an empty value and ``"auto"`` pick one from the range."""
+    if not value or value == AUTO:
+        return None
+    if value != RAW and value not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {value}. Use {', '.join([RAW, *RESOLUTIONS, AUTO])}.")
+    return value
+
+
+def choose_resolution(start, end):
+    """
+    Pick the finest resolution that covers ``start`` to ``end`` in at most ``MAX_POINTS`` bars.
+    Raw candles are only picked for ranges of at most ``MAX_POINTS`` seconds.
+    """
+    span = (end - start).total_seconds()
+    if span <= MAX_POINTS:
+        return RAW
+    for resolution, seconds in RESOLUTIONS.items():
+        if span / seconds <= MAX_POINTS:
+            return resolution
+    return StockPriceRollup.Resolution.ONE_DAY
+
+
+def get_candles(stock, start=None, end=None, resolution=None, simulation_manager=None):
+    """
+    Return the candles of ``stock`` from ``start`` to ``end`` as dicts of ``CANDLE_FIELDS``,
+    ordered by time. Without a ``resolution``, one is picked from the range, which defaults to
+    the whole history of the stock. With a ``simulation_manager``, only the history visible to
+    that simulation is read.
+    """
+    history = stock.price_history.all()
+    bars = stock.rollups.all()
+    if simulation_manager is not None:
+        visible = Q(simulation_manager=simulation_manager) | Q(simulation_manager__isnull=True)
+        history = history.filter(visible)
+        bars = bars.filter(visible)
+
+    if resolution is None:
+        if start is None or end is None:
+            bounds = history.aggregate(first=Min("timestamp"), last=Max("timestamp"))
+            if bounds["first"] is None:
+                return []
+            start = start or bounds["first"]
+            end = end or bounds["last"]
+        resolution = choose_resolution(start, end)
+
+    if resolution == RAW:
+        queryset = history
+    else:
+        queryset = bars.filter(resolution=resolution)
+        if start is not None:
+            start = period_start(start, RESOLUTIONS[resolution])
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lte=end)
+    return list(queryset.order_by("timestamp", "id").values(*CANDLE_FIELDS))
@@ -0,0 +1,91 @@
+import time
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+
+TICK_POLICY = getattr(settings, "SIMULATION_TICK_POLICY", "skip")
+MAX_CATCH_UP_TICKS = getattr(settings, "SIMULATION_MAX_CATCH_UP_TICKS", 10)
+LATENESS_HISTORY = getattr(settings, "SIMULATION_LATENESS_HISTORY", 1000)
+
+
+class TickScheduler:
+    """
+    Fixed-rate tick scheduler driven by absolute deadlines on the monotonic clock.
+
+    Tick ``n`` is due at ``start + n * period`` no matter how long the previous ticks took,
+    so processing time does not accumulate into drift. When the engine falls behind, the
+    ``skip`` policy drops the missed ticks and realigns on the next deadline, while the
+    ``catch_up`` policy runs them back to back (at most ``max_catch_up`` at once).
+    """
+
+    POLICIES = ("skip", "catch_up")
+
+    def __init__(self, period, policy=TICK_POLICY, max_catch_up=MAX_CATCH_UP_TICKS,
+                 history=LATENESS_HISTORY, clock=time.monotonic):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unsupported tick policy: {policy}")
+        self.period = period
+        self.policy = policy
+        self.max_catch_up = max(1, max_catch_up)
+        self.clock = clock
+        self.next_deadline = None
+        self.ticks = 0
+        self.skipped_ticks = 0
+        self.lateness = deque(maxlen=history)
+
+    def start(self):
+        """Anchor the schedule so the first tick is due immediately."""
+        self.next_deadline = self.clock()
+
+    def set_period(self, period):
+        """Change the tick period, keeping the next deadline relative to the last tick."""
+        if self.next_deadline is not None:
+            self.next_deadline += period - self.period
+        self.period = period
+
+    def time_until_next_tick(self):
+        if self.next_deadline is None:
+            self.start()
+        return max(0.0, self.next_deadline - self.clock())
+
+    def wait(self, sleep=time.sleep):
+        """
+        Sleep until the next deadline and return how many ticks are due.
+
+        :param sleep: Callable used to wait, receives the delay in seconds. It may return
+            early (e.g. an event wait); the deadline is then not consumed and 0 is returned.
+        """
+        delay = self.time_until_next_tick()
+        if delay > 0:
+            sleep(delay)
+            if self.clock() < self.next_deadline:
+                return 0
+
+        now = self.clock()
+        self.lateness.append(now - self.next_deadline)
+        missed = int((now - self.next_deadline) // self.period) if self.period > 0 else 0
+
+        if self.policy == "catch_up":
+            due = min(missed + 1, self.max_catch_up)
+            self.skipped_ticks += missed + 1 - due
+            # Ticks beyond the catch-up limit are dropped and the schedule realigns.
+            self.next_deadline += (missed + 1) * self.period
+        else:
+            due = 1
+            self.skipped_ticks += missed
+            self.next_deadline += (missed + 1) * self.period
+
+        self.ticks += due
+        return due
+
+    def lateness_stats(self):
+        """Return mean, p99 and max tick lateness in seconds over the recorded history."""
+        if not self.lateness:
+            return {"mean": 0.0, "p99": 0.0, "max": 0.0}
+        lateness = np.fromiter(self.lateness, dtype=float)
+        return {
+            "mean": float(lateness.mean()),
+            "p99": float(np.percentile(lateness, 99)),
+            "max": float(lateness.max()),
+        }
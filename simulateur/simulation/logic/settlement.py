@@ -0,0 +1,303 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any
+
+from django.db import transaction
+from django.utils import timezone
+
+from simulation.logic.ledger import OrderRejected
+from simulation.logic.price_writer import upsert_quotes
+from simulation.logic.rollups import roll_up
+from simulation.models import (
+    Order, Portfolio, StockPortfolio, StockPriceHistory, StockQuote, TransactionHistory
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Execution:
+    side: str
+    user: Any
+    stock: Any
+    quantity: int
+    price: Decimal
+    simulation_manager: Any
+    price_history: Any = None
+
+
+def fill_simulation_manager(fill):
+    return fill.buy_order.simulation_manager or fill.sell_order.simulation_manager
+
+
+def is_dynamic(simulation_manager):
+    return (
+        simulation_manager is not None
+        and simulation_manager.simulation_settings.stock_trading_logic == "dynamic"
+    )
+
+
+@transaction.atomic
+def settle_fills(fills):
+    """
+    Apply the fills of one matching pass to the database in a single transaction.
+
+    Whatever the number of fills, settlement runs a fixed number of bulk statements: the
+    portfolios and holdings of every user involved are loaded at once, balances and
+    quantities are updated in memory and written back with ``bulk_update``, new holdings and
+    the BUY/SELL orders are inserted with ``bulk_create`` and attached to the transaction
+    history of their simulation through the M2M through table. In dynamic trading mode the
+    trade prices of each stock are recorded as one price history candle, which is rolled up
+    and also becomes the stock's quote in that simulation.
+
+    Returns one summary per fill, in the order of ``fills``.
+    """
+    if not fills:
+        return []
+
+    simulation_managers = {}
+    for fill in fills:
+        simulation_manager = fill_simulation_manager(fill)
+        if simulation_manager is not None:
+            simulation_managers[simulation_manager.id] = simulation_manager
+
+    keys = set()
+    for fill in fills:
+        simulation_manager = fill_simulation_manager(fill)
+        if simulation_manager is not None:
+            keys.add((fill.buy_order.user.id, simulation_manager.id))
+            keys.add((fill.sell_order.user.id, simulation_manager.id))
+    portfolios = load_portfolios(keys, simulation_managers)
+    holdings = load_holdings(portfolios.values(), {fill.buy_order.asset.id for fill in fills})
+
+    orders = []
+    order_simulation_managers = []
+    trade_prices = defaultdict(list)
+    for fill in fills:
+        buyer = fill.buy_order.user
+        seller = fill.sell_order.user
+        asset = fill.buy_order.asset
+        simulation_manager = fill_simulation_manager(fill)
+        value = Decimal(str(fill.price)) * fill.quantity
+
+        if simulation_manager is not None:
+            buyer_portfolio = portfolios[(buyer.id, simulation_manager.id)]
+            seller_portfolio = portfolios[(seller.id, simulation_manager.id)]
+            buyer_portfolio.balance -= value
+            seller_portfolio.balance += value
+            holding(holdings, buyer_portfolio, asset).quantity += fill.quantity
+            holding(holdings, seller_portfolio, asset).quantity -= fill.quantity
+        else:
+            logger.warning(f"Fill of {asset.ticker} has no simulation manager, balances were not updated")
+
+        if is_dynamic(simulation_manager):
+            trade_prices[(simulation_manager.id, asset.id)].append(fill.price)
+
+        for user, transaction_type in ((buyer, "BUY"), (seller, "SELL")):
+            orders.append(Order(
+                user=user,
+                stock=asset,
+                quantity=fill.quantity,
+                price=fill.price,
+                transaction_type=transaction_type,
+            ))
+            order_simulation_managers.append(simulation_manager)
+
+    Portfolio.objects.bulk_update(portfolios.values(), ["balance"])
+    save_holdings(holdings)
+    Order.objects.bulk_create(orders)
+    link_orders(orders, order_simulation_managers, simulation_managers)
+    record_trade_prices(trade_prices)
+
+    timestamp = timezone.now().isoformat()
+    return [
+        {
+            "buyer": fill.buy_order.user.user.username,
+            "seller": fill.sell_order.user.user.username,
+            "asset": fill.buy_order.asset.ticker,
+            "amount": fill.quantity,
+            "price": fill.price,
+            "timestamp": timestamp,
+        }
+        for fill in fills
+    ]
+
+
+@transaction.atomic
+def execute_trade(execution):
+    """
+    Check and settle a static-trading trade that executes right away, returning its order.
+
+    The user's portfolio row is locked with ``select_for_update`` for the length of the
+    transaction, so concurrent trades of the same user, from any process, are checked against
+    the balance and holdings left by the previous one. Raises ``OrderRejected``.
+    """
+    portfolio = Portfolio.objects.select_for_update().filter(
+        owner=execution.user, simulation_manager=execution.simulation_manager
+    ).first()
+    if execution.side == "BUY":
+        if portfolio is None or portfolio.balance < Decimal(str(execution.price)) * execution.quantity:
+            raise OrderRejected("Insufficient funds")
+    else:
+        held = StockPortfolio.objects.filter(portfolio=portfolio, stock=execution.stock).values_list(
+            "quantity", flat=True
+        ).first()
+        if portfolio is None or held is None or held < execution.quantity:
+            raise OrderRejected("Insufficient stock holdings")
+    return settle_executions([execution])[0]
+
+
+@transaction.atomic
+def settle_executions(executions):
+    """
+    Write a batch of trades that executed right away.
+
+    Like ``settle_fills``, the batch costs a fixed number of bulk statements: balances and
+    holdings are adjusted by the executions on freshly loaded rows, so concurrent writers
+    of the same portfolios never overwrite each other's changes.
+    """
+    if not executions:
+        return []
+
+    simulation_managers = {execution.simulation_manager.id: execution.simulation_manager for execution in executions}
+    portfolios = load_portfolios(
+        {(execution.user.id, execution.simulation_manager.id) for execution in executions}, simulation_managers
+    )
+    holdings = load_holdings(portfolios.values(), {execution.stock.id for execution in executions})
+
+    orders = []
+    for execution in executions:
+        portfolio = portfolios[(execution.user.id, execution.simulation_manager.id)]
+        stock_portfolio = holding(holdings, portfolio, execution.stock)
+        value = Decimal(str(execution.price)) * execution.quantity
+        if execution.side == "BUY":
+            portfolio.balance -= value
+            stock_portfolio.quantity += execution.quantity
+            if execution.price_history is not None:
+                stock_portfolio.latest_price_history = execution.price_history
+        else:
+            portfolio.balance += value
+            stock_portfolio.quantity -= execution.quantity
+        orders.append(Order(
+            user=execution.user,
+            stock=execution.stock,
+            quantity=execution.quantity,
+            price=execution.price,
+            transaction_type=execution.side,
+        ))
+
+    Portfolio.objects.bulk_update(portfolios.values(), ["balance"])
+    save_holdings(holdings, ["quantity", "latest_price_history"])
+    Order.objects.bulk_create(orders)
+    link_orders(orders, [execution.simulation_manager for execution in executions], simulation_managers)
+    return orders
+
+
+def load_portfolios(keys, simulation_managers):
+    """Return the portfolios of the (user id, simulation id) ``keys``, creating missing ones."""
+    if not keys:
+        return {}
+
+    portfolios = {
+        (portfolio.owner_id, portfolio.simulation_manager_id): portfolio
+        for portfolio in Portfolio.objects.filter(
+            owner_id__in={owner_id for owner_id, _ in keys},
+            simulation_manager_id__in={simulation_manager_id for _, simulation_manager_id in keys},
+        )
+    }
+    missing = [
+        Portfolio(owner_id=owner_id, simulation_manager=simulation_managers[simulation_manager_id])
+        for owner_id, simulation_manager_id in keys - portfolios.keys()
+    ]
+    for portfolio in Portfolio.objects.bulk_create(missing):
+        portfolios[(portfolio.owner_id, portfolio.simulation_manager_id)] = portfolio
+    return portfolios
+
+
+def load_holdings(portfolios, stock_ids):
+    return {
+        (stock_portfolio.portfolio_id, stock_portfolio.stock_id): stock_portfolio
+        for stock_portfolio in StockPortfolio.objects.filter(
+            portfolio__in=list(portfolios), stock_id__in=stock_ids
+        )
+    }
+
+
+def holding(holdings, portfolio, stock):
+    key = (portfolio.id, stock.id)
+    if key not in holdings:
+        holdings[key] = StockPortfolio(portfolio=portfolio, stock=stock, quantity=0)
+    return holdings[key]
+
+
+def save_holdings(holdings, fields=("quantity",)):
+    """Write back the holdings: update existing rows, insert new ones and delete emptied ones."""
+    existing = [stock_portfolio for stock_portfolio in holdings.values() if stock_portfolio.pk]
+    emptied = [stock_portfolio.pk for stock_portfolio in existing if stock_portfolio.quantity == 0]
+    StockPortfolio.objects.bulk_update(
+        [stock_portfolio for stock_portfolio in existing if stock_portfolio.quantity != 0], list(fields)
+    )
+    StockPortfolio.objects.bulk_create(
+        [stock_portfolio for stock_portfolio in holdings.values()
+         if not stock_portfolio.pk and stock_portfolio.quantity != 0]
+    )
+    if emptied:
+        StockPortfolio.objects.filter(pk__in=emptied).delete()
+
+
+def link_orders(orders, order_simulation_managers, simulation_managers):
+    """Attach the orders to the transaction history of their simulation with one through-table insert."""
+    if not simulation_managers:
+        return
+
+    histories = {}
+    for history in TransactionHistory.objects.filter(simulation_manager_id__in=simulation_managers.keys()):
+        histories.setdefault(history.simulation_manager_id, history)
+    missing = [
+        TransactionHistory(simulation_manager=simulation_manager)
+        for simulation_manager_id, simulation_manager in simulation_managers.items()
+        if simulation_manager_id not in histories
+    ]
+    for history in TransactionHistory.objects.bulk_create(missing):
+        histories[history.simulation_manager_id] = history
+
+    Through = TransactionHistory.orders.through
+    Through.objects.bulk_create([
+        Through(transactionhistory_id=histories[simulation_manager.id].id, order_id=order.id)
+        for order, simulation_manager in zip(orders, order_simulation_managers)
+        if simulation_manager is not None
+    ])
+
+
+def record_trade_prices(trade_prices):
+    """Record the trades of each stock of each simulation in this pass as one OHLC candle and quote."""
+    if not trade_prices:
+        return
+    candles = {
+        key: (prices[0], max(prices), min(prices), prices[-1])
+        for key, prices in trade_prices.items()
+    }
+    roll_up(StockPriceHistory.objects.bulk_create([
+        StockPriceHistory(
+            simulation_manager_id=simulation_manager_id,
+            stock_id=stock_id,
+            open_price=open_price,
+            high_price=high_price,
+            low_price=low_price,
+            close_price=close_price,
+        )
+        for (simulation_manager_id, stock_id), (open_price, high_price, low_price, close_price) in candles.items()
+    ]))
+    upsert_quotes([
+        StockQuote(
+            simulation_manager_id=simulation_manager_id,
+            stock_id=stock_id,
+            open_price=open_price,
+            high_price=high_price,
+            low_price=low_price,
+            close_price=close_price,
+        )
+        for (simulation_manager_id, stock_id), (open_price, high_price, low_price, close_price) in candles.items()
+    ])
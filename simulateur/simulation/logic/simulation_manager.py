@@ -1,23 +1,34 @@
 import logging
-import time
 import threading
+import time
 from channels.layers import get_channel_layer
 from django.conf import settings
 from django.utils import timezone
 from django.core.cache import cache
 from simulation.logic.broker import broker
+from simulation.logic.control import ControlChannel
+from simulation.logic.market_maker import MarketMaker
+from simulation.logic.order_book import BUY, SELL
+from simulation.logic.order_gateway import order_gateway
 from simulation.logic.noise_patterns.brownian_motion import BrownianMotion
 from simulation.logic.noise_patterns.fbm import Fbm
 from simulation.logic.noise_patterns.perlin import Perlin
 from simulation.logic.noise_patterns.random_candle import RandomCandle
 from simulation.logic.noise_patterns.random_walk import RandomWalk
 from simulation.logic.noise_patterns.monte_carlo import MonteCarlo
-from simulation.logic.utils import is_market_open, send_ohlc_update, TIME_UNITS
-from simulation.models import SimulationManager as SM, StockPriceHistory
+from simulation.logic.price_state import PriceState
+from simulation.logic.price_writer import PriceHistoryWriter, StockQuoteWriter
+from simulation.logic.scheduler import TickScheduler
+from simulation.logic.utils import is_market_open, send_depth_update, send_ohlc_snapshot, TIME_UNITS
+from simulation.models import SimulationManager as SM, SimulationSettings, StockPriceHistory, StockQuote
 
 logger = logging.getLogger(__name__)
 
 CACHE_TTL = getattr(settings, "CACHE_TTL", 0)
+CONTROL_FALLBACK_POLL = getattr(settings, "SIMULATION_CONTROL_FALLBACK_POLL", 60)
+MARKET_MAKER_ENABLED = getattr(settings, "MARKET_MAKER_ENABLED", True)
+DEPTH_LEVELS = getattr(settings, "ORDER_BOOK_DEPTH_LEVELS", 10)
+DEPTH_INTERVAL = getattr(settings, "ORDER_BOOK_DEPTH_INTERVAL_MS", 250) / 1000
 
 
 class SimulationManager:
@@ -44,6 +55,16 @@ class SimulationManager:
         self.noise_strategy = self.get_noise_strategy(self.noise_function)
         self.trading_strategy = simulation_manager.simulation_settings.stock_trading_logic
         self.broker = broker
+        self.market_maker = MarketMaker(order_gateway, simulation_manager) if MARKET_MAKER_ENABLED else None
+        self.price_state = PriceState(simulation_manager.id)
+        self.price_writer = PriceHistoryWriter()
+        self.quote_writer = StockQuoteWriter()
+        self.scheduler = TickScheduler(self.time_step)
+        self.start_time = None
+        self.control = ControlChannel(simulation_manager.id)
+        # Book version last published per ticker, and when depth may be published next
+        self.published_depth = {}
+        self.next_depth_publish = 0.0
 
         logger.info(
             f"Initializing simulation for scenario {self.scenario} with time step {self.time_step} seconds"
@@ -65,6 +86,7 @@ class SimulationManager:
         self.noise_function = new_settings.noise_function.lower()
         self.noise_strategy = self.get_noise_strategy(self.noise_function)
         self.trading_strategy = new_settings.stock_trading_logic
+        self.scheduler.set_period(self.time_step)
 
         logger.info(
             f"Updated simulation settings for scenario {self.scenario} with time step {self.time_step} seconds"
@@ -85,30 +107,56 @@ class SimulationManager:
         return strategy_class()
 
     def monitor_state_and_start(self):
-        """ Continuously monitors the state and starts or restarts the simulation if it becomes ONGOING. """
-        while True:
-            self.simulation_manager.refresh_from_db()  # Refresh state from the database
-
-            # If the state is ONGOING, start or restart the simulation
-            if self.simulation_manager.state == SM.ScenarioState.ONGOING:
-                if not self.running:
-                    logger.info(f"State changed to ONGOING. Starting simulation for scenario {self.scenario}.")
-                    self.start_simulation()
-
-            # If the state is FINISHED, exit the monitoring loop
-            elif self.simulation_manager.state == SM.ScenarioState.FINISHED:
-                logger.info("Simulation is in FINISHED state. Monitoring loop will exit.")
-                break
+        """ Starts or restarts the simulation whenever a state change to ONGOING is pushed. """
+        self.control.start()
+        self.simulation_manager.refresh_from_db()
+        try:
+            while True:
+                # If the state is ONGOING, start or restart the simulation
+                if self.simulation_manager.state == SM.ScenarioState.ONGOING:
+                    if not self.running:
+                        logger.info(f"State changed to ONGOING. Starting simulation for scenario {self.scenario}.")
+                        self.start_simulation()
+
+                # If the state is FINISHED, exit the monitoring loop
+                elif self.simulation_manager.state == SM.ScenarioState.FINISHED:
+                    logger.info("Simulation is in FINISHED state. Monitoring loop will exit.")
+                    break
 
-            # Wait before checking the state again
-            time.sleep(5)
+                # Sleep until a change is pushed; the timeout only guards against a lost message
+                if self.control.wait(CONTROL_FALLBACK_POLL):
+                    self.handle_control_messages()
+                else:
+                    self.simulation_manager.refresh_from_db()
+        finally:
+            self.control.stop()
+
+    def handle_control_messages(self):
+        """Apply the state and settings changes pushed to this simulation since the last call."""
+        messages = self.control.drain()
+        for message in messages:
+            if message.get("state"):
+                self.simulation_manager.state = message["state"]
+
+        if any(message.get("settings_changed") for message in messages):
+            self.apply_new_settings(
+                SimulationSettings.objects.get(id=self.simulation_manager.simulation_settings_id)
+            )
+        return messages
 
     def start_simulation(self):
         self.running = True
-        start_time = timezone.now()
+        self.control.start()
+        self.price_writer.start()
+        self.quote_writer.start()
+        self.start_time = timezone.now()
+        self.scheduler.start()
         try:
             while self.running:
-                self.simulation_manager.refresh_from_db()
+                due_ticks = self.scheduler.wait(sleep=self.control.wait)
+                if self.control.wakeup.is_set():
+                    self.handle_control_messages()
+
                 if self.simulation_manager.state == SM.ScenarioState.STOPPED:
                     logger.info("State changed to STOPPED. Halting simulation.")
                     break
@@ -116,27 +164,15 @@ class SimulationManager:
                     logger.info("State changed to FINISHED. Ending simulation.")
                     break
 
-                current_time = timezone.now()
-                elapsed_time = (current_time - start_time).total_seconds()
-
-                if elapsed_time >= self.run_duration:
-                    logger.info("Run duration reached, stopping simulation")
-                    self.simulation_manager.state = SM.ScenarioState.FINISHED
-                    self.simulation_manager.save()
-                    break
-
-                if self.close_stock_market_at_night and not is_market_open(current_time):
-                    logger.info("Stock market is closed")
-                else:
-                    if self.trading_strategy == "static":
-                        self.update_prices(current_time)
-                    else:
-                        self.broker.process_queues()
+                for _ in range(due_ticks):
+                    if not self.run_tick():
+                        self.running = False
+                        break
+                if due_ticks:
                     logger.debug(
-                        f"Simulation time ({self.simulation_manager.id}): Elapsed time: {elapsed_time}"
+                        f"Simulation ({self.simulation_manager.id}) tick lateness: {self.scheduler.lateness[-1]:.6f}s, "
+                        f"skipped ticks: {self.scheduler.skipped_ticks}"
                     )
-                logger.info(f"Sleeping for {self.time_step} seconds")
-                time.sleep(self.time_step)
         except KeyboardInterrupt:
             logger.info("Simulation stopped by user")
             self.simulation_manager.state = SM.ScenarioState.STOPPED
@@ -146,80 +182,186 @@ class SimulationManager:
         finally:
             self.stop_simulation()
 
+    def run_tick(self):
+        """Run one simulation tick. Returns False once the run duration is reached."""
+        current_time = timezone.now()
+        elapsed_time = (current_time - self.start_time).total_seconds()
+
+        if elapsed_time >= self.run_duration:
+            logger.info("Run duration reached, stopping simulation")
+            self.simulation_manager.state = SM.ScenarioState.FINISHED
+            self.simulation_manager.save()
+            return False
+
+        if self.close_stock_market_at_night and not is_market_open(current_time):
+            logger.info("Stock market is closed")
+        else:
+            if self.trading_strategy == "static":
+                self.update_prices(current_time)
+            else:
+                order_gateway.drain(self.simulation_manager.id)
+                if self.market_maker is not None:
+                    stocks = self.get_stocks()
+                    self.market_maker.quote(stocks, self.get_reference_prices(stocks))
+                self.broker.process_queues()
+                self.broadcast_depth()
+            logger.debug(
+                f"Simulation time ({self.simulation_manager.id}): Elapsed time: {elapsed_time}"
+            )
+        return True
+
     def stop_simulation(self):
         self.running = False
-        logger.info("Simulation stopped")
+        if self.market_maker is not None:
+            self.market_maker.withdraw()
+        self.price_writer.close()
+        self.quote_writer.close()
+        logger.info(f"Simulation stopped, tick lateness: {self.scheduler.lateness_stats()}")
 
     def update_prices(self, current_time):
+        """
+        Advance every stock of the simulation by one tick.
+
+        The last closes of the whole universe are read from the in-memory price state, the
+        noise strategy produces all candles in one batch call, the rows are handed to the
+        write-behind price writer and the latest candle of each stock to the quote writer.
+        """
         stocks = self.get_stocks()
-        for stock in stocks:
-            change = self.apply_changes(stock, current_time)
-            StockPriceHistory.objects.create(
+        if not stocks:
+            return
+
+        positions = self.get_positions(stocks)
+        changes = self.noise_strategy.generate_noise_batch(
+            self.price_state.close[positions], self.fluctuation_rate, self.time_index,
+            stock_ids=[stock.id for stock in stocks]
+        )
+        self.time_index += 1
+        self.price_state.update(positions, changes)
+        self.broker.update_quotes([stock.ticker for stock in stocks], changes)
+
+        self.price_writer.write([
+            StockPriceHistory(
+                simulation_manager_id=self.simulation_manager.id,
                 stock=stock,
-                open_price=change["open"],
-                high_price=change["high"],
-                low_price=change["low"],
-                close_price=change["close"],
+                open_price=float(changes["Open"][i]),
+                high_price=float(changes["High"][i]),
+                low_price=float(changes["Low"][i]),
+                close_price=float(changes["Close"][i]),
                 timestamp=current_time,
             )
-            self.broadcast_update(stock, current_time)
+            for i, stock in enumerate(stocks)
+        ])
+        self.quote_writer.write([
+            StockQuote(
+                simulation_manager_id=self.simulation_manager.id,
+                stock_id=stock.id,
+                open_price=float(changes["Open"][i]),
+                high_price=float(changes["High"][i]),
+                low_price=float(changes["Low"][i]),
+                close_price=float(changes["Close"][i]),
+                timestamp=current_time,
+            )
+            for i, stock in enumerate(stocks)
+        ])
+
+        self.broadcast_snapshot(stocks, current_time)
+
+    def get_positions(self, stocks):
+        """Return the price state rows of ``stocks``, seeding stocks seen for the first time."""
+        stock_ids = [stock.id for stock in stocks]
+        self.price_state.ensure(stock_ids)
+        return self.price_state.positions(stock_ids)
+
+    def get_last_prices(self, stocks):
+        """Return the last close of each stock as an array aligned with ``stocks``."""
+        positions = self.get_positions(stocks)
+        return self.price_state.close[positions].copy()
+
+    def get_reference_prices(self, stocks):
+        """Return the last trade price of each stock, falling back to its last close."""
+        prices = self.get_last_prices(stocks)
+        for i, stock in enumerate(stocks):
+            quote = self.broker.quotes.get(stock.ticker)
+            if quote is not None:
+                prices[i] = quote.last
+        return prices
 
     def get_stocks(self):
         cache_key = f"stocks_for_scenario_{self.simulation_manager.id}"
         stocks = cache.get(cache_key)
 
         if not stocks:
-            stocks = list(self.simulation_manager.stocks.all())
+            stocks = list(self.simulation_manager.stocks.select_related('company'))
             cache.set(cache_key, stocks, timeout=CACHE_TTL)
 
         return stocks
 
-    def apply_changes(self, stock, current_time):
-        last_price_entry = stock.price_history.order_by('-timestamp').first()
-        last_price = last_price_entry.close_price if last_price_entry else 0.0
-
-        change = self.noise_strategy.generate_noise(
-            last_price, self.fluctuation_rate, self.time_index
-        )
-        self.time_index += 1
-
-        return {
-            "ticker": stock.ticker,
-            "open": change["Open"],
-            "high": change["High"],
-            "low": change["Low"],
-            "close": change["Close"],
-            "time": current_time.isoformat(),
-        }
-
-    def broadcast_update(self, stock, current_time):
-        last_price_entry = stock.price_history.order_by('-timestamp').first()
+    def build_update(self, stock, current_time):
+        """Return the OHLC update of ``stock`` from the price state, or None if it has no history."""
+        last_candle = self.price_state.get(stock.id)
 
-        if not last_price_entry:
+        if not last_candle:
             logger.warning(f"No price history found for stock {stock.ticker} at {current_time}")
-            return
+            return None
 
-        update = {
+        return {
             "simulation_manager": self.simulation_manager.id,
             "id": stock.id,
             "ticker": stock.ticker,
             "name": stock.company.name,
             "type": "stock",
-            "open": last_price_entry.open_price,
-            "high": last_price_entry.high_price,
-            "low": last_price_entry.low_price,
-            "close": last_price_entry.close_price,
-            "current": last_price_entry.close_price,
+            "open": last_candle["open"],
+            "high": last_candle["high"],
+            "low": last_candle["low"],
+            "close": last_candle["close"],
+            "current": last_candle["close"],
             "timestamp": current_time.isoformat(),
         }
 
-        logger.debug(f"Preparing to broadcast update: {update}")
+    def broadcast_snapshot(self, stocks, current_time):
+        """Broadcast the OHLC of every stock of the tick with one channel layer message."""
+        updates = [
+            update for update in (self.build_update(stock, current_time) for stock in stocks)
+            if update is not None
+        ]
+        if not updates:
+            return
+
+        try:
+            send_ohlc_snapshot(self.channel_layer, updates, self.simulation_manager.id)
+            logger.debug(f"Broadcast snapshot of {len(updates)} stocks sent successfully.")
+        except Exception as e:
+            logger.error(f"Error sending broadcast snapshot: {e}")
+
+    def broadcast_depth(self):
+        """
+        Broadcast the top ``DEPTH_LEVELS`` price levels of the books that changed since they were
+        last published, at most once every ``DEPTH_INTERVAL`` seconds.
+        """
+        now = time.monotonic()
+        if now < self.next_depth_publish:
+            return
+        self.next_depth_publish = now + DEPTH_INTERVAL
+
+        books = []
+        for stock in self.get_stocks():
+            book = self.broker.queues.get(stock.ticker)
+            if book is None or self.published_depth.get(stock.ticker) == book.version:
+                continue
+            self.published_depth[stock.ticker] = book.version
+            books.append({
+                "ticker": stock.ticker,
+                "bids": [[price, quantity] for price, quantity in book.depth(BUY, DEPTH_LEVELS)],
+                "asks": [[price, quantity] for price, quantity in book.depth(SELL, DEPTH_LEVELS)],
+            })
+        if not books:
+            return
 
         try:
-            send_ohlc_update(self.channel_layer, update, f'{1}')
-            logger.debug(f"Broadcast update sent successfully.")
+            send_depth_update(self.channel_layer, books, self.simulation_manager.id)
+            logger.debug(f"Broadcast depth of {len(books)} books sent successfully.")
         except Exception as e:
-            logger.error(f"Error sending broadcast update: {e}")
+            logger.error(f"Error sending depth update: {e}")
 
 
 class SimulationManagerSingleton:
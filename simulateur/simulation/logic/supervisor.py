@@ -0,0 +1,191 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_RESTARTS = getattr(settings, "SIMULATION_WORKER_MAX_RESTARTS", 5)
+STOP_TIMEOUT = getattr(settings, "SIMULATION_WORKER_STOP_TIMEOUT", 10)
+
+STOP_COMMAND = "stop"
+NOTIFY_COMMAND = "notify"
+
+
+def shard_simulations(simulation_manager_ids, workers):
+    """Split the simulation ids round-robin into at most ``workers`` non-empty shards."""
+    workers = max(1, min(workers, len(simulation_manager_ids)))
+    return [list(simulation_manager_ids[index::workers]) for index in range(workers)]
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def run_worker(worker_index, simulation_manager_ids, cpus, commands):
+    """
+    Entry point of a worker process: run the engines of one shard until told to stop or until
+    every simulation of the shard is FINISHED.
+
+    The process is spawned, so Django is set up here. Commands from the supervisor arrive on
+    ``commands``; an engine thread dying while its simulation is not FINISHED exits the
+    process with an error so that the supervisor restarts the shard.
+    """
+    import django
+    django.setup()
+
+    from simulation.logic.control import notify_simulation_change
+    from simulation.logic.simulation_manager import SimulationManagerSingleton
+    from simulation.models import SimulationManager as SM
+
+    # Ctrl+C reaches the whole process group, shutdown is driven by the supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"Worker {worker_index} could not be pinned to CPUs {cpus}: {e}")
+
+    engines = {}
+    for simulation_manager_id in simulation_manager_ids:
+        try:
+            engines[simulation_manager_id] = SimulationManagerSingleton.get_instance(simulation_manager_id)
+        except SM.DoesNotExist:
+            logger.error(f"Worker {worker_index}: simulation {simulation_manager_id} does not exist.")
+    logger.info(f"Worker {worker_index} (pid {os.getpid()}) running simulations {list(engines)}")
+
+    while True:
+        try:
+            command = commands.get(timeout=1)
+        except queue.Empty:
+            finished = 0
+            for simulation_manager_id, engine in engines.items():
+                thread = SimulationManagerSingleton._threads.get(simulation_manager_id)
+                if thread is not None and thread.is_alive():
+                    continue
+                if engine.simulation_manager.state != SM.ScenarioState.FINISHED:
+                    logger.error(f"Worker {worker_index}: engine of simulation {simulation_manager_id} crashed.")
+                    os._exit(1)
+                finished += 1
+            if finished == len(engines):
+                logger.info(f"Worker {worker_index}: every simulation finished, exiting.")
+                return
+            continue
+
+        if command[0] == STOP_COMMAND:
+            for engine in engines.values():
+                engine.stop_simulation()
+            logger.info(f"Worker {worker_index} stopped.")
+            return
+        if command[0] == NOTIFY_COMMAND:
+            _, simulation_manager_id, state, settings_changed = command
+            notify_simulation_change(simulation_manager_id, state=state, settings_changed=settings_changed)
+
+
+class Worker:
+    def __init__(self, index, simulation_manager_ids, cpus):
+        self.index = index
+        self.simulation_manager_ids = simulation_manager_ids
+        self.cpus = cpus
+        self.process = None
+        self.commands = None
+        self.restarts = 0
+        self.exited = False
+
+
+class SimulationSupervisor:
+    """
+    Shard simulation engines across worker processes so that they scale with cores.
+
+    Each worker is pinned to one CPU (round-robin over the CPUs available to the supervisor)
+    and receives commands on its own queue. ``check`` restarts workers that exited with an
+    error, up to ``max_restarts`` times per shard, and reaps the others: those whose
+    simulations all finished, stopped ones and those out of restarts.
+    """
+
+    def __init__(self, simulation_manager_ids, workers, cpu_affinity=True,
+                 max_restarts=MAX_RESTARTS, context=None):
+        self.context = context or multiprocessing.get_context("spawn")
+        self.max_restarts = max_restarts
+        self.stopping = False
+        cpus = available_cpus()
+        self.workers = [
+            Worker(index, shard, [cpus[index % len(cpus)]] if cpu_affinity else None)
+            for index, shard in enumerate(shard_simulations(list(simulation_manager_ids), workers))
+        ]
+        self.owners = {
+            simulation_manager_id: worker
+            for worker in self.workers
+            for simulation_manager_id in worker.simulation_manager_ids
+        }
+
+    def start(self):
+        for worker in self.workers:
+            self.spawn(worker)
+
+    def spawn(self, worker):
+        worker.commands = self.context.Queue()
+        worker.process = self.context.Process(
+            target=run_worker,
+            args=(worker.index, worker.simulation_manager_ids, worker.cpus, worker.commands),
+            name=f"simulation-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        logger.info(
+            f"Started worker {worker.index} (pid {worker.process.pid}) for simulations "
+            f"{worker.simulation_manager_ids} on CPUs {worker.cpus}"
+        )
+
+    def check(self):
+        """Restart crashed workers and reap the exited ones. Returns the number of workers still alive."""
+        alive = 0
+        for worker in self.workers:
+            if worker.exited:
+                continue
+            if worker.process.is_alive():
+                alive += 1
+                continue
+            if self.stopping or worker.process.exitcode == 0 or worker.restarts >= self.max_restarts:
+                self.reap(worker)
+                continue
+            worker.restarts += 1
+            logger.error(
+                f"Worker {worker.index} exited with code {worker.process.exitcode}, "
+                f"restarting ({worker.restarts}/{self.max_restarts})"
+            )
+            worker.process.close()
+            self.spawn(worker)
+            alive += 1
+        return alive
+
+    def reap(self, worker):
+        """Release the process of a worker that exited for good."""
+        worker.process.join()
+        logger.info(f"Worker {worker.index} exited with code {worker.process.exitcode}")
+        worker.process.close()
+        worker.exited = True
+
+    def notify(self, simulation_manager_id, state=None, settings_changed=False):
+        """Forward a state or settings change to the worker running the simulation."""
+        worker = self.owners.get(simulation_manager_id)
+        if worker is not None and not worker.exited and worker.process.is_alive():
+            worker.commands.put((NOTIFY_COMMAND, simulation_manager_id, state, settings_changed))
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        self.stopping = True
+        workers = [worker for worker in self.workers if not worker.exited]
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.commands.put((STOP_COMMAND,))
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not stop in time, terminating it")
+                worker.process.terminate()
+            self.reap(worker)
@@ -54,31 +54,52 @@ def is_market_open(current_time, timezone_str='America/New_York'):
     return True
 
 
-def send_ohlc_update(channel_layer, update, simulation_id):
-    """Send an OHLC update to the specified WebSocket channel."""
+def send_depth_update(channel_layer, books, simulation_id):
+    """Send the aggregated depth of the order books that changed to the WebSocket group in a single message."""
+    async_to_sync(channel_layer.group_send)(
+        f"simulation_{simulation_id}",
+        {
+            'type': 'depth_update',
+            'message': {
+                'timestamp': str(timezone.now().isoformat()),
+                'books': books,
+            }
+        }
+    )
+
+
+def send_ohlc_snapshot(channel_layer, updates, simulation_id):
+    """Send the OHLC updates of all stocks of a tick to the WebSocket group in a single message."""
+    timestamp = str(timezone.now().isoformat())
     data = {
-        'id': update['id'],
-        'simulation_manager': update['simulation_manager'],
-        'ticker': update['ticker'],
-        'name': update['name'],
-        'type': update['type'],
-        'open': update['open'],
-        'high': update['high'],
-        'low': update['low'],
-        'close': update['close'],
-        'current': update['current'],
-        'timestamp': str(timezone.now().isoformat())
+        'timestamp': timestamp,
+        'stocks': [
+            {
+                'id': update['id'],
+                'simulation_manager': update['simulation_manager'],
+                'ticker': update['ticker'],
+                'name': update['name'],
+                'type': update['type'],
+                'open': update['open'],
+                'high': update['high'],
+                'low': update['low'],
+                'close': update['close'],
+                'current': update['current'],
+                'timestamp': timestamp
+            }
+            for update in updates
+        ]
     }
-    logger.debug(f"Sending OHLC update: {data}")
+    logger.debug(f"Sending OHLC snapshot of {len(updates)} stocks")
 
     async_to_sync(channel_layer.group_send)(
         f"simulation_{simulation_id}",
         {
-            "type": "stock_update",  # Updated to match the consumer method
+            "type": "stock_snapshot",
             "message": data
         }
     )
-    logger.debug(f"OHLC update sent to group 'simulation_{simulation_id}'")
+    logger.debug(f"OHLC snapshot sent to group 'simulation_{simulation_id}'")
 
 
 def get_mid_prices_in_range(stock_id: int, time_delta: timedelta):
@@ -94,7 +115,7 @@ def get_mid_prices_in_range(stock_id: int, time_delta: timedelta):
     mid_prices = StockPriceHistory.objects.filter(
         stock_id=stock_id,
         timestamp__range=(start_time, end_time)
-    ).values_list('high_price', 'low_price')
+    ).order_by('timestamp', 'id').values_list('high_price', 'low_price')
 
     return [(high + low) / 2 for high, low in mid_prices]
 
@@ -103,11 +124,12 @@ def get_stock_volatility(prices):
     """
     Calculate the volatility of a stock based on its price history.
 
-    :param prices: A list of stock prices.
-    :return: The volatility of the stock.
+    :param prices: A list of stock prices, or a 2-D array with the price history of one stock per row.
+    :return: The volatility of the stock, or an array with the volatility of each row.
     """
-    if len(prices) < 2:
-        return 0
+    prices = np.asarray(prices, dtype=float)
+    if prices.shape[-1] < 2:
+        return 0 if prices.ndim == 1 else np.zeros(prices.shape[0])
 
-    log_returns = np.log(np.array(prices[1:]) / np.array(prices[:-1]))
-    return np.std(log_returns)
+    log_returns = np.log(prices[..., 1:] / prices[..., :-1])
+    return np.std(log_returns, axis=-1)
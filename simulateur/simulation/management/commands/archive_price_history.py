@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from simulation.logic.archive import ARCHIVE_DIR, archive_simulation, finished_simulations, restore_simulation
+
+
+class Command(BaseCommand):
+    help = 'Move the price history of finished simulations to compressed cold storage, or restore it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simulation',
+            dest='simulations',
+            action='append',
+            type=int,
+            help='Id of a simulation manager, can be repeated (default: every finished simulation)'
+        )
+        parser.add_argument('--restore', action='store_true', help='Load archived history back into the table')
+        parser.add_argument('--directory', default=ARCHIVE_DIR, help='Cold storage directory')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            if not options['simulations']:
+                raise CommandError("--restore needs the --simulation to restore.")
+            for simulation_manager_id in options['simulations']:
+                count = restore_simulation(simulation_manager_id, options['directory'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"Restored {count} price history rows of simulation {simulation_manager_id}"
+                ))
+            return
+
+        for simulation_manager_id in options['simulations'] or finished_simulations():
+            try:
+                count = archive_simulation(simulation_manager_id, options['directory'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {count} price history rows of simulation {simulation_manager_id}"
+            ))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from simulation.logic.benchmark import BACKENDS, FLOWS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Replay synthetic order flows against the broker and report matching throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flow',
+            dest='flows',
+            action='append',
+            choices=sorted(FLOWS),
+            help='Order flow to replay, can be repeated (default: every flow)'
+        )
+        parser.add_argument(
+            '--backend',
+            dest='backends',
+            action='append',
+            choices=BACKENDS,
+            help='"memory" only matches the books, "database" also settles the fills (default: both)'
+        )
+        parser.add_argument('--ticks', type=int, default=100, help='Number of matching passes')
+        parser.add_argument('--orders-per-tick', type=int, default=100, help='Orders submitted before each pass')
+        parser.add_argument('--tickers', type=int, default=4, help='Number of order books')
+        parser.add_argument('--traders', type=int, default=20, help='Number of order owners')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the order flow generator')
+
+    def handle(self, *args, **options):
+        header = (
+            f"{'flow':<10} {'backend':<9} {'orders':>8} {'fills':>8} {'orders/s':>11} "
+            f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries/fill':>12}"
+        )
+        self.stdout.write(header)
+        for flow in options['flows'] or FLOWS:
+            for backend in options['backends'] or BACKENDS:
+                result = run_benchmark(
+                    flow,
+                    backend,
+                    ticks=options['ticks'],
+                    orders_per_tick=options['orders_per_tick'],
+                    tickers=options['tickers'],
+                    traders=options['traders'],
+                    seed=options['seed'],
+                )
+                self.stdout.write(
+                    f"{flow:<10} {backend:<9} {result.orders:>8} {result.fills:>8} "
+                    f"{result.orders_per_second:>11.0f} {result.latency_percentile(50):>8.3f} "
+                    f"{result.latency_percentile(90):>8.3f} {result.latency_percentile(99):>8.3f} "
+                    f"{result.queries_per_fill:>12.3f}"
+                )
@@ -0,0 +1,41 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from simulation.logic.columnar import CHUNK_SIZE, EXPORT_DIR, FORMATS, PARQUET_FORMAT, TABLES, export_table
+
+
+class Command(BaseCommand):
+    help = 'Export the candles, orders and fills of simulations to Parquet or Arrow files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simulation',
+            dest='simulations',
+            action='append',
+            type=int,
+            required=True,
+            help='Id of a simulation manager, can be repeated'
+        )
+        parser.add_argument(
+            '--table',
+            dest='tables',
+            action='append',
+            choices=list(TABLES),
+            help='Table to export, can be repeated (default: every table)'
+        )
+        parser.add_argument('--format', choices=FORMATS, default=PARQUET_FORMAT, help='File format')
+        parser.add_argument('--directory', default=EXPORT_DIR, help='Export directory')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows read and written at a time')
+
+    def handle(self, *args, **options):
+        for simulation_manager_id in options['simulations']:
+            for table in options['tables'] or TABLES:
+                try:
+                    path, count = export_table(
+                        simulation_manager_id, table, options['format'], options['directory'], options['chunk_size']
+                    )
+                except ImproperlyConfigured as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS(
+                    f"Exported {count} {table} of simulation {simulation_manager_id} to {path}"
+                ))
@@ -0,0 +1,28 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from simulation.logic.columnar import CHUNK_SIZE, import_candles, seed_simulation
+from simulation.models import Scenario, SimulationManager
+
+
+class Command(BaseCommand):
+    help = 'Load the candles of an exported run (Parquet or Arrow file) into a simulation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Exported candles file')
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--scenario', type=int, help='Id of a scenario to seed a new simulation of')
+        target.add_argument('--simulation', type=int, help='Id of an existing simulation manager')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows read and written at a time')
+
+    def handle(self, *args, **options):
+        try:
+            if options['scenario'] is not None:
+                scenario = Scenario.objects.get(id=options['scenario'])
+                simulation_manager, count = seed_simulation(options['path'], scenario, options['chunk_size'])
+            else:
+                simulation_manager = SimulationManager.objects.get(id=options['simulation'])
+                count = import_candles(options['path'], simulation_manager, options['chunk_size'])
+        except (Scenario.DoesNotExist, SimulationManager.DoesNotExist, ImproperlyConfigured, OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Imported {count} candles into simulation {simulation_manager.id}"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from simulation.logic.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the 1m/5m/1h/1d price rollups from the raw price history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stock',
+            dest='stocks',
+            action='append',
+            type=int,
+            help='Id of a stock to rebuild, can be repeated (default: every stock)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Candles rolled up per statement batch')
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(options['stocks'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {count} candles"))
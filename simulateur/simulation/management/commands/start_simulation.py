@@ -2,9 +2,9 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from simulation.models.simulation_manager import SimulationManager as SM
 from simulation.logic.simulation_manager import SimulationManagerSingleton
+from simulation.logic.supervisor import SimulationSupervisor
 import signal
 import sys
-import time
 import threading
 
 class Command(BaseCommand):
@@ -17,14 +17,35 @@ class Command(BaseCommand):
             type=int,
             help='The IDs of the simulation managers to monitor and simulate'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Shard the simulations across this many worker processes (0 runs them all in this process)'
+        )
+        parser.add_argument(
+            '--no-affinity',
+            action='store_true',
+            help='Do not pin worker processes to CPUs'
+        )
 
     def handle(self, *args, **kwargs):
         simulation_manager_ids = kwargs['simulation_manager_ids']
         running_simulations = []
         stop_flag = threading.Event()  # Event flag to manage thread termination
+        supervisor = None
+        if kwargs['workers'] > 0:
+            supervisor = SimulationSupervisor(
+                simulation_manager_ids, kwargs['workers'], cpu_affinity=not kwargs['no_affinity']
+            )
 
         def stop_all_simulations(signal_received, frame):
             stop_flag.set()  # Signal all threads to stop
+            if supervisor:
+                for simulation_manager_id in simulation_manager_ids:
+                    SM.objects.filter(id=simulation_manager_id).update(state=SM.ScenarioState.STOPPED)
+                    supervisor.notify(simulation_manager_id, state=SM.ScenarioState.STOPPED)
+                supervisor.stop()
             for simulation_manager in running_simulations:
                 if simulation_manager:
                     # Change the state to STOPPED for each simulation
@@ -52,58 +73,35 @@ class Command(BaseCommand):
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'Error occurred while setting simulation {simulation_manager_id} to ONGOING: {e}'))
 
-        def monitor_and_run_simulation(simulation_manager_id):
+        if supervisor:
+            supervisor.start()
+            self.stdout.write(self.style.SUCCESS(
+                f'Running {len(simulation_manager_ids)} simulations on {len(supervisor.workers)} worker processes...'
+            ))
             try:
-                simulation_manager = SimulationManagerSingleton.get_instance(simulation_manager_id)
-                running_simulations.append(simulation_manager)
-
-                previous_settings = None
-
                 while not stop_flag.is_set():
-                    # Continuously monitor the state and settings of the simulation
-                    simulation_manager.simulation_manager.refresh_from_db()
-
-                    if simulation_manager.simulation_manager.state == SM.ScenarioState.ONGOING:
-                        # Start the simulation if it's not already running
-                        if not simulation_manager.running:
-                            self.stdout.write(self.style.SUCCESS(f'Starting simulation {simulation_manager_id}...'))
-                            simulation_manager.start_simulation()
-
-                        # Check if the settings have changed
-                        current_settings = simulation_manager.simulation_manager.simulation_settings
-                        if previous_settings is None or previous_settings != current_settings:
-                            self.stdout.write(self.style.WARNING(f'Updating settings for simulation {simulation_manager_id}...'))
-                            # Apply new settings to the running simulation
-                            simulation_manager.apply_new_settings(current_settings)
-                            previous_settings = current_settings
-
-                    elif simulation_manager.simulation_manager.state == SM.ScenarioState.STOPPED:
-                        # Stop the simulation if it's running
-                        if simulation_manager.running:
-                            self.stdout.write(self.style.WARNING(f'Stopping simulation {simulation_manager_id}...'))
-                            simulation_manager.stop_simulation()
-
-                    # Exit if the state is set to FINISHED
-                    elif simulation_manager.simulation_manager.state == SM.ScenarioState.FINISHED:
-                        self.stdout.write(self.style.SUCCESS(f'Simulation {simulation_manager_id} is finished. Exiting...'))
+                    stop_flag.wait(1)
+                    if not supervisor.check():
+                        self.stdout.write(self.style.SUCCESS('Every worker process has exited.'))
                         break
+            except KeyboardInterrupt:
+                stop_all_simulations(signal.SIGINT, None)
+            return
 
-                    # Poll every 5 seconds to check for state and settings changes
-                    time.sleep(5)
-
+        # Each engine runs in its own monitoring thread and reacts to pushed state and settings changes
+        for simulation_manager_id in simulation_manager_ids:
+            try:
+                simulation_manager = SimulationManagerSingleton.get_instance(simulation_manager_id)
+                running_simulations.append(simulation_manager)
+                self.stdout.write(self.style.SUCCESS(f'Monitoring simulation {simulation_manager_id}...'))
             except SM.DoesNotExist:
                 self.stdout.write(self.style.ERROR(f'Scenario with ID {simulation_manager_id} does not exist.'))
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'Error occurred for simulation {simulation_manager_id}: {e}'))
 
-        # Start a separate thread for each simulation manager
-        for simulation_manager_id in simulation_manager_ids:
-            thread = threading.Thread(target=monitor_and_run_simulation, args=(simulation_manager_id,), daemon=True)
-            thread.start()
-
         # Keep the main thread alive to catch signals and manage the simulation lifecycle
         try:
             while not stop_flag.is_set():
-                time.sleep(1)
+                stop_flag.wait(1)
         except KeyboardInterrupt:
             stop_all_simulations(signal.SIGINT, None)  # Graceful stop on Ctrl+C
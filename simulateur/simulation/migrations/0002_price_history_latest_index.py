@@ -0,0 +1,21 @@
+# Generated by Django 5.0.8 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='stockpricehistory',
+            options={'verbose_name_plural': 'Stock Price Histories'},
+        ),
+        migrations.AddIndex(
+            model_name='stockpricehistory',
+            index=models.Index(fields=['stock', '-timestamp'], include=('open_price', 'high_price', 'low_price', 'close_price'), name='price_history_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0002_price_history_latest_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockQuote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open_price', models.FloatField(default=0.0)),
+                ('high_price', models.FloatField(default=0.0)),
+                ('low_price', models.FloatField(default=0.0)),
+                ('close_price', models.FloatField(default=0.0)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('simulation_manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quotes', to='simulation.simulationmanager')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quotes', to='simulation.stock')),
+            ],
+            options={
+                'verbose_name_plural': 'Stock Quotes',
+                'unique_together': {('simulation_manager', 'stock')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0003_stock_quote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('timestamp', models.DateTimeField()),
+                ('open_price', models.FloatField(default=0.0)),
+                ('high_price', models.FloatField(default=0.0)),
+                ('low_price', models.FloatField(default=0.0)),
+                ('close_price', models.FloatField(default=0.0)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='simulation.stock')),
+            ],
+            options={
+                'verbose_name_plural': 'Stock Price Rollups',
+                'unique_together': {('stock', 'resolution', 'timestamp')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Rows written before price history was scoped are not backfilled: nothing records which
+# simulation wrote them. They keep a NULL simulation_manager and become the reference history,
+# which StockPriceHistory.visible_to and StockPriceHistory.latest show to every simulation, as
+# before. Existing rollup bars likewise become reference bars.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0004_stock_price_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stockpricehistory',
+            name='price_history_latest_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockpricerollup',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='stockpricehistory',
+            name='simulation_manager',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='simulation.simulationmanager'),
+        ),
+        migrations.AddField(
+            model_name='stockpricerollup',
+            name='simulation_manager',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='simulation.simulationmanager'),
+        ),
+        migrations.AlterField(
+            model_name='stockpricehistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockpricerollup',
+            unique_together={('simulation_manager', 'stock', 'resolution', 'timestamp')},
+        ),
+        migrations.AddIndex(
+            model_name='stockpricehistory',
+            index=models.Index(fields=['stock', '-timestamp'], include=('simulation_manager', 'open_price', 'high_price', 'low_price', 'close_price'), name='price_history_latest_idx'),
+        ),
+    ]
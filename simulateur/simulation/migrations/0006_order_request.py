@@ -0,0 +1,32 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0005_price_history_simulation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell')], max_length=4)),
+                ('quantity', models.IntegerField()),
+                ('price', models.FloatField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], default='pending', max_length=10)),
+                ('message', models.CharField(blank=True, default='', max_length=255)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('simulation_manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_requests', to='simulation.simulationmanager')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='simulation.stock')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='simulation.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['simulation_manager', 'status', 'id'], name='order_request_pending_idx')],
+            },
+        ),
+    ]
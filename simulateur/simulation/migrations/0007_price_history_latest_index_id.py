@@ -0,0 +1,21 @@
+# Generated by Django 5.0.8 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0006_order_request'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stockpricehistory',
+            name='price_history_latest_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stockpricehistory',
+            index=models.Index(fields=['stock', '-timestamp', '-id'], include=('simulation_manager', 'open_price', 'high_price', 'low_price', 'close_price'), name='price_history_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.8 on 2026-10-18 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0007_price_history_latest_index_id'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stockpricehistory',
+            name='price_history_latest_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockpricerollup',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='stockpricehistory',
+            index=models.Index(fields=['simulation_manager', 'stock', '-timestamp', '-id'], include=('open_price', 'high_price', 'low_price', 'close_price'), name='price_history_latest_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockpricerollup',
+            constraint=models.UniqueConstraint(fields=('simulation_manager', 'stock', 'resolution', 'timestamp'), name='price_rollup_bar_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockpricerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('simulation_manager__isnull', True)), fields=('stock', 'resolution', 'timestamp'), name='price_rollup_reference_bar_unique'),
+        ),
+    ]
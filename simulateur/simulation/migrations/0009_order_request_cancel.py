@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 21:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulation', '0008_price_history_simulation_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderrequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('cancelling', 'Cancelling'), ('cancelled', 'Cancelled')], default='pending', max_length=10),
+        ),
+    ]
@@ -4,9 +4,9 @@ from .news import News
 from .scenario import Scenario
 from .simulation_manager import SimulationManager
 from .simulation_settings import SimulationSettings
-from .stock import Stock, StockPriceHistory
+from .stock import Stock, StockPriceHistory, StockPriceRollup, StockQuote
 from .portfolio import Portfolio, StockPortfolio
 from .team import Team, JoinLink
-from .transaction_history import TransactionHistory, Order
+from .transaction_history import TransactionHistory, Order, OrderRequest
 from .trigger import Trigger
 from .user_profile import UserProfile
@@ -31,7 +31,7 @@ class StockPortfolio(models.Model):
 
     def update_latest_price(self):
         """Update the latest price history based on the most recent StockPriceHistory for the stock."""
-        self.latest_price_history = StockPriceHistory.objects.filter(stock=self.stock).order_by('-timestamp').first()
+        self.latest_price_history = StockPriceHistory.latest(self.portfolio.simulation_manager_id, self.stock)
         self.save()
 
     def __str__(self):
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 class Stock(models.Model):
     company = models.ForeignKey(
@@ -18,6 +21,11 @@ class Stock(models.Model):
 
 
 class StockPriceHistory(models.Model):
+    # Rows without a simulation are the reference history of the stock (seeded, or written
+    # before histories were scoped) and are seen by every simulation
+    simulation_manager = models.ForeignKey(
+        "SimulationManager", on_delete=models.CASCADE, null=True, blank=True, related_name="price_history"
+    )
     stock = models.ForeignKey(
         Stock, on_delete=models.CASCADE, related_name="price_history"
     )
@@ -25,13 +33,122 @@ class StockPriceHistory(models.Model):
     high_price = models.FloatField(default=0.0)
     low_price = models.FloatField(default=0.0)
     close_price = models.FloatField(default=0.0)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     volatility = models.FloatField(default=0.0)
     liquidity = models.FloatField(default=0.0)
 
     def __str__(self):
         return f"{self.stock.company.name} Price at {self.timestamp}"
 
+    @classmethod
+    def visible_to(cls, simulation_manager):
+        """Rows of ``simulation_manager`` and the reference rows shared by every simulation."""
+        return cls.objects.filter(Q(simulation_manager=simulation_manager) | Q(simulation_manager__isnull=True))
+
+    @classmethod
+    def latest_value(cls, simulation_manager, stock, field):
+        """
+        Expression of ``field`` of the latest candle of ``stock`` visible to ``simulation_manager``:
+        its latest candle of the simulation, or the latest reference candle until it has one.
+        Each side is one seek on the latest-price index.
+        """
+        def newest(rows):
+            return Subquery(rows.filter(stock=stock).order_by("-timestamp", "-id").values(field)[:1])
+
+        return Coalesce(
+            newest(cls.objects.filter(simulation_manager=simulation_manager)),
+            newest(cls.objects.filter(simulation_manager__isnull=True)),
+        )
+
+    @classmethod
+    def latest(cls, simulation_manager, stock):
+        """Return the latest candle of ``stock`` visible to ``simulation_manager``, or None."""
+        return cls.objects.filter(id=cls.latest_value(simulation_manager, stock, "id")).first()
+
     class Meta:
         verbose_name_plural = "Stock Price Histories"
-        ordering = ["timestamp"]
+        indexes = [
+            # Latest price of a stock in a simulation, or in the reference history: one index seek,
+            # and no table access where covering indexes exist. Candles sharing a timestamp are
+            # ordered by id, which the index also sorts.
+            models.Index(
+                fields=["simulation_manager", "stock", "-timestamp", "-id"],
+                include=["open_price", "high_price", "low_price", "close_price"],
+                name="price_history_latest_idx",
+            ),
+        ]
+
+
+class StockPriceRollup(models.Model):
+    """OHLC bar aggregating the raw candles of a stock over one period of ``resolution``."""
+
+    class Resolution(models.TextChoices):
+        ONE_MINUTE = "1m", "1 minute"
+        FIVE_MINUTES = "5m", "5 minutes"
+        ONE_HOUR = "1h", "1 hour"
+        ONE_DAY = "1d", "1 day"
+
+    simulation_manager = models.ForeignKey(
+        "SimulationManager", on_delete=models.CASCADE, null=True, blank=True, related_name="rollups"
+    )
+    stock = models.ForeignKey(
+        Stock, on_delete=models.CASCADE, related_name="rollups"
+    )
+    resolution = models.CharField(max_length=2, choices=Resolution.choices)
+    timestamp = models.DateTimeField()  # Start of the period
+    open_price = models.FloatField(default=0.0)
+    high_price = models.FloatField(default=0.0)
+    low_price = models.FloatField(default=0.0)
+    close_price = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f"{self.stock.company.name} {self.resolution} Bar at {self.timestamp}"
+
+    class Meta:
+        verbose_name_plural = "Stock Price Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["simulation_manager", "stock", "resolution", "timestamp"], name="price_rollup_bar_unique"
+            ),
+            # NULLs are distinct in the constraint above, reference bars need their own
+            models.UniqueConstraint(
+                fields=["stock", "resolution", "timestamp"],
+                condition=Q(simulation_manager__isnull=True),
+                name="price_rollup_reference_bar_unique",
+            ),
+        ]
+
+
+class StockQuote(models.Model):
+    """Latest candle of a stock in a simulation, upserted by the engine every tick."""
+    simulation_manager = models.ForeignKey(
+        "SimulationManager", on_delete=models.CASCADE, related_name="quotes"
+    )
+    stock = models.ForeignKey(
+        Stock, on_delete=models.CASCADE, related_name="quotes"
+    )
+    open_price = models.FloatField(default=0.0)
+    high_price = models.FloatField(default=0.0)
+    low_price = models.FloatField(default=0.0)
+    close_price = models.FloatField(default=0.0)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.stock.company.name} Quote at {self.timestamp}"
+
+    @classmethod
+    def latest_close(cls, simulation_manager, stock):
+        """
+        Expression of the latest close of ``stock`` in ``simulation_manager``: the close of its
+        quote, or of its latest price history row until the engine has quoted it.
+        """
+        return Coalesce(
+            Subquery(cls.objects.filter(
+                simulation_manager=simulation_manager, stock=stock
+            ).values("close_price")[:1]),
+            StockPriceHistory.latest_value(simulation_manager, stock, "close_price"),
+        )
+
+    class Meta:
+        verbose_name_plural = "Stock Quotes"
+        unique_together = ("simulation_manager", "stock")
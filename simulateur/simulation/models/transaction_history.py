@@ -26,3 +26,38 @@ class Order(models.Model):
 
     class Meta:
         verbose_name_plural = "Orders"
+
+
+class OrderRequest(models.Model):
+    """
+    A dynamic-trading order submitted by a client, waiting for the engine running its simulation.
+
+    The web processes insert the requests; the engine claims the pending ones of its simulation
+    with ``select_for_update(skip_locked=True)`` at every tick, checks them against its position
+    ledger and either rests them in its order books or rejects them. The id is the order id in
+    the books and in the order journal. Cancelling a pending request is immediate; an accepted
+    one is marked ``cancelling`` until the engine pulls it out of its book.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        ACCEPTED = 'accepted', 'Accepted'
+        REJECTED = 'rejected', 'Rejected'
+        CANCELLING = 'cancelling', 'Cancelling'
+        CANCELLED = 'cancelled', 'Cancelled'
+
+    simulation_manager = models.ForeignKey(SimulationManager, related_name='order_requests', on_delete=models.CASCADE)
+    user = models.ForeignKey('UserProfile', on_delete=models.CASCADE)
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE)
+    side = models.CharField(max_length=4, choices=[('BUY', 'Buy'), ('SELL', 'Sell')])
+    quantity = models.IntegerField()
+    price = models.FloatField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    message = models.CharField(max_length=255, blank=True, default='')
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.side} {self.quantity} {self.stock.ticker} at {self.price} ({self.status})'
+
+    class Meta:
+        indexes = [models.Index(fields=['simulation_manager', 'status', 'id'], name='order_request_pending_idx')]
@@ -18,12 +18,15 @@ class StockPriceHistorySerializer(serializers.ModelSerializer):
 
 
 class StockSerializer(serializers.ModelSerializer):
-    price_history = StockPriceHistorySerializer(many=True, read_only=True)
+    price_history = serializers.SerializerMethodField()
 
     class Meta:
         model = Stock
         fields = ['id', 'company', 'ticker', 'volatility', 'liquidity', 'price_history']
 
+    def get_price_history(self, stock):
+        return StockPriceHistorySerializer(stock.price_history.order_by('timestamp', 'id'), many=True).data
+
     def create(self, validated_data):
         company_data = validated_data.pop('company')
         company, created = Company.objects.get_or_create(**company_data)
@@ -1,14 +1,17 @@
 import json
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from simulation.logic.broker import Broker
+from simulation.logic.order_gateway import OrderGateway
 from simulation.models import (
-    Portfolio, Stock, Order, TransactionHistory, Scenario, UserProfile,
-    StockPriceHistory, Company, SimulationManager, SimulationSettings
+    Portfolio, Stock, Order, OrderRequest, TransactionHistory, Scenario, UserProfile,
+    StockPriceHistory, StockPortfolio, StockQuote, Company, SimulationManager, SimulationSettings
 )
 
 class BuyStockTests(TestCase):
@@ -227,3 +230,189 @@ class UserOrdersTests(TestCase):
         response = self.client.post(url, data=json.dumps(data), content_type='application/json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.json()['orders']), 0)
+
+
+class DynamicOrderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.user_profile = UserProfile.objects.create(user=self.user)
+
+        self.scenario = Scenario.objects.create(name="Dynamic Scenario")
+        self.simulation_settings = SimulationSettings.objects.create(stock_trading_logic='dynamic')
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=self.scenario,
+            simulation_settings=self.simulation_settings,
+        )
+        self.portfolio = Portfolio.objects.create(
+            owner=self.user_profile,
+            balance=Decimal("1000.00"),
+            simulation_manager=self.simulation_manager
+        )
+        self.company = Company.objects.create(name="Test Company")
+        self.stock = Stock.objects.create(ticker="AAPL", company=self.company)
+        StockPriceHistory.objects.create(stock=self.stock, close_price=100.0)
+
+        self.broker = Broker("Test")
+        patcher = patch('simulation.api.portfolio.order_gateway', OrderGateway(self.broker))
+        self.order_gateway = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client.login(username='testuser', password='password')
+
+    def post_buy(self, amount, price):
+        data = {
+            'stock_id': self.stock.id,
+            'simulation_manager_id': self.simulation_manager.id,
+            'amount': amount,
+            'price': price
+        }
+        return self.client.post(reverse('buy_stock'), data=json.dumps(data), content_type='application/json')
+
+    def test_buy_is_acknowledged_once_queued(self):
+        response = self.post_buy(5, 100.0)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order_request = OrderRequest.objects.get()
+        self.assertEqual(response.json(), {'status': 'accepted', 'order_id': order_request.id})
+        self.assertEqual(order_request.status, OrderRequest.Status.PENDING)
+        # Nothing is settled until the engine claims and fills the order
+        self.assertEqual(Order.objects.count(), 0)
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.balance, Decimal("1000.00"))
+        self.assertEqual(self.order_gateway.drain(self.simulation_manager.id), [order_request])
+
+    def test_buy_rejected_by_balance(self):
+        response = self.post_buy(20, 100.0)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['message'], 'Insufficient funds')
+
+    def test_cancel_resting_order(self):
+        order_id = self.post_buy(5, 100.0).json()['order_id']
+        self.order_gateway.drain(self.simulation_manager.id)
+
+        response = self.client.post(
+            reverse('cancel_order'), data=json.dumps({'order_id': order_id}), content_type='application/json'
+        )
+
+        self.assertEqual(response.json(), {'status': 'cancelling', 'order_id': order_id})
+        self.order_gateway.drain(self.simulation_manager.id)
+        self.assertEqual(OrderRequest.objects.get().status, OrderRequest.Status.CANCELLED)
+        self.assertEqual(len(self.broker.get_queue(self.stock.ticker)), 0)
+
+    def test_cancel_unknown_order(self):
+        response = self.client.post(
+            reverse('cancel_order'), data=json.dumps({'order_id': 404}), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['message'], 'Order not found')
+
+
+class StaticOrderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.user_profile = UserProfile.objects.create(user=self.user)
+
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Static Scenario"),
+            simulation_settings=SimulationSettings.objects.create(stock_trading_logic='static'),
+        )
+        self.portfolio = Portfolio.objects.create(
+            owner=self.user_profile,
+            balance=Decimal("1000.00"),
+            simulation_manager=self.simulation_manager
+        )
+        self.stock = Stock.objects.create(ticker="AAPL", company=Company.objects.create(name="Test Company"))
+        StockPriceHistory.objects.create(stock=self.stock, close_price=100.0)
+
+        self.client.login(username='testuser', password='password')
+
+    def post(self, name, amount, price):
+        data = {
+            'stock_id': self.stock.id,
+            'simulation_manager_id': self.simulation_manager.id,
+            'amount': amount,
+            'price': price
+        }
+        return self.client.post(reverse(name), data=json.dumps(data), content_type='application/json')
+
+    def test_buy_then_sell_are_written_back(self):
+        buy = self.post('buy_stock', 5, 100.0).json()
+        sell = self.post('sell_stock', 2, 110.0).json()
+        order_ids = Order.objects.order_by('id').values_list('id', flat=True)
+        self.assertEqual([buy, sell], [{'status': 'success', 'order_id': order_id} for order_id in order_ids])
+
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.balance, Decimal("720.00"))
+        self.assertEqual(self.portfolio.stockportfolio_set.get().quantity, 3)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_risk_checks_use_the_settled_portfolio(self):
+        self.assertEqual(self.post('buy_stock', 8, 100.0).status_code, status.HTTP_200_OK)
+
+        response = self.post('buy_stock', 3, 100.0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['message'], 'Insufficient funds')
+
+        response = self.post('sell_stock', 9, 100.0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['message'], 'Insufficient stock holdings')
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class LatestPriceQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='password')
+        self.user_profile = UserProfile.objects.create(user=self.user)
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Query Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        self.portfolio = Portfolio.objects.create(
+            owner=self.user_profile, balance=Decimal("1000.00"), simulation_manager=self.simulation_manager
+        )
+        self.company = Company.objects.create(name="Query Company")
+        self.stocks = [self.add_stock(f"QRY{i}") for i in range(3)]
+        self.client.login(username='testuser', password='password')
+
+    def add_stock(self, ticker):
+        stock = Stock.objects.create(ticker=ticker, company=self.company)
+        self.simulation_manager.stocks.add(stock)
+        first = StockPriceHistory.objects.create(stock=stock, close_price=100.0)
+        StockPriceHistory.objects.create(stock=stock, close_price=110.0)
+        StockPortfolio.objects.create(
+            portfolio=self.portfolio, stock=stock, quantity=1, latest_price_history=first
+        )
+        return stock
+
+    def holdings(self):
+        return self.client.post(
+            reverse('user_stock_holdings'),
+            data=json.dumps({'simulation_manager_id': self.simulation_manager.id}),
+            content_type='application/json'
+        )
+
+    def test_stock_price_is_a_single_lookup(self):
+        url = reverse('stock_price', args=[self.stocks[0].id])
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {'simulation_manager_id': self.simulation_manager.id})
+        self.assertEqual(response.json()['data']['close_price'], 110.0)
+
+    def test_holdings_queries_do_not_grow_with_the_holdings(self):
+        with self.assertNumQueries(9):
+            response = self.holdings()
+        self.assertEqual([row['latest_price'] for row in response.json()['holdings']], [110.0] * 3)
+
+        self.add_stock("QRY3")
+        with self.assertNumQueries(9):
+            self.assertEqual(len(self.holdings().json()['holdings']), 4)
+
+    def test_holdings_read_the_quote_of_the_simulation(self):
+        StockQuote.objects.create(simulation_manager=self.simulation_manager, stock=self.stocks[1], close_price=120.0)
+
+        response = self.holdings()
+        self.assertEqual([row['latest_price'] for row in response.json()['holdings']], [110.0, 120.0, 110.0])
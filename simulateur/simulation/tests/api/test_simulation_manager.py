@@ -1,7 +1,11 @@
+from unittest import skipUnless
+
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from simulation.logic.columnar import pa, pq
 from simulation.models import SimulationManager, Scenario, Stock, Team, Event, Trigger, News, SimulationSettings, Company
+from simulation.models import StockPriceHistory
 class SimulationManagerBaseTest(APITestCase):
     def setUp(self):
         # Create a company
@@ -114,3 +118,41 @@ class ChangeSimulationManagerStateTests(SimulationManagerBaseTest):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.simulation_manager.refresh_from_db()
         self.assertEqual(self.simulation_manager.state, SimulationManager.ScenarioState.INITIALIZED)
+
+@skipUnless(pa, "pyarrow is not installed")
+class SimulationManagerHistoryExportTests(SimulationManagerBaseTest):
+    def setUp(self):
+        super().setUp()
+        for close_price in (10.0, 11.0):
+            StockPriceHistory.objects.create(
+                simulation_manager=self.simulation_manager, stock=self.stock, close_price=close_price
+            )
+
+    def export_url(self, table):
+        return reverse('simulation_manager_history_export', kwargs={
+            'simulation_manager_id': self.simulation_manager.id, 'table': table
+        })
+
+    def test_streams_the_candles_as_parquet(self):
+        """Test that the candles download as a Parquet file."""
+        response = self.client.get(self.export_url('candles'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+
+        table = pq.read_table(pa.BufferReader(b''.join(response.streaming_content)))
+        self.assertEqual(table.column('close_price').to_pylist(), [10.0, 11.0])
+
+    def test_streams_the_orders_as_arrow(self):
+        """Test that the orders download as an Arrow IPC stream."""
+        response = self.client.get(self.export_url('orders'), {'file_format': 'arrow'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        table = pa.ipc.open_stream(b''.join(response.streaming_content)).read_all()
+        self.assertEqual(table.num_rows, 0)
+        self.assertIn('status', table.column_names)
+
+    def test_rejects_unknown_tables_and_formats(self):
+        """Test that an unknown table or format is a bad request."""
+        self.assertEqual(self.client.get(self.export_url('trades')).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.export_url('candles'), {'file_format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
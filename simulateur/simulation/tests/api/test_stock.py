@@ -1,7 +1,12 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
-from simulation.models import Stock, StockPriceHistory, Company
+from simulation.logic.rollups import rebuild_rollups
+from simulation.models import (
+    Stock, StockPriceHistory, Company, Scenario, SimulationManager, SimulationSettings
+)
 
 
 class StockManagementTests(APITestCase):
@@ -118,3 +123,42 @@ class StockPriceHistoryManagementTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['data']), 1)
         self.assertEqual(response.data['data'][0]['stock'], self.stock.ticker)
+
+
+class StockPriceHistoryViewTests(APITestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Chart Company")
+        self.stock = Stock.objects.create(company=self.company, ticker="CHRT")
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Chart Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        self.simulation_manager.stocks.add(self.stock)
+        start = datetime(2026, 1, 5, 9, 0, tzinfo=dt_timezone.utc)
+        candles = StockPriceHistory.objects.bulk_create([
+            StockPriceHistory(stock=self.stock, close_price=float(minute)) for minute in range(0, 600, 2)
+        ])
+        for candle, minute in zip(candles, range(0, 600, 2)):
+            StockPriceHistory.objects.filter(id=candle.id).update(timestamp=start + timedelta(minutes=minute))
+        rebuild_rollups()
+        self.url = reverse('stock-price-history', kwargs={'stock_id': self.stock.id})
+
+    def get(self, **params):
+        return self.client.get(self.url, {'simulation_manager_id': self.simulation_manager.id, **params})
+
+    def test_resolution_is_picked_from_the_range(self):
+        response = self.get()  # 10 hours of candles every 2 minutes, served as 1 minute bars
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']), 300)
+
+        response = self.get(start='2026-01-05T09:00:00Z', end='2026-01-05T09:10:00Z')
+        self.assertEqual([candle['close_price'] for candle in response.data['data']], [0.0, 2.0, 4.0, 6.0, 8.0, 10.0])
+
+    def test_requested_resolution(self):
+        response = self.get(resolution='1h')
+        self.assertEqual([candle['close_price'] for candle in response.data['data']][:2], [58.0, 118.0])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get(resolution='2m').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get(start='yesterday').status_code, status.HTTP_400_BAD_REQUEST)
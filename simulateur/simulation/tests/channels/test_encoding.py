@@ -0,0 +1,51 @@
+import json
+import msgpack
+from django.test import SimpleTestCase
+from simulation.channels.encoding import StockFrameEncoder, STOCK_FIELDS, negotiate_format
+
+
+def make_stock(stock_id, close, timestamp='2024-01-01T00:00:00+00:00'):
+    return {
+        'id': stock_id, 'simulation_manager': 1, 'ticker': f'T{stock_id}', 'name': f'T{stock_id} Inc.',
+        'type': 'stock', 'open': 10.0, 'high': 12.0, 'low': 9.0, 'close': close,
+        'current': close, 'timestamp': timestamp,
+    }
+
+
+class StockFrameEncoderTests(SimpleTestCase):
+
+    def test_unknown_format_falls_back_to_json(self):
+        self.assertEqual(negotiate_format('xml'), 'json')
+
+    def test_json_format_sends_one_object_per_stock(self):
+        encoder = StockFrameEncoder()
+        text_frames, bytes_frames = encoder.encode([make_stock(1, 10.0), make_stock(2, 11.0)])
+
+        self.assertEqual([json.loads(frame) for frame in text_frames], [make_stock(1, 10.0), make_stock(2, 11.0)])
+        self.assertEqual(bytes_frames, [])
+
+    def test_delta_sends_full_entry_then_changed_fields(self):
+        encoder = StockFrameEncoder('delta')
+        text_frames, _ = encoder.encode([make_stock(1, 10.0)])
+        first = json.loads(text_frames[0])[0]
+        self.assertEqual(first[0], 1)
+        self.assertEqual(dict(zip(first[1::2], first[2::2])),
+                         {i: make_stock(1, 10.0)[field] for i, field in enumerate(STOCK_FIELDS)})
+
+        text_frames, _ = encoder.encode([make_stock(1, 10.5, timestamp='later')])
+        close, current, timestamp = (STOCK_FIELDS.index(f) for f in ('close', 'current', 'timestamp'))
+        self.assertEqual(json.loads(text_frames[0]), [[1, close, 10.5, current, 10.5, timestamp, 'later']])
+
+    def test_unchanged_stocks_are_left_out(self):
+        encoder = StockFrameEncoder('delta')
+        encoder.encode([make_stock(1, 10.0)])
+        self.assertEqual(encoder.encode([make_stock(1, 10.0)]), ([], []))
+
+    def test_msgpack_frames_are_binary(self):
+        encoder = StockFrameEncoder('msgpack')
+        self.assertEqual(encoder.schema(), {'type': 'schema', 'format': 'msgpack', 'fields': list(STOCK_FIELDS)})
+
+        text_frames, bytes_frames = encoder.encode([make_stock(1, 10.0), make_stock(2, 11.0)])
+        self.assertEqual(text_frames, [])
+        entries = msgpack.unpackb(bytes_frames[0])
+        self.assertEqual([entry[0] for entry in entries], [1, 2])
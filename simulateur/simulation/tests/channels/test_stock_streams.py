@@ -0,0 +1,126 @@
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+from django.urls import re_path
+from simulation.channels.consumers import SimulationConsumer
+
+application = URLRouter([
+    re_path(r'ws/simulation/(?P<room_name>\w+)/$', SimulationConsumer.as_asgi()),
+])
+
+
+def make_stock(stock_id, ticker, close):
+    return {
+        'id': stock_id, 'simulation_manager': 1, 'ticker': ticker, 'name': f'{ticker} Inc.',
+        'type': 'stock', 'open': close, 'high': close, 'low': close, 'close': close,
+        'current': close, 'timestamp': '2024-01-01T00:00:00+00:00',
+    }
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class StockStreamTests(SimpleTestCase):
+
+    async def test_snapshot_is_unpacked_into_stock_frames(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/1/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        stocks = [make_stock(1, 'AAA', 10.0), make_stock(2, 'BBB', 20.0)]
+        await get_channel_layer().group_send('simulation_1', {
+            'type': 'stock_snapshot',
+            'message': {'timestamp': '2024-01-01T00:00:00+00:00', 'stocks': stocks},
+        })
+
+        self.assertEqual(await communicator.receive_json_from(), stocks[0])
+        self.assertEqual(await communicator.receive_json_from(), stocks[1])
+        await communicator.disconnect()
+
+    async def snapshot(self, group, *stocks):
+        await get_channel_layer().group_send(group, {
+            'type': 'stock_snapshot',
+            'message': {'timestamp': '2024-01-01T00:00:00+00:00', 'stocks': list(stocks)},
+        })
+
+    async def test_groups_are_per_simulation(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/2/")
+        await communicator.connect()
+
+        await self.snapshot('simulation_1', make_stock(1, 'AAA', 10.0))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_subscribe_filters_tickers(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/1/")
+        await communicator.connect()
+
+        await communicator.send_json_to({'type': 'subscribe', 'tickers': ['BBB', 'CCC']})
+        self.assertEqual(await communicator.receive_json_from(),
+                         {'type': 'subscription', 'tickers': ['BBB', 'CCC'], 'excluded': []})
+
+        await self.snapshot('simulation_1', make_stock(1, 'AAA', 10.0), make_stock(2, 'BBB', 20.0))
+        await get_channel_layer().group_send('simulation_1', {
+            'type': 'stock_update', 'message': make_stock(1, 'AAA', 11.0)
+        })
+        self.assertEqual((await communicator.receive_json_from())['ticker'], 'BBB')
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to({'type': 'unsubscribe', 'tickers': ['BBB']})
+        self.assertEqual((await communicator.receive_json_from())['tickers'], ['CCC'])
+        await communicator.disconnect()
+
+    async def test_unsubscribe_from_full_stream(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/1/")
+        await communicator.connect()
+
+        await communicator.send_json_to({'type': 'unsubscribe', 'tickers': ['AAA']})
+        self.assertEqual(await communicator.receive_json_from(),
+                         {'type': 'subscription', 'tickers': None, 'excluded': ['AAA']})
+
+        await self.snapshot('simulation_1', make_stock(1, 'AAA', 10.0), make_stock(2, 'BBB', 20.0))
+        self.assertEqual((await communicator.receive_json_from())['ticker'], 'BBB')
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to({'type': 'unsubscribe'})
+        self.assertEqual((await communicator.receive_json_from())['tickers'], [])
+        await communicator.disconnect()
+
+    async def test_depth_follows_subscriptions(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/1/")
+        await communicator.connect()
+        await communicator.send_json_to({'type': 'subscribe', 'tickers': ['BBB']})
+        await communicator.receive_json_from()
+
+        books = [
+            {'ticker': 'AAA', 'bids': [[9.0, 5]], 'asks': []},
+            {'ticker': 'BBB', 'bids': [[19.0, 5]], 'asks': [[21.0, 2]]},
+        ]
+        await get_channel_layer().group_send('simulation_1', {
+            'type': 'depth_update',
+            'message': {'timestamp': '2024-01-01T00:00:00+00:00', 'books': books},
+        })
+
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'depth', 'timestamp': '2024-01-01T00:00:00+00:00', 'books': [books[1]],
+        })
+        await communicator.disconnect()
+
+    async def test_compact_format_is_negotiated_on_connect(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/1/?format=delta")
+        await communicator.connect()
+
+        schema = await communicator.receive_json_from()
+        self.assertEqual(schema['type'], 'schema')
+        self.assertEqual(schema['format'], 'delta')
+
+        await self.snapshot('simulation_1', make_stock(1, 'AAA', 10.0), make_stock(2, 'BBB', 20.0))
+        frame = await communicator.receive_json_from()
+        self.assertEqual([entry[0] for entry in frame], [1, 2])
+        await communicator.disconnect()
+
+    async def test_json_stays_the_default(self):
+        communicator = WebsocketCommunicator(application, "/ws/simulation/1/")
+        await communicator.connect()
+
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
@@ -51,4 +51,13 @@ class TestBrownianMotion(unittest.TestCase):
 
         # Check low price
         self.assertLessEqual(result['Low'], result['Close'])
-        self.assertLessEqual(result['Low'], result['Open'])
\ No newline at end of file
+        self.assertLessEqual(result['Low'], result['Open'])
+
+    def test_generate_noise_batch(self):
+        prices = np.array([100.0, 50.0, 10.0])
+        result = self.noise_strategy.generate_noise_batch(prices, 0.5)
+
+        np.testing.assert_array_equal(result['Open'], prices)
+        self.assertEqual(result['Close'].shape, prices.shape)
+        self.assertTrue(np.all(result['High'] >= np.maximum(result['Open'], result['Close'])))
+        self.assertTrue(np.all(result['Low'] <= np.minimum(result['Open'], result['Close'])))
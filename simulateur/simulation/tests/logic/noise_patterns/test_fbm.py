@@ -49,3 +49,13 @@ class TestFbm(unittest.TestCase):
         # Ensure that close price is between the low and high prices
         self.assertGreaterEqual(result['Close'], result['Low'])
         self.assertLessEqual(result['Close'], result['High'])
+
+    def test_generate_noise_batch(self):
+        prices = np.array([100.0, 20.0, 5.0])
+        fluctuation_rates = np.array([0.5, 0.1, 0.01])
+        result = self.noise_strategy.generate_noise_batch(prices, fluctuation_rates)
+
+        np.testing.assert_array_equal(result['Open'], prices)
+        self.assertTrue(np.all(result['High'] <= prices + fluctuation_rates * 5))
+        self.assertTrue(np.all(result['Low'] >= prices - fluctuation_rates * 5))
+        self.assertTrue(np.all((result['Low'] <= result['Close']) & (result['Close'] <= result['High'])))
@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+from simulation.logic.noise_patterns.monte_carlo import MonteCarlo
+
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def setUp(self):
+        self.noise_strategy = MonteCarlo(num_simulations=50, time_horizon=5)
+
+    def test_generate_noise(self):
+        result = self.noise_strategy.generate_noise(100.0, 0.1)
+
+        self.assertEqual(result['Open'], 100.0)
+        self.assertGreaterEqual(result['High'], result['Close'])
+        self.assertLessEqual(result['Low'], result['Close'])
+
+    def test_generate_noise_batch(self):
+        prices = np.array([100.0, 50.0, 10.0, 1.0])
+        result = self.noise_strategy.generate_noise_batch(prices, 0.1)
+
+        np.testing.assert_array_equal(result['Open'], prices)
+        self.assertEqual(result['Close'].shape, prices.shape)
+        self.assertTrue(np.all(result['High'] >= result['Close']))
+        self.assertTrue(np.all(result['Low'] <= result['Close']))
+        self.assertTrue(np.all(result['Low'] > 0))
+
+    def test_single_step_horizon_keeps_price(self):
+        noise_strategy = MonteCarlo(num_simulations=10, time_horizon=1)
+        result = noise_strategy.generate_noise_batch([42.0, 7.0], 0.2)
+
+        np.testing.assert_array_equal(result['Close'], [42.0, 7.0])
+        np.testing.assert_array_equal(result['High'], [42.0, 7.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -36,5 +36,18 @@ class TestNoiseStrategy(unittest.TestCase):
         self.assertEqual(result['Close'], 100)
 
 
+    def test_generate_noise_batch_falls_back_to_scalar_method(self):
+        class ConcreteNoiseStrategy(NoiseStrategy):
+            def generate_noise(self, price, fluctuation_rate, time_index=None):
+                return {'Open': price, 'High': price + fluctuation_rate, 'Low': price - fluctuation_rate,
+                        'Close': price + time_index}
+
+        result = ConcreteNoiseStrategy().generate_noise_batch([100, 200], [5, 10], time_index=1)
+
+        self.assertEqual(list(result['High']), [105, 210])
+        self.assertEqual(list(result['Low']), [95, 190])
+        self.assertEqual(list(result['Close']), [101, 201])
+
+
 if __name__ == "__main__":
     unittest.main()
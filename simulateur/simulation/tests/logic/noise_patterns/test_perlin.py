@@ -59,5 +59,28 @@ class TestPerlinNoiseStrategy(unittest.TestCase):
         self.assertNotEqual(result_1["Close"], result_50["Close"])
         self.assertNotEqual(result_10["Close"], result_50["Close"])
 
+    def test_generate_noise_batch(self):
+        prices = np.array([100.0, 100.0, 100.0])
+        result = self.perlin.generate_noise_batch(prices, 0.05, 3)
+
+        np.testing.assert_array_equal(result["Open"], prices)
+        self.assertTrue(np.all(result["High"] >= np.maximum(result["Open"], result["Close"])))
+        self.assertTrue(np.all(result["Low"] <= np.minimum(result["Open"], result["Close"])))
+        # Each stock samples its own phase of the noise curve
+        self.assertEqual(len(set(result["Close"])), 3)
+
+    def test_stock_phase_follows_its_id(self):
+        result = self.perlin.generate_noise_batch([100.0, 100.0], 0.05, 3, stock_ids=[4, 9])
+        reordered = self.perlin.generate_noise_batch([100.0, 100.0, 100.0], 0.05, 3, stock_ids=[9, 2, 4])
+
+        self.assertEqual(result["Close"][0], reordered["Close"][2])
+        self.assertEqual(result["Close"][1], reordered["Close"][0])
+
+    def test_generate_noise_matches_first_batch_element(self):
+        expected_close = 100 + noise.pnoise1(3 * 0.1) * 0.05 * 10
+        result = self.perlin.generate_noise(100, 0.05, 3)
+        self.assertAlmostEqual(result["Close"], expected_close)
+
+
 if __name__ == "__main__":
     unittest.main()
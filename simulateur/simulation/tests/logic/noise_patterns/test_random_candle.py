@@ -43,5 +43,14 @@ class TestRandomCandleNoiseStrategy(unittest.TestCase):
 
         self.assertLess(low_fluctuation_change, high_fluctuation_change)
 
+    def test_generate_noise_batch(self):
+        prices = np.array([100.0, 20.0, 5.0])
+        result = self.random_candle.generate_noise_batch(prices, 0.05)
+
+        np.testing.assert_array_equal(result["Open"], prices)
+        self.assertTrue(np.all((result["Low"] <= result["Close"]) & (result["Close"] <= result["High"])))
+        self.assertTrue(np.all(result["High"] - result["Low"] <= 0.05 * 10))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -43,5 +43,15 @@ class TestRandomWalkNoiseStrategy(unittest.TestCase):
 
         self.assertLess(low_fluctuation_change, high_fluctuation_change)
 
+    def test_generate_noise_batch(self):
+        prices = np.array([100.0, 20.0, 5.0])
+        result = self.random_walk.generate_noise_batch(prices, 0.05)
+
+        np.testing.assert_array_equal(result["Open"], prices)
+        np.testing.assert_array_equal(result["High"], np.maximum(result["Open"], result["Close"]))
+        np.testing.assert_array_equal(result["Low"], np.minimum(result["Open"], result["Close"]))
+        self.assertTrue(np.all(np.abs(result["Close"] - prices) <= 0.05 * 5))
+
+
 if __name__ == "__main__":
     unittest.main()
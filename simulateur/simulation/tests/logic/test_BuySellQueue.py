@@ -1,75 +1,76 @@
-from django.test import TestCase
-from unittest.mock import MagicMock
-from collections import deque
-from django.utils import timezone
-from simulation.models import UserProfile, Stock, Order, TransactionHistory, Portfolio, Scenario, SimulationSettings
-from simulation.logic.broker import BuySellQueue
+from django.test import SimpleTestCase
+from unittest.mock import MagicMock, patch
+from simulation.logic.BuySellQueue import BuySellQueue
 
 
-class BuySellQueueTests(TestCase):
+class BuySellQueueTests(SimpleTestCase):
 
     def setUp(self):
-        # Set up necessary mock data
-        self.scenario = Scenario.objects.create(name="Test Scenario", description="Test", duration=100)
-        self.simulation_settings = SimulationSettings.objects.create(
-            timer_step=10,
-            timer_step_unit='minute',
-            interval=20,
-            interval_unit='minute',
-            max_interval=3000,
-            fluctuation_rate=0.1,
-            close_stock_market_at_night=True,
-            noise_function='brownian',
-            stock_trading_logic='dynamic',
-        )
-        self.scenario.simulation_settings = self.simulation_settings
-        self.scenario.save()
-
-        self.stock = Stock.objects.create(company_id=1, ticker="TEST", volatility=0.05, liquidity=0.5, price=100)
-        self.portfolio1 = Portfolio.objects.create(owner=None, balance=1000)
-        self.portfolio2 = Portfolio.objects.create(owner=None, balance=1000)
-
-        self.user_profile1 = UserProfile.objects.create(user_id=1, portfolio=self.portfolio1)
-        self.user_profile2 = UserProfile.objects.create(user_id=2, portfolio=self.portfolio2)
+        self.stock = MagicMock(ticker="TEST")
+        self.user_profile1 = MagicMock()
+        self.user_profile1.user.username = "buyer"
+        self.user_profile2 = MagicMock()
+        self.user_profile2.user.username = "seller"
+        self.simulation_manager = MagicMock()
 
         self.buy_sell_queue = BuySellQueue()
+        patcher = patch('simulation.logic.BuySellQueue.settle_fills', side_effect=self.summarize)
+        self.mock_settle_fills = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def summarize(fills):
+        return [
+            {
+                'buyer': fill.buy_order.user.user.username,
+                'seller': fill.sell_order.user.user.username,
+                'asset': fill.buy_order.asset.ticker,
+                'amount': fill.quantity,
+                'price': fill.price,
+            }
+            for fill in fills
+        ]
 
     def test_add_to_buy_queue(self):
-        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.scenario)
+        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.simulation_manager)
         self.assertEqual(len(self.buy_sell_queue.buy_queue), 1)
-        self.assertEqual(self.buy_sell_queue.buy_queue[0], (self.user_profile1, self.stock, 10, 100, self.scenario))
+        order = self.buy_sell_queue.buy_queue[0]
+        self.assertEqual((order.user, order.asset, order.quantity, order.price, order.simulation_manager),
+                         (self.user_profile1, self.stock, 10, 100, self.simulation_manager))
 
     def test_add_to_sell_queue(self):
-        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 95, self.scenario)
+        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 95, self.simulation_manager)
         self.assertEqual(len(self.buy_sell_queue.sell_queue), 1)
-        self.assertEqual(self.buy_sell_queue.sell_queue[0], (self.user_profile2, self.stock, 5, 95, self.scenario))
+        self.assertEqual(self.buy_sell_queue.sell_queue[0].price, 95)
 
     def test_process_queues_with_matching_prices(self):
-        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.scenario)
-        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 10, 100, self.scenario)
+        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.simulation_manager)
+        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 10, 100, self.simulation_manager)
 
         transactions = self.buy_sell_queue.process_queues()
 
         self.assertEqual(len(transactions), 1)
-        self.assertEqual(transactions[0]['buyer'], self.user_profile1.user.username)
-        self.assertEqual(transactions[0]['seller'], self.user_profile2.user.username)
-        self.assertEqual(transactions[0]['asset'], self.stock.name)
+        self.assertEqual(transactions[0]['buyer'], 'buyer')
+        self.assertEqual(transactions[0]['seller'], 'seller')
+        self.assertEqual(transactions[0]['asset'], 'TEST')
         self.assertEqual(transactions[0]['amount'], 10)
         self.assertEqual(transactions[0]['price'], 100)
+        self.mock_settle_fills.assert_called_once()
 
     def test_partial_transaction(self):
-        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.scenario)
-        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 100, self.scenario)
+        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.simulation_manager)
+        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 100, self.simulation_manager)
 
         transactions = self.buy_sell_queue.process_queues()
 
         self.assertEqual(len(transactions), 1)
         self.assertEqual(transactions[0]['amount'], 5)
         self.assertEqual(len(self.buy_sell_queue.buy_queue), 1)  # Remaining 5 in buy queue
+        self.assertEqual(self.buy_sell_queue.buy_queue[0].quantity, 5)
 
     def test_complete_transaction(self):
-        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 5, 100, self.scenario)
-        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 100, self.scenario)
+        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 5, 100, self.simulation_manager)
+        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 100, self.simulation_manager)
 
         transactions = self.buy_sell_queue.process_queues()
 
@@ -78,21 +79,22 @@ class BuySellQueueTests(TestCase):
         self.assertEqual(len(self.buy_sell_queue.sell_queue), 0)
 
     def test_process_queues_with_non_matching_prices(self):
-        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 90, self.scenario)
-        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 10, 100, self.scenario)
+        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 90, self.simulation_manager)
+        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 10, 100, self.simulation_manager)
 
         transactions = self.buy_sell_queue.process_queues()
 
         self.assertEqual(len(transactions), 0)  # No transactions should occur
+        # Both orders keep resting in the book instead of being dropped
+        self.assertEqual(len(self.buy_sell_queue.buy_queue), 1)
+        self.assertEqual(len(self.buy_sell_queue.sell_queue), 1)
 
-    def test_log_transaction(self):
-        self.buy_sell_queue.log_transaction = MagicMock()
-        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 10, 100, self.scenario)
-        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 10, 100, self.scenario)
+    def test_best_priced_order_is_matched_first(self):
+        self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 101, self.simulation_manager)
+        cheapest = self.buy_sell_queue.add_to_sell_queue(self.user_profile2, self.stock, 5, 99, self.simulation_manager)
+        self.buy_sell_queue.add_to_buy_queue(self.user_profile1, self.stock, 5, 100, self.simulation_manager)
 
         transactions = self.buy_sell_queue.process_queues()
 
-        self.assertTrue(self.buy_sell_queue.log_transaction.called)
-
-if __name__ == "__main__":
-    unittest.main()
+        self.assertEqual(transactions[0]['price'], 99)
+        self.assertNotIn(cheapest, self.buy_sell_queue.sell_queue)
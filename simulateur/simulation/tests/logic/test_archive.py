@@ -0,0 +1,91 @@
+import gzip
+import tempfile
+
+from django.test import TestCase
+
+from simulation.logic.archive import archive_paths, archive_simulation, finished_simulations, restore_simulation
+from simulation.logic.rollups import roll_up
+from simulation.models import (
+    Company, Portfolio, Scenario, SimulationManager, SimulationSettings, Stock, StockPortfolio, StockPriceHistory,
+    StockPriceRollup
+)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Archive Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+            state=SimulationManager.ScenarioState.FINISHED,
+        )
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Archive Company"), ticker="ARC")
+        self.candles = [
+            StockPriceHistory.objects.create(
+                simulation_manager=self.simulation_manager, stock=self.stock, close_price=10.0 + i
+            )
+            for i in range(3)
+        ]
+        self.reference = StockPriceHistory.objects.create(stock=self.stock, close_price=5.0)
+
+    def test_archive_moves_the_simulation_history_to_a_compressed_file(self):
+        count = archive_simulation(self.simulation_manager.id, self.directory)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(list(StockPriceHistory.objects.values_list("id", flat=True)), [self.reference.id])
+        paths = archive_paths(self.simulation_manager.id, self.directory)
+        self.assertEqual(len(paths), 1)
+        with gzip.open(paths[0], "rt") as archive:
+            self.assertEqual(len(archive.read().splitlines()), 3)
+
+    def test_archive_keeps_the_rows_held_by_a_portfolio(self):
+        StockPortfolio.objects.create(
+            stock=self.stock,
+            portfolio=Portfolio.objects.create(simulation_manager=self.simulation_manager),
+            quantity=1,
+            latest_price_history=self.candles[0],
+        )
+
+        self.assertEqual(archive_simulation(self.simulation_manager.id, self.directory), 2)
+        self.assertTrue(StockPriceHistory.objects.filter(id=self.candles[0].id).exists())
+        self.assertEqual(StockPortfolio.objects.count(), 1)
+
+    def test_archive_keeps_the_rollups(self):
+        roll_up(self.candles)
+        archive_simulation(self.simulation_manager.id, self.directory)
+        self.assertEqual(StockPriceRollup.objects.filter(simulation_manager=self.simulation_manager).count(), 4)
+
+    def test_restore_loads_the_archived_rows_back(self):
+        archive_simulation(self.simulation_manager.id, self.directory)
+
+        self.assertEqual(restore_simulation(self.simulation_manager.id, self.directory), 3)
+        self.assertEqual(
+            sorted(self.simulation_manager.price_history.values_list("timestamp", "close_price")),
+            sorted((candle.timestamp, candle.close_price) for candle in self.candles),
+        )
+        self.assertEqual(archive_paths(self.simulation_manager.id, self.directory), [])
+
+    def test_running_simulations_are_not_archived(self):
+        SimulationManager.objects.filter(id=self.simulation_manager.id).update(
+            state=SimulationManager.ScenarioState.ONGOING
+        )
+
+        with self.assertRaises(ValueError):
+            archive_simulation(self.simulation_manager.id, self.directory)
+        self.assertEqual(StockPriceHistory.objects.count(), 4)
+        self.assertEqual(archive_paths(self.simulation_manager.id, self.directory), [])
+
+    def test_finished_simulations_lists_those_with_hot_history(self):
+        self.simulation_manager.state = SimulationManager.ScenarioState.ONGOING
+        self.simulation_manager.save()
+        self.assertEqual(finished_simulations(), [])
+
+        self.simulation_manager.state = SimulationManager.ScenarioState.FINISHED
+        self.simulation_manager.save()
+        self.assertEqual(finished_simulations(), [self.simulation_manager.id])
+
+        archive_simulation(self.simulation_manager.id, self.directory)
+        self.assertEqual(finished_simulations(), [])
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase, TestCase
+
+from simulation.logic.benchmark import DATABASE_BACKEND, FLOWS, run_benchmark
+from simulation.models import Order, Stock
+
+
+class BenchmarkFlowTests(SimpleTestCase):
+
+    def test_every_flow_runs_in_memory(self):
+        for flow in FLOWS:
+            result = run_benchmark(flow, ticks=5, orders_per_tick=20)
+            self.assertGreater(result.orders, 0)
+            self.assertEqual(len(result.latencies), 5)
+            self.assertEqual(result.queries, 0)
+            self.assertGreaterEqual(result.latency_percentile(99), result.latency_percentile(50))
+
+    def test_flows_shape_the_fills(self):
+        self.assertEqual(run_benchmark("one_sided", ticks=5, orders_per_tick=20).fills, 0)
+        crossing = run_benchmark("crossing", ticks=5, orders_per_tick=20)
+        uniform = run_benchmark("uniform", ticks=5, orders_per_tick=20)
+        self.assertGreater(crossing.fills, uniform.fills)
+
+    def test_same_seed_replays_the_same_flow(self):
+        first = run_benchmark("bursty", ticks=10, orders_per_tick=20, seed=3)
+        second = run_benchmark("bursty", ticks=10, orders_per_tick=20, seed=3)
+        self.assertEqual((first.orders, first.fills), (second.orders, second.fills))
+
+    def test_rejects_unknown_flow(self):
+        with self.assertRaises(ValueError):
+            run_benchmark("random")
+
+
+class BenchmarkDatabaseTests(TestCase):
+
+    def test_database_backend_settles_and_rolls_back(self):
+        result = run_benchmark("crossing", DATABASE_BACKEND, ticks=3, orders_per_tick=20)
+
+        self.assertGreater(result.fills, 0)
+        self.assertGreater(result.queries_per_fill, 0)
+        self.assertFalse(Stock.objects.exists())
+        self.assertFalse(Order.objects.exists())
@@ -1,100 +1,112 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from unittest.mock import patch, MagicMock
 from simulation.logic.broker import Broker
-from simulation.models import Stock, UserProfile, Scenario, Portfolio, SimulationSettings
-from simulation.logic import BuySellQueue
+from django.contrib.auth.models import User
+from simulation.models import (
+    Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory, UserProfile
+)
+from simulation.logic.order_book import OrderBook
 
 
 class BrokerTests(TestCase):
 
     def setUp(self):
-        # Set up necessary mock data
-        self.scenario = Scenario.objects.create(name="Test Scenario", description="Test Description", duration=100)
-        self.simulation_settings = SimulationSettings.objects.create(
-            timer_step=10,
-            timer_step_unit='minute',
-            interval=20,
-            interval_unit='minute',
-            max_interval=3000,
-            fluctuation_rate=0.1,
-            close_stock_market_at_night=True,
-            noise_function='brownian',
-            stock_trading_logic='dynamic',
+        self.company = Company.objects.create(name="Test Company")
+        self.stock = Stock.objects.create(company=self.company, ticker="TEST", volatility=0.05, liquidity=0.5)
+        StockPriceHistory.objects.create(
+            stock=self.stock, open_price=100, high_price=105, low_price=95, close_price=100
         )
-        self.scenario.simulation_settings = self.simulation_settings
-        self.scenario.save()
-
-        self.stock = Stock.objects.create(company_id=1, ticker="TEST", volatility=0.05, liquidity=0.5, price=100,
-                                          low_price=95, high_price=105)
-        self.portfolio = Portfolio.objects.create(owner=None, balance=1000)
-        self.user_profile = UserProfile.objects.create(user_id=1, portfolio=self.portfolio)
+        self.user_profile = UserProfile.objects.create(user=User.objects.create(username="trader"))
 
         self.broker = Broker("Algo")
 
     def test_get_queue_creates_new_queue(self):
         queue = self.broker.get_queue(self.stock.ticker)
-        self.assertIsInstance(queue, BuySellQueue)
+        self.assertIsInstance(queue, OrderBook)
         self.assertEqual(len(self.broker.queues), 1)
 
-    def test_adjust_client_price_buy(self):
-        best_bid, best_ask = 100, 105
-        spread = 0.5
-        adjusted_price = self.broker.adjust_client_price(best_bid, best_ask, spread, "buy")
-        self.assertEqual(adjusted_price, 102.75)
-
-    def test_adjust_client_price_sell(self):
-        best_bid, best_ask = 100, 105
-        spread = 0.5
-        adjusted_price = self.broker.adjust_client_price(best_bid, best_ask, spread, "sell")
-        self.assertEqual(adjusted_price, 102.25)
-
-    @patch('simulation.logic.broker.Stock.objects.get')
-    def test_get_best_prices(self, mock_get):
-        mock_get.return_value = self.stock
+    def test_get_best_prices(self):
         best_bid, best_ask = self.broker.get_best_prices(self.stock.ticker)
-        self.assertEqual(best_bid, self.stock.low_price)
-        self.assertEqual(best_ask, self.stock.high_price)
+        self.assertEqual((best_bid, best_ask), (95, 105))
+
+    def test_get_best_prices_is_cached(self):
+        self.broker.get_best_prices(self.stock.ticker)
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertEqual(self.broker.get_best_prices(self.stock.ticker), (95, 105))
+
+    def test_get_quote_is_scoped_to_its_simulation(self):
+        simulations = [
+            SimulationManager.objects.create(
+                scenario=Scenario.objects.create(name=f"Scenario {i}"),
+                simulation_settings=SimulationSettings.objects.create(),
+            )
+            for i in range(2)
+        ]
+        StockPriceHistory.objects.create(
+            simulation_manager=simulations[1], stock=self.stock, open_price=50, high_price=55, low_price=45, close_price=50
+        )
 
-    @patch('simulation.logic.broker.Stock.objects.get')
-    def test_add_to_buysell_queue_buy(self, mock_get):
-        mock_get.return_value = self.stock
-        self.broker.add_to_buysell_queue(self.user_profile, self.stock.ticker, 10, 100, "buy")
-        queue = self.broker.get_queue(self.stock.ticker)
+        self.assertEqual(self.broker.get_best_prices(self.stock.ticker, simulations[0]), (95, 105))
+        self.assertEqual(Broker("Other").get_best_prices(self.stock.ticker, simulations[1]), (45, 55))
+        self.assertEqual(Broker("Reference").get_best_prices(self.stock.ticker), (95, 105))
 
-        self.assertEqual(len(queue.buy_queue), 1)
-        self.assertEqual(queue.buy_queue[0][0], self.user_profile)
-        self.assertEqual(queue.buy_queue[0][1], self.stock.ticker)
+    def test_get_best_prices_unknown_ticker(self):
+        with self.assertRaises(ValueError):
+            self.broker.get_best_prices("NOPE")
 
-    @patch('simulation.logic.broker.Stock.objects.get')
-    def test_add_to_buysell_queue_sell(self, mock_get):
-        mock_get.return_value = self.stock
-        self.broker.add_to_buysell_queue(self.user_profile, self.stock.ticker, 10, 100, "sell")
+    def test_get_best_prices_prefers_top_of_book(self):
         queue = self.broker.get_queue(self.stock.ticker)
-
-        self.assertEqual(len(queue.sell_queue), 1)
-        self.assertEqual(queue.sell_queue[0][0], self.user_profile)
-        self.assertEqual(queue.sell_queue[0][1], self.stock.ticker)
-
-    @patch('simulation.logic.broker.Stock.objects.get')
-    def test_add_to_buysell_queue_adjusts_high_price(self, mock_get):
-        mock_get.return_value = self.stock
-        self.broker.add_to_buysell_queue(self.user_profile, self.stock.ticker, 10, 110, "buy")
-        self.stock.refresh_from_db()
-        self.assertEqual(self.stock.high_price, 110)
-
-    @patch('simulation.logic.broker.Stock.objects.get')
-    def test_add_to_buysell_queue_adjusts_low_price(self, mock_get):
-        mock_get.return_value = self.stock
-        self.broker.add_to_buysell_queue(self.user_profile, self.stock.ticker, 10, 90, "sell")
-        self.stock.refresh_from_db()
-        self.assertEqual(self.stock.low_price, 90)
-
-    @patch('simulation.logic.broker.BuySellQueue.process_queues')
-    def test_process_queues(self, mock_process_queues):
+        queue.add_to_buy_queue(self.user_profile, self.stock.ticker, 1, 97)
+        queue.add_to_sell_queue(self.user_profile, self.stock.ticker, 1, 103)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.broker.get_best_prices(self.stock.ticker), (97, 103))
+
+    def test_update_quotes(self):
+        self.broker.update_quotes(["TEST"], {"Low": [90.0], "High": [91.0], "Close": [90.5]})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.broker.get_best_prices("TEST"), (90.0, 91.0))
+        self.assertEqual(self.broker.quotes["TEST"].last, 90.5)
+
+    def test_fills_move_quote(self):
+        self.broker.get_quote("TEST")
+        queue = self.broker.get_queue("TEST")
+        queue.add_to_sell_queue("seller", "TEST", 1, 110)
+        queue.add_to_buy_queue("buyer", "TEST", 1, 110)
+        self.broker.match_books()
+
+        quote = self.broker.quotes["TEST"]
+        self.assertEqual((quote.bid, quote.ask, quote.last), (95, 110, 110))
+
+    @patch('simulation.logic.broker.settle_fills')
+    @patch('simulation.logic.broker.BuySellQueue.match')
+    def test_process_queues(self, mock_match, mock_settle_fills):
         queue = self.broker.get_queue(self.stock.ticker)
         self.broker.process_queues()
 
-        self.assertTrue(mock_process_queues.called)
+        self.assertTrue(mock_match.called)
+        mock_settle_fills.assert_called_once()
+
+class BrokerMatchingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.broker = Broker("Matching")
+
+    def add_crossing_orders(self, ticker, count):
+        queue = self.broker.get_queue(ticker)
+        for i in range(count):
+            queue.add_to_sell_queue(f'seller{i}', ticker, 1, 100.0 + i)
+        queue.add_to_buy_queue('buyer', ticker, count, 100.0 + count)
+
+    def test_fills_merge_by_ticker_then_sequence(self):
+        for ticker in ('ZZZ', 'AAA', 'MMM'):
+            self.add_crossing_orders(ticker, 3)
+
+        fills = self.broker.match_books()
+
+        self.assertEqual([(fill.buy_order.asset, fill.price) for fill in fills], [
+            (ticker, 100.0 + i) for ticker in ('AAA', 'MMM', 'ZZZ') for i in range(3)
+        ])
 
 if __name__ == "__main__":
     unittest.main()
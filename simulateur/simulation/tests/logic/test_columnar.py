@@ -0,0 +1,110 @@
+import tempfile
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from simulation.logic.columnar import (
+    ARROW_FORMAT, CANDLES, FILLS, ORDERS, PARQUET_FORMAT, export_table, import_candles, pa, pq, seed_simulation,
+    stream_table
+)
+from simulation.logic.settlement import link_orders
+from simulation.models import (
+    Company, Order, OrderRequest, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory,
+    StockPriceRollup, TransactionHistory, UserProfile
+)
+
+
+@skipUnless(pa, "pyarrow is not installed")
+class ColumnarTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.scenario = Scenario.objects.create(name="Columnar Scenario")
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=self.scenario, simulation_settings=SimulationSettings.objects.create()
+        )
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Columnar Company"), ticker="COL")
+        self.candles = [
+            StockPriceHistory.objects.create(
+                simulation_manager=self.simulation_manager, stock=self.stock, close_price=10.0 + i
+            )
+            for i in range(5)
+        ]
+        StockPriceHistory.objects.create(stock=self.stock, close_price=1.0)  # Reference history, not exported
+
+    def test_export_writes_one_row_group_per_chunk(self):
+        path, count = export_table(self.simulation_manager.id, CANDLES, PARQUET_FORMAT, self.directory, chunk_size=2)
+
+        self.assertEqual(count, 5)
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.column("ticker").to_pylist(), ["COL"] * 5)
+        self.assertEqual(table.column("close_price").to_pylist(), [10.0, 11.0, 12.0, 13.0, 14.0])
+        self.assertEqual(table.column("timestamp").to_pylist(), [candle.timestamp for candle in self.candles])
+
+    def test_export_fills_of_the_simulation(self):
+        user = UserProfile.objects.create(user=User.objects.create(username="columnar"))
+        orders = [
+            Order.objects.create(user=user, stock=self.stock, quantity=3, price=10.0, transaction_type=side)
+            for side in ("BUY", "SELL")
+        ]
+        Order.objects.create(user=user, stock=self.stock, quantity=1, price=9.0)  # Not settled in the simulation
+        link_orders(orders, [self.simulation_manager] * 2, {self.simulation_manager.id: self.simulation_manager})
+        # A second history of the simulation listing the same fills does not duplicate them
+        TransactionHistory.objects.create(simulation_manager=self.simulation_manager).orders.add(*orders)
+
+        path, count = export_table(self.simulation_manager.id, FILLS, ARROW_FORMAT, self.directory)
+
+        self.assertEqual(count, 2)
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_stream(source).read_all()
+        self.assertEqual(sorted(table.column("transaction_type").to_pylist()), ["BUY", "SELL"])
+        self.assertEqual(table.column("user_id").to_pylist(), [user.id] * 2)
+
+    def test_export_orders_in_every_status(self):
+        user = UserProfile.objects.create(user=User.objects.create(username="columnar"))
+        for order_status in (OrderRequest.Status.PENDING, OrderRequest.Status.CANCELLED, OrderRequest.Status.ACCEPTED):
+            OrderRequest.objects.create(
+                simulation_manager=self.simulation_manager, user=user, stock=self.stock, side="BUY", quantity=2,
+                price=10.0, status=order_status,
+            )
+
+        path, count = export_table(self.simulation_manager.id, ORDERS, PARQUET_FORMAT, self.directory)
+
+        self.assertEqual(count, 3)
+        table = pq.read_table(path)
+        self.assertEqual(table.column("status").to_pylist(), ["pending", "cancelled", "accepted"])
+        self.assertEqual(table.column("side").to_pylist(), ["BUY"] * 3)
+
+    def test_stream_matches_the_file(self):
+        path, _ = export_table(self.simulation_manager.id, CANDLES, ARROW_FORMAT, self.directory, chunk_size=2)
+        streamed = b"".join(stream_table(self.simulation_manager.id, CANDLES, ARROW_FORMAT, chunk_size=2))
+
+        with open(path, "rb") as exported:
+            self.assertEqual(streamed, exported.read())
+
+    def test_seed_a_new_simulation_from_an_export(self):
+        for file_format in (PARQUET_FORMAT, ARROW_FORMAT):
+            path, _ = export_table(self.simulation_manager.id, CANDLES, file_format, self.directory, chunk_size=2)
+
+            simulation_manager, count = seed_simulation(path, self.scenario, chunk_size=2)
+
+            self.assertEqual(count, 5)
+            self.assertEqual(list(simulation_manager.stocks.all()), [self.stock])
+            self.assertEqual(
+                list(simulation_manager.price_history.order_by("timestamp").values_list("timestamp", "close_price")),
+                [(candle.timestamp, candle.close_price) for candle in self.candles],
+            )
+            self.assertTrue(StockPriceRollup.objects.filter(simulation_manager=simulation_manager).exists())
+
+    def test_import_rejects_unknown_tickers(self):
+        path, _ = export_table(self.simulation_manager.id, CANDLES, PARQUET_FORMAT, self.directory)
+        self.stock.ticker = "GONE"
+        self.stock.save()
+
+        with self.assertRaisesMessage(ValueError, "Unknown tickers: COL"):
+            import_candles(path, self.simulation_manager)
@@ -0,0 +1,114 @@
+import threading
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.test import TestCase, override_settings
+from simulation.logic.control import (
+    ControlChannel, notify_simulation_change, control_group_name, CONTROL_MESSAGE_TYPE
+)
+from simulation.logic.simulation_manager import SimulationManager
+from simulation.models import Scenario, SimulationSettings, SimulationManager as SM
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ControlChannelTests(TestCase):
+
+    def test_local_delivery(self):
+        control = ControlChannel(42, use_channel_layer=False)
+        control.start()
+        try:
+            notify_simulation_change(42, state=SM.ScenarioState.STOPPED)
+            self.assertTrue(control.wait(1))
+            messages = control.drain()
+        finally:
+            control.stop()
+
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]['state'], SM.ScenarioState.STOPPED)
+        self.assertFalse(control.wakeup.is_set())
+
+    def test_stopped_channel_receives_nothing(self):
+        control = ControlChannel(43, use_channel_layer=False)
+        control.start()
+        control.stop()
+        notify_simulation_change(43, state=SM.ScenarioState.STOPPED)
+        self.assertFalse(control.wait(0))
+
+    def test_channel_layer_delivery_from_other_process(self):
+        channel_layer = InMemoryChannelLayer()
+        control = ControlChannel(44, channel_layer=channel_layer)
+        control.start()
+        try:
+            # Give the listener a moment to join the group, then publish as another process would
+            for _ in range(50):
+                async_to_sync(channel_layer.group_send)(control_group_name(44), {
+                    'type': CONTROL_MESSAGE_TYPE,
+                    'message': {'simulation_manager': 44, 'state': 'stopped', 'settings_changed': False,
+                                'origin': -1},
+                })
+                if control.wait(0.05):
+                    break
+            messages = control.drain()
+        finally:
+            control.stop()
+
+        self.assertEqual(messages[0]['state'], 'stopped')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class SimulationManagerControlTests(TestCase):
+
+    def setUp(self):
+        self.simulation_settings = SimulationSettings.objects.create(
+            timer_step=10, timer_step_unit='second', close_stock_market_at_night=False
+        )
+        self.scenario = Scenario.objects.create(name="Control Scenario")
+        self.simulation_manager_model = SM.objects.create(
+            scenario=self.scenario,
+            simulation_settings=self.simulation_settings,
+            state=SM.ScenarioState.ONGOING
+        )
+        self.simulation_manager = SimulationManager(self.simulation_manager_model)
+        self.simulation_manager.control.use_channel_layer = False
+
+    def test_save_pushes_state_change_on_commit(self):
+        control = ControlChannel(self.simulation_manager_model.id, use_channel_layer=False)
+        control.start()
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.simulation_manager_model.state = SM.ScenarioState.STOPPED
+                self.simulation_manager_model.save()
+            messages = control.drain()
+        finally:
+            control.stop()
+
+        self.assertEqual(messages[-1]['state'], SM.ScenarioState.STOPPED)
+
+    def test_settings_change_is_applied(self):
+        self.simulation_settings.timer_step = 2
+        self.simulation_settings.save()
+        self.simulation_manager.control.deliver({'state': None, 'settings_changed': True})
+
+        self.simulation_manager.handle_control_messages()
+
+        self.assertEqual(self.simulation_manager.time_step, 2)
+        self.assertEqual(self.simulation_manager.scheduler.period, 2)
+
+    def test_running_simulation_stops_on_push_without_polling(self):
+        with patch.object(self.simulation_manager, 'run_tick', return_value=True) as mock_run_tick, \
+                patch.object(self.simulation_manager.simulation_manager, 'refresh_from_db') as mock_refresh:
+            thread = threading.Thread(target=self.simulation_manager.start_simulation)
+            thread.start()
+            while not mock_run_tick.called:
+                thread.join(0.01)
+
+            notify_simulation_change(self.simulation_manager_model.id, state=SM.ScenarioState.STOPPED)
+            thread.join(2)
+
+        # The 10 second tick period did not delay the stop and the loop never polled the database
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(self.simulation_manager.running)
+        mock_refresh.assert_not_called()
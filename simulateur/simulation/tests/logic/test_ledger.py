@@ -0,0 +1,90 @@
+import threading
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from simulation.logic.ledger import OrderRejected, PositionLedger
+from simulation.logic.order_book import BUY, SELL
+from simulation.models import (
+    Company, Portfolio, Scenario, SimulationManager, SimulationSettings, Stock, StockPortfolio, UserProfile
+)
+
+
+class PositionLedgerTests(TestCase):
+
+    def setUp(self):
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Ledger Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Ledger Company"), ticker="LDG")
+        self.buyer = UserProfile.objects.create(user=User.objects.create(username="buyer"))
+        self.seller = UserProfile.objects.create(user=User.objects.create(username="seller"))
+        Portfolio.objects.create(owner=self.buyer, simulation_manager=self.simulation_manager, balance=1000)
+        seller_portfolio = Portfolio.objects.create(
+            owner=self.seller, simulation_manager=self.simulation_manager, balance=0
+        )
+        StockPortfolio.objects.create(portfolio=seller_portfolio, stock=self.stock, quantity=10)
+
+        self.ledger = PositionLedger(self.simulation_manager.id)
+
+    def test_loads_the_simulation_with_two_queries(self):
+        with self.assertNumQueries(2):
+            self.ledger.load()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ledger.available_cash(self.buyer.id), Decimal(1000))
+            self.assertEqual(self.ledger.available_shares(self.seller.id, self.stock.id), 10)
+            self.assertEqual(self.ledger.available_shares(self.buyer.id, self.stock.id), 0)
+
+    def test_loads_users_seen_after_the_rebuild(self):
+        self.ledger.load()
+        newcomer = UserProfile.objects.create(user=User.objects.create(username="newcomer"))
+        Portfolio.objects.create(owner=newcomer, simulation_manager=self.simulation_manager, balance=50)
+
+        self.assertEqual(self.ledger.available_cash(newcomer.id), Decimal(50))
+
+    def test_users_without_portfolio_are_looked_up_again(self):
+        self.ledger.load()
+        newcomer = UserProfile.objects.create(user=User.objects.create(username="newcomer"))
+        self.assertEqual(self.ledger.available_cash(newcomer.id), Decimal(0))
+
+        Portfolio.objects.create(owner=newcomer, simulation_manager=self.simulation_manager, balance=50)
+
+        self.assertEqual(self.ledger.available_cash(newcomer.id), Decimal(50))
+
+    def test_reserve_rejects_and_release_restores(self):
+        self.ledger.reserve(BUY, self.buyer.id, self.stock.id, 9, 100)
+        with self.assertRaisesMessage(OrderRejected, "Insufficient funds"):
+            self.ledger.reserve(BUY, self.buyer.id, self.stock.id, 1, 100.01)
+        with self.assertRaisesMessage(OrderRejected, "Insufficient stock holdings"):
+            self.ledger.reserve(SELL, self.seller.id, self.stock.id, 11, 10)
+
+        self.ledger.release(BUY, self.buyer.id, self.stock.id, 9, 100)
+        self.assertEqual(self.ledger.available_cash(self.buyer.id), Decimal(1000))
+
+    def test_concurrent_reservations_never_overspend(self):
+        self.ledger.load()
+        accepted = []
+
+        def buy():
+            for _ in range(50):
+                try:
+                    self.ledger.reserve(BUY, self.buyer.id, self.stock.id, 1, 7)
+                    accepted.append(1)
+                except OrderRejected:
+                    pass
+
+        threads = [threading.Thread(target=buy) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(accepted), 142)
+        self.assertEqual(self.ledger.available_cash(self.buyer.id), Decimal(6))
+
+    def test_credit_skips_users_not_loaded_yet(self):
+        self.ledger.credit(self.buyer.id, self.stock.id, cash=Decimal(5))
+        self.assertEqual(self.ledger.available_cash(self.buyer.id), Decimal(1000))
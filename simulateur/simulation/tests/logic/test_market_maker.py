@@ -0,0 +1,206 @@
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from simulation.logic.broker import Broker
+from simulation.logic.market_maker import MarketMaker
+from simulation.logic.order_book import BUY, SELL
+from simulation.logic.order_gateway import OrderGateway
+from simulation.logic.order_journal import OrderJournals
+from simulation.models import (
+    Company, Portfolio, Scenario, SimulationManager, SimulationSettings, Stock, StockPortfolio, UserProfile
+)
+
+
+class MarketMakerTests(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Maker Company")
+        self.stocks = [
+            Stock.objects.create(company=company, ticker="AAA", volatility=0.05),
+            Stock.objects.create(company=company, ticker="BBB", volatility=0.05),
+        ]
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Maker Scenario"),
+            simulation_settings=SimulationSettings.objects.create(stock_trading_logic='dynamic'),
+        )
+        self.broker = Broker("Maker")
+        self.gateway = OrderGateway(self.broker)
+        self.market_maker = self.make_market_maker()
+
+    def make_market_maker(self, **kwargs):
+        kwargs = {"quote_size": 10, "max_inventory": 20, "window": 5, **kwargs}
+        return MarketMaker(self.gateway, self.simulation_manager, **kwargs)
+
+    def quotes(self, ticker):
+        book = self.broker.get_queue(ticker)
+        return book.best_bid(), book.best_ask()
+
+    def test_quotes_both_sides_around_mid(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+
+        # half spread = mid * (k * sigma + c) / 2 = mid * (0.5 * 0.05 + 0.01) / 2
+        bid, ask = self.quotes("AAA")
+        self.assertEqual((bid.price, ask.price), (98.25, 101.75))
+        self.assertEqual((bid.quantity, ask.quantity), (10, 10))
+        bid, ask = self.quotes("BBB")
+        self.assertEqual((bid.price, ask.price), (49.12, 50.88))
+        self.assertLess(bid.order_id, 0)
+        self.assertEqual(bid.user, self.market_maker.user)
+
+    def test_requote_replaces_previous_quotes(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        with self.assertNumQueries(0):
+            self.market_maker.quote(self.stocks, [110.0, 50.0])
+
+        book = self.broker.get_queue("AAA")
+        self.assertEqual(len(book), 2)
+        self.assertEqual(book.best_bid().price, 108.08)
+
+    def test_fills_skew_quotes_against_inventory(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        self.broker.get_queue("AAA").add(SELL, "client", self.stocks[0], 10, 98.0)
+        self.assertEqual(len(self.broker.match_books()), 1)
+
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+
+        self.assertEqual(self.market_maker.inventory[self.market_maker.index[self.stocks[0].id]], 10)
+        bid, ask = self.quotes("AAA")
+        # Long inventory moves both quotes down to attract buyers
+        self.assertLess(bid.price, 98.25)
+        self.assertLess(ask.price, 101.75)
+        self.assertEqual(self.quotes("BBB")[0].price, 49.12)
+
+    def test_stops_bidding_at_max_inventory(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        for _ in range(2):
+            self.broker.get_queue("AAA").add(SELL, "client", self.stocks[0], 10, 90.0)
+            self.broker.match_books()
+            self.market_maker.quote(self.stocks, [100.0, 50.0])
+
+        bid, ask = self.quotes("AAA")
+        self.assertIsNone(bid)
+        self.assertEqual(ask.side, SELL)
+
+    def test_caps_quote_size_at_the_inventory_left(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        self.broker.get_queue("AAA").add(SELL, "client", self.stocks[0], 4, 90.0)
+        self.broker.match_books()
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        self.broker.get_queue("AAA").add(SELL, "client", self.stocks[0], 10, 90.0)
+        self.broker.match_books()
+
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+
+        # 14 shares held out of 20: the bid is cut to 6 so a fill cannot overshoot the limit
+        bid, ask = self.quotes("AAA")
+        self.assertEqual((bid.quantity, ask.quantity), (6, 10))
+
+    def test_stops_bidding_without_cash(self):
+        market_maker = self.make_market_maker(capital=1400)
+        market_maker.quote(self.stocks, [100.0, 50.0])
+
+        # 10 AAA at 98.25 leave 417.50, short of the 491.20 of the BBB bid
+        self.assertEqual(self.quotes("AAA")[0].quantity, 10)
+        self.assertIsNone(self.quotes("BBB")[0])
+
+        self.broker.get_queue("AAA").add(SELL, "client", self.stocks[0], 10, 90.0)
+        self.broker.match_books()
+        market_maker.quote(self.stocks, [100.0, 50.0])
+
+        self.assertEqual(market_maker.cash, 1400 - 982.5)
+        bid, ask = self.quotes("AAA")
+        self.assertIsNone(bid)
+        self.assertEqual(ask.quantity, 10)
+
+    def test_uses_realized_volatility_once_window_is_full(self):
+        for _ in range(5):
+            self.market_maker.quote(self.stocks, [100.0, 50.0])
+
+        # Flat prices: the spread shrinks to the fixed costs
+        bid, ask = self.quotes("AAA")
+        self.assertEqual((bid.price, ask.price), (99.5, 100.5))
+
+    def test_skips_stocks_without_price(self):
+        self.market_maker.quote(self.stocks, [0.0, 50.0])
+
+        self.assertEqual(len(self.broker.get_queue("AAA")), 0)
+        self.assertEqual(len(self.broker.get_queue("BBB")), 2)
+
+    def test_withdraw_cancels_resting_quotes(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        self.market_maker.withdraw()
+
+        for stock in self.stocks:
+            self.assertEqual(len(self.broker.get_queue(stock.ticker)), 0)
+        self.assertEqual(self.market_maker.resting, {})
+
+    def test_portfolio_is_funded_with_the_capital(self):
+        client = UserProfile.objects.create(user=User.objects.create(username="client"))
+        client_portfolio = Portfolio.objects.create(owner=client, simulation_manager=self.simulation_manager)
+        StockPortfolio.objects.create(portfolio=client_portfolio, stock=self.stocks[0], quantity=10)
+        market_maker = self.make_market_maker(capital=5000)
+        market_maker.quote(self.stocks, [100.0, 50.0])
+
+        self.broker.get_queue("AAA").add(SELL, client, self.stocks[0], 10, 98.0, self.simulation_manager)
+        self.broker.process_queues()
+
+        portfolio = Portfolio.objects.get(owner=market_maker.user, simulation_manager=self.simulation_manager)
+        self.assertEqual(portfolio.balance, Decimal('4017.50'))
+        self.assertEqual(StockPortfolio.objects.get(portfolio=portfolio).quantity, 10)
+
+    def test_quotes_reserve_and_release_through_the_gateway(self):
+        self.market_maker.quote(self.stocks, [100.0, 50.0])
+        ledger = self.gateway.ledgers.get(self.simulation_manager.id)
+        # 10 AAA at 98.25 and 10 BBB at 49.12 are held, 10 of each are sold short
+        self.assertEqual(ledger.cash[self.market_maker.user.id], Decimal('1000000') - Decimal('1473.7'))
+        self.assertEqual(ledger.shares[(self.market_maker.user.id, self.stocks[0].id)], -10)
+
+        self.market_maker.withdraw()
+
+        self.assertEqual(ledger.cash[self.market_maker.user.id], Decimal('1000000'))
+        self.assertEqual(ledger.shares[(self.market_maker.user.id, self.stocks[0].id)], 0)
+
+
+class MarketMakerJournalTests(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Maker Company"), ticker="AAA")
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Maker Scenario"),
+            simulation_settings=SimulationSettings.objects.create(stock_trading_logic='dynamic'),
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.gateway = self.make_gateway()
+
+    def make_gateway(self):
+        journals = OrderJournals(self.directory.name, segment_size=4096, snapshot_every=1000)
+        self.addCleanup(journals.close)
+        return OrderGateway(Broker("Maker"), journals=journals)
+
+    def test_quotes_are_journaled_and_replaced_after_a_restart(self):
+        MarketMaker(self.gateway, self.simulation_manager).quote([self.stock], [100.0])
+        posted = {order.order_id for order in self.gateway.broker.get_queue("AAA").orders.values()}
+        orders, _ = self.gateway.journal(self.simulation_manager.id).load()
+        self.assertEqual({order[1] for order in orders}, posted)
+
+        self.gateway.journals.close()
+        self.gateway = self.make_gateway()
+        self.gateway.drain(self.simulation_manager.id)
+        book = self.gateway.broker.get_queue("AAA")
+        self.assertEqual(set(book.orders), posted)
+
+        market_maker = MarketMaker(self.gateway, self.simulation_manager)
+        market_maker.quote([self.stock], [100.0])
+
+        # The recovered quotes are cancelled and the new ones get ids of their own
+        self.assertEqual(len(book), 2)
+        self.assertTrue(set(book.orders).isdisjoint(posted))
+        self.assertEqual(book.best_bid().side, BUY)
+        ledger = self.gateway.ledgers.get(self.simulation_manager.id)
+        self.assertEqual(
+            ledger.cash[market_maker.user.id], Decimal('1000000') - 10 * Decimal(str(book.best_bid().price))
+        )
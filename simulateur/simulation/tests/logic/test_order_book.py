@@ -0,0 +1,106 @@
+from django.test import SimpleTestCase
+from simulation.logic.order_book import OrderBook, BUY, SELL
+
+
+class OrderBookTests(SimpleTestCase):
+
+    def setUp(self):
+        self.book = OrderBook()
+
+    def test_best_prices_follow_price_priority(self):
+        self.book.add(BUY, 'a', 'TEST', 10, 99.0)
+        best_buy = self.book.add(BUY, 'b', 'TEST', 10, 101.0)
+        self.book.add(SELL, 'c', 'TEST', 10, 105.0)
+        best_sell = self.book.add(SELL, 'd', 'TEST', 10, 103.0)
+
+        self.assertIs(self.book.best_bid(), best_buy)
+        self.assertIs(self.book.best_ask(), best_sell)
+        self.assertEqual(self.book.depth(BUY), [(101.0, 10), (99.0, 10)])
+        self.assertEqual(self.book.depth(SELL, levels=1), [(103.0, 10)])
+
+    def test_non_crossing_orders_rest(self):
+        self.book.add(BUY, 'a', 'TEST', 10, 90.0)
+        self.book.add(SELL, 'b', 'TEST', 10, 100.0)
+
+        self.assertEqual(self.book.match(), [])
+        self.assertEqual(len(self.book), 2)
+
+    def test_time_priority_within_a_level(self):
+        first = self.book.add(SELL, 'a', 'TEST', 5, 100.0)
+        second = self.book.add(SELL, 'b', 'TEST', 5, 100.0)
+        self.book.add(BUY, 'c', 'TEST', 7, 100.0)
+
+        fills = self.book.match()
+
+        self.assertEqual([(fill.sell_order, fill.quantity) for fill in fills], [(first, 5), (second, 2)])
+        self.assertIs(self.book.best_ask(), second)
+        self.assertEqual(second.quantity, 3)
+
+    def test_trades_at_resting_price_across_levels(self):
+        self.book.add(SELL, 'a', 'TEST', 5, 100.0)
+        self.book.add(SELL, 'b', 'TEST', 5, 101.0)
+        self.book.add(SELL, 'c', 'TEST', 5, 105.0)
+        buy = self.book.add(BUY, 'd', 'TEST', 12, 102.0)
+
+        fills = self.book.match()
+
+        self.assertEqual([(fill.price, fill.quantity) for fill in fills], [(100.0, 5), (101.0, 5)])
+        self.assertIs(self.book.best_bid(), buy)
+        self.assertEqual(buy.quantity, 2)
+        self.assertEqual(self.book.best_ask().price, 105.0)
+
+    def test_unmatch_restores_the_book(self):
+        first = self.book.add(SELL, 'a', 'TEST', 5, 100.0)
+        second = self.book.add(SELL, 'b', 'TEST', 5, 100.0)
+        third = self.book.add(SELL, 'c', 'TEST', 5, 101.0)
+        buy = self.book.add(BUY, 'd', 'TEST', 12, 101.0)
+
+        self.book.unmatch(self.book.match())
+
+        self.assertEqual([order.order_id for order in self.book.asks[100.0]], [first.order_id, second.order_id])
+        self.assertEqual(self.book.depth(SELL), [(100.0, 10), (101.0, 5)])
+        self.assertEqual(self.book.depth(BUY), [(101.0, 12)])
+        self.assertEqual((first.quantity, second.quantity, buy.quantity), (5, 5, 12))
+        self.assertEqual(len(self.book), 4)
+        # Matching again gives the same trades
+        self.assertEqual(
+            [(fill.sell_order, fill.quantity) for fill in self.book.match()], [(first, 5), (second, 5), (third, 2)]
+        )
+
+    def test_cancel_by_order_id(self):
+        order = self.book.add(BUY, 'a', 'TEST', 10, 100.0)
+        other = self.book.add(BUY, 'b', 'TEST', 10, 100.0)
+
+        self.assertIs(self.book.cancel(order.order_id), order)
+        self.assertIsNone(self.book.cancel(order.order_id))
+        self.assertIs(self.book.best_bid(), other)
+
+        self.book.cancel(other.order_id)
+        self.assertIsNone(self.book.best_bid())
+        self.assertEqual(len(self.book.bids), 0)
+
+    def test_rejects_invalid_orders(self):
+        with self.assertRaises(ValueError):
+            self.book.add('HOLD', 'a', 'TEST', 10, 100.0)
+        with self.assertRaises(ValueError):
+            self.book.add(BUY, 'a', 'TEST', 0, 100.0)
+        self.book.add(BUY, 'a', 'TEST', 1, 100.0, order_id=7)
+        with self.assertRaises(ValueError):
+            self.book.add(BUY, 'a', 'TEST', 1, 100.0, order_id=7)
+
+    def test_depth_follows_mutations(self):
+        self.book.add(SELL, 'a', 'TEST', 5, 100.0)
+        self.book.add(SELL, 'b', 'TEST', 5, 100.0)
+        cancelled = self.book.add(SELL, 'c', 'TEST', 5, 101.0)
+        self.book.add(BUY, 'd', 'TEST', 7, 99.0)
+        version = self.book.version
+
+        self.book.cancel(cancelled.order_id)
+        self.book.add(BUY, 'e', 'TEST', 7, 100.0)
+        self.book.match()
+
+        self.assertGreater(self.book.version, version)
+        self.assertEqual(self.book.depth(SELL), [(100.0, 3)])
+        self.assertEqual(self.book.depth(BUY), [(99.0, 7)])
+        self.assertEqual(self.book.totals[SELL], {100.0: 3})
+        self.assertEqual(self.book.totals[BUY], {-99.0: 7})
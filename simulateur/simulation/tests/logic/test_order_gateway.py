@@ -0,0 +1,307 @@
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+from simulation.logic.broker import Broker
+from simulation.logic.order_book import BUY, SELL
+from simulation.logic.order_gateway import OrderGateway, OrderRejected
+from simulation.logic.order_journal import JournalLocked, OrderJournals
+from simulation.models import (
+    Company, OrderRequest, Portfolio, Scenario, SimulationManager, SimulationSettings, Stock, StockPortfolio,
+    UserProfile
+)
+from simulation.tests.shared_database import run_in_process
+
+
+class GatewaySetUpMixin:
+
+    def setUp(self):
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Gateway Scenario"),
+            simulation_settings=SimulationSettings.objects.create(stock_trading_logic='dynamic'),
+        )
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Gateway Company"), ticker="GTW")
+        self.buyer = UserProfile.objects.create(user=User.objects.create(username="buyer"))
+        self.seller = UserProfile.objects.create(user=User.objects.create(username="seller"))
+        Portfolio.objects.create(owner=self.buyer, simulation_manager=self.simulation_manager, balance=1000)
+        seller_portfolio = Portfolio.objects.create(
+            owner=self.seller, simulation_manager=self.simulation_manager, balance=0
+        )
+        StockPortfolio.objects.create(portfolio=seller_portfolio, stock=self.stock, quantity=10)
+
+        self.broker = Broker("Gateway")
+        self.gateway = OrderGateway(self.broker, max_pending=3)
+
+    def ledger(self):
+        return self.gateway.ledgers.get(self.simulation_manager.id)
+
+    def submit(self, side, user, quantity, price):
+        return self.gateway.submit(side, user, self.stock, quantity, price, self.simulation_manager)
+
+    def drain(self):
+        return self.gateway.drain(self.simulation_manager.id)
+
+
+class OrderGatewayTests(GatewaySetUpMixin, TestCase):
+
+    def test_order_ids_increase(self):
+        first = self.submit(BUY, self.buyer, 1, 10.0)
+        second = self.submit(SELL, self.seller, 1, 10.0)
+        self.assertGreater(second.id, first.id)
+
+    def test_submit_checks_the_database_positions(self):
+        with self.assertRaisesMessage(OrderRejected, "Insufficient funds"):
+            self.submit(BUY, self.buyer, 101, 10.0)
+        with self.assertRaisesMessage(OrderRejected, "Insufficient stock holdings"):
+            self.submit(SELL, self.seller, 11, 10.0)
+        self.assertFalse(OrderRequest.objects.exists())
+
+    def test_bounded_queue_rejects(self):
+        for _ in range(3):
+            self.submit(BUY, self.buyer, 1, 10.0)
+        with self.assertRaisesMessage(OrderRejected, "Order queue is full"):
+            self.submit(BUY, self.buyer, 1, 10.0)
+
+        # Draining makes room again
+        self.drain()
+        self.submit(BUY, self.buyer, 1, 10.0)
+
+    def test_pending_request_is_cancelled_before_reaching_the_books(self):
+        order_request = self.submit(BUY, self.buyer, 5, 10.0)
+
+        self.assertEqual(self.gateway.request_cancel(self.buyer, order_request.id).status,
+                         OrderRequest.Status.CANCELLED)
+        self.assertEqual(self.drain(), [])
+        self.assertEqual(len(self.broker.get_queue("GTW")), 0)
+
+    def test_accepted_order_is_cancelled_by_the_engine(self):
+        order_request = self.submit(BUY, self.buyer, 5, 10.0)
+        self.drain()
+
+        self.assertEqual(self.gateway.request_cancel(self.buyer, order_request.id).status,
+                         OrderRequest.Status.CANCELLING)
+        self.assertEqual(len(self.broker.get_queue("GTW")), 1)
+        self.drain()
+
+        order_request.refresh_from_db()
+        self.assertEqual(order_request.status, OrderRequest.Status.CANCELLED)
+        self.assertEqual(len(self.broker.get_queue("GTW")), 0)
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('1000'))
+        with self.assertRaisesMessage(OrderRejected, "Order is cancelled, it cannot be cancelled"):
+            self.gateway.request_cancel(self.buyer, order_request.id)
+
+    def test_filled_order_is_not_cancelled(self):
+        self.submit(SELL, self.seller, 5, 9.0)
+        order_request = self.submit(BUY, self.buyer, 5, 10.0)
+        self.drain()
+        self.broker.process_queues()
+
+        self.gateway.request_cancel(self.buyer, order_request.id)
+        self.drain()
+
+        order_request.refresh_from_db()
+        self.assertEqual((order_request.status, order_request.message),
+                         (OrderRequest.Status.ACCEPTED, "Order was already filled"))
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('955'))
+
+    def test_only_the_owner_cancels(self):
+        order_request = self.submit(BUY, self.buyer, 5, 10.0)
+        with self.assertRaisesMessage(OrderRejected, "Order not found"):
+            self.gateway.request_cancel(self.seller, order_request.id)
+
+    def test_drain_enqueues_into_broker_books_in_id_order(self):
+        buy = self.submit(BUY, self.buyer, 5, 10.0)
+        sell = self.submit(SELL, self.seller, 5, 9.0)
+
+        self.assertEqual(len(self.broker.queues), 0)
+        self.assertEqual(self.drain(), [buy, sell])
+
+        book = self.broker.get_queue("GTW")
+        self.assertEqual(book.best_bid().order_id, buy.id)
+        self.assertEqual(book.best_ask().order_id, sell.id)
+        self.assertEqual(
+            set(OrderRequest.objects.values_list('status', flat=True)), {OrderRequest.Status.ACCEPTED}
+        )
+
+    def test_drain_only_claims_its_simulation(self):
+        self.submit(BUY, self.buyer, 5, 10.0)
+        self.assertEqual(self.gateway.drain(self.simulation_manager.id + 1), [])
+        self.assertEqual(OrderRequest.objects.get().status, OrderRequest.Status.PENDING)
+
+    def test_ledger_rejects_what_open_orders_already_hold(self):
+        self.submit(BUY, self.buyer, 60, 10.0)
+        second = self.submit(BUY, self.buyer, 50, 10.0)  # The database balance still covers it
+
+        self.assertEqual(len(self.drain()), 1)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.message), (OrderRequest.Status.REJECTED, "Insufficient funds"))
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('400'))
+        self.assertEqual(len(self.broker.get_queue("GTW")), 1)
+
+    def test_fills_update_cached_balances(self):
+        self.submit(SELL, self.seller, 5, 9.0)
+        self.submit(BUY, self.buyer, 5, 10.0)
+        self.drain()
+
+        transactions = self.broker.process_queues()
+
+        # The sell rested first, so the trade happens at 9 and the buyer gets 1 per share back
+        self.assertEqual(transactions[0]['price'], 9.0)
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('955'))
+        self.assertEqual(self.ledger().shares[(self.buyer.id, self.stock.id)], 5)
+        self.assertEqual(self.ledger().cash[self.seller.id], Decimal('45'))
+        self.assertEqual(Portfolio.objects.get(owner=self.buyer).balance, Decimal('955'))
+
+    def test_resync_reloads_the_ledger_and_keeps_reservations(self):
+        self.gateway.resync_every = 2
+        self.submit(BUY, self.buyer, 10, 10.0)
+        self.drain()
+        # An admin deposit, made outside the engine
+        Portfolio.objects.filter(owner=self.buyer).update(balance=1500)
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('900'))
+
+        self.drain()
+
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('1400'))
+        self.assertEqual(self.ledger().shares[(self.seller.id, self.stock.id)], 10)
+
+    def test_failed_settlement_puts_the_orders_back(self):
+        sell = self.submit(SELL, self.seller, 5, 9.0)
+        buy = self.submit(BUY, self.buyer, 5, 10.0)
+        self.drain()
+        listener_calls = []
+        self.broker.fill_listeners.append(listener_calls.append)
+
+        with patch('simulation.logic.settlement.link_orders', side_effect=OperationalError("database is locked")):
+            self.assertEqual(self.broker.process_queues(), [])
+
+        book = self.broker.get_queue("GTW")
+        self.assertEqual((book.best_bid().order_id, book.best_ask().order_id), (buy.id, sell.id))
+        self.assertEqual((book.depth(BUY), book.depth(SELL)), ([(10.0, 5)], [(9.0, 5)]))
+        self.assertEqual(listener_calls, [])
+        self.assertNotIn("GTW", self.broker.quotes)
+        self.assertEqual(Portfolio.objects.get(owner=self.buyer).balance, Decimal('1000'))
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('950'))
+
+        # The next pass settles them
+        self.assertEqual(len(self.broker.process_queues()), 1)
+        self.assertEqual(len(book), 0)
+        self.assertEqual(Portfolio.objects.get(owner=self.buyer).balance, Decimal('955'))
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('955'))
+
+
+
+def submit_buy(user_id, stock_id, simulation_manager_id):
+    """Submit a buy order from a separate process, like a web worker does."""
+    order_request = OrderGateway(Broker("Web")).submit(
+        BUY, UserProfile.objects.get(id=user_id), Stock.objects.get(id=stock_id), 5, 10.0,
+        SimulationManager.objects.get(id=simulation_manager_id),
+    )
+    return order_request.id
+
+
+class OrderGatewayProcessTests(GatewaySetUpMixin, TransactionTestCase):
+
+    def test_orders_submitted_by_another_process_reach_the_books(self):
+        order_id = run_in_process(
+            self, f"{__name__}.submit_buy", self.buyer.id, self.stock.id, self.simulation_manager.id
+        )
+
+        self.assertEqual([order_request.id for order_request in self.drain()], [order_id])
+        self.assertEqual(self.broker.get_queue("GTW").best_bid().order_id, order_id)
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('950'))
+
+
+class OrderGatewayRecoveryTests(OrderGatewayTests):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.gateway = self.make_gateway(self.broker)
+
+    def make_gateway(self, broker):
+        journals = OrderJournals(self.directory.name, segment_size=4096, snapshot_every=1000)
+        self.addCleanup(journals.close)
+        return OrderGateway(broker, max_pending=3, journals=journals)
+
+    def journal(self):
+        return self.gateway.journal(self.simulation_manager.id)
+
+    def restart(self):
+        self.gateway.journals.close()
+        self.broker = Broker("Restarted")
+        self.gateway = self.make_gateway(self.broker)
+        self.drain()
+
+    def test_restart_rebuilds_books_and_reservations(self):
+        first = self.submit(BUY, self.buyer, 10, 10.0)
+        self.submit(BUY, self.buyer, 5, 11.0)
+        self.submit(SELL, self.seller, 8, 10.5)
+        self.drain()
+        self.broker.process_queues()
+
+        self.restart()
+
+        book = self.broker.get_queue("GTW")
+        self.assertEqual(book.depth(BUY), [(10.0, 10)])
+        self.assertEqual(book.depth(SELL), [(10.5, 3)])
+        self.assertEqual(book.best_bid().order_id, first.id)
+        self.submit(BUY, self.buyer, 1, 1.0)
+        self.drain()
+        # 5 shares were bought at 11 and the resting buy keeps its cash reserved after the restart
+        self.assertEqual(self.ledger().cash[self.buyer.id],
+                         Decimal('1000') - 55 - 100 - 1)
+
+    def test_restart_after_snapshot(self):
+        self.gateway.journals.snapshot_every = 1
+        first = self.submit(SELL, self.seller, 5, 9.0)
+        self.submit(BUY, self.buyer, 2, 10.0)
+        self.drain()
+        self.broker.process_queues()
+        self.assertEqual(self.journal().generation, 1)
+        self.submit(SELL, self.seller, 1, 12.0)
+        self.drain()
+
+        self.restart()
+
+        book = self.broker.get_queue("GTW")
+        self.assertEqual(book.depth(SELL), [(9.0, 3), (12.0, 1)])
+        self.assertEqual(book.best_ask().order_id, first.id)
+
+    def test_journaled_request_left_pending_is_not_reserved_twice(self):
+        order_request = self.submit(BUY, self.buyer, 10, 10.0)
+        self.drain()
+        # A crash between the journal append and the commit leaves the request pending
+        OrderRequest.objects.filter(id=order_request.id).update(status=OrderRequest.Status.PENDING)
+
+        self.restart()
+
+        self.assertEqual(self.broker.get_queue("GTW").depth(BUY), [(10.0, 10)])
+        self.assertEqual(self.ledger().cash[self.buyer.id], Decimal('900'))
+        self.assertEqual(OrderRequest.objects.get().status, OrderRequest.Status.ACCEPTED)
+
+    def test_simulations_have_their_own_journal(self):
+        other = SimulationManager.objects.create(
+            scenario=self.simulation_manager.scenario,
+            simulation_settings=SimulationSettings.objects.create(stock_trading_logic='dynamic'),
+        )
+        Portfolio.objects.create(owner=self.buyer, simulation_manager=other, balance=1000)
+        self.gateway.submit(BUY, self.buyer, self.stock, 3, 8.0, other)
+        self.submit(BUY, self.buyer, 10, 10.0)
+        self.drain()
+        self.gateway.drain(other.id)
+
+        self.restart()
+
+        # Only the drained simulation is recovered, the other journal is left to its engine
+        self.assertEqual(self.broker.get_queue("GTW").depth(BUY), [(10.0, 10)])
+        self.assertEqual(set(self.gateway.journals.journals), {self.simulation_manager.id})
+
+    def test_a_journal_is_written_by_one_gateway(self):
+        self.drain()
+        other = self.make_gateway(Broker("Other"))
+        with self.assertRaises(JournalLocked):
+            other.drain(self.simulation_manager.id)
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import tempfile
+from django.test import SimpleTestCase
+from simulation.logic.order_journal import (
+    JournalLocked, OrderJournal, OrderJournals, replay, ORDER_RECORD, CANCEL_RECORD, FILL_RECORD
+)
+
+
+def order_record(order_id, side='BUY', quantity=10, price=100.0):
+    return [ORDER_RECORD, order_id, side, 'TEST', 1, 1, quantity, price, 1]
+
+
+class OrderJournalTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.journal = self.open_journal()
+
+    def open_journal(self, **kwargs):
+        journal = OrderJournal(self.directory.name, segment_size=kwargs.pop('segment_size', 4096), **kwargs)
+        journal.open()
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_records_survive_reopen(self):
+        self.journal.record_order(1, 'BUY', 'TEST', 1, 1, 10, 100.0, 1)
+        self.journal.record_fill(1, 2, 4)
+        self.journal.close()
+
+        journal = self.open_journal()
+        self.assertEqual(list(journal.read()), [order_record(1), [FILL_RECORD, 1, 2, 4]])
+        self.assertEqual(journal.records, 2)
+
+        journal.record_cancel(1)
+        self.assertEqual(list(journal.read())[-1], [CANCEL_RECORD, 1])
+
+    def test_incomplete_record_is_ignored(self):
+        self.journal.record_order(1, 'BUY', 'TEST', 1, 1, 10, 100.0, 1)
+        # A crash after the payload but before the length leaves no visible record
+        self.journal.map[self.journal.offset + 4:self.journal.offset + 8] = b'\x91\x01\x02\x03'
+        self.journal.close()
+
+        self.assertEqual(len(list(self.open_journal().read())), 1)
+
+    def test_journal_grows_past_its_segment(self):
+        for order_id in range(1, 501):
+            self.journal.record_order(order_id, 'BUY', 'TEST', 1, 1, 10, 100.0, 1)
+
+        self.assertGreater(os.path.getsize(self.journal.path), 4096)
+        self.assertEqual(len(list(self.journal.read())), 500)
+
+    def test_snapshot_starts_a_new_generation(self):
+        self.journal.record_order(1, 'BUY', 'TEST', 1, 1, 10, 100.0, 1)
+        self.journal.record_order(2, 'SELL', 'TEST', 1, 1, 10, 101.0, 1)
+        self.journal.write_snapshot([order_record(1), order_record(2, 'SELL', price=101.0)], 3)
+        self.journal.record_fill(1, 2, 10)
+        self.journal.record_order(3, 'BUY', 'TEST', 1, 1, 5, 99.0, 1)
+        self.journal.close()
+
+        journal = self.open_journal()
+        self.assertEqual(journal.generation, 1)
+        orders, next_sequence = journal.load()
+        self.assertEqual(orders, [order_record(3, quantity=5, price=99.0)])
+        self.assertEqual(next_sequence, 4)
+
+    def test_journal_older_than_snapshot_is_ignored(self):
+        self.journal.write_snapshot([order_record(1)], 2)
+        # Simulate a crash between the snapshot rename and the journal reset
+        self.journal.HEADER.pack_into(self.journal.map, 0, self.journal.MAGIC, 0)
+        self.journal.generation = 0
+        self.journal.record_cancel(1)
+        self.journal.close()
+
+        orders, _ = self.open_journal().load()
+        self.assertEqual(orders, [order_record(1)])
+
+    def test_second_writer_is_refused(self):
+        with self.assertRaises(JournalLocked):
+            OrderJournal(self.directory.name).open()
+
+        self.journal.close()
+        self.open_journal()
+
+    def test_writer_in_another_process_keeps_the_journal(self):
+        self.journal.close()
+        context = multiprocessing.get_context("spawn")
+        appended, release = context.Event(), context.Event()
+        process = context.Process(target=append_orders, args=(self.directory.name, 200, appended, release))
+        process.start()
+        self.addCleanup(process.join, 60)
+        self.addCleanup(release.set)
+        self.assertTrue(appended.wait(60))
+
+        with self.assertRaises(JournalLocked):
+            OrderJournal(self.directory.name).open()
+
+        release.set()
+        process.join(60)
+        self.assertEqual(process.exitcode, 0)
+        journal = self.open_journal()
+        self.assertEqual(list(journal.read()), [order_record(order_id) for order_id in range(1, 201)])
+        self.assertEqual(journal.records, 200)
+
+
+def append_orders(directory, count, appended, release):
+    """Append ``count`` orders to the journal of ``directory`` and keep it open until ``release`` is set."""
+    journal = OrderJournal(directory, segment_size=4096)
+    journal.open()
+    for order_id in range(1, count + 1):
+        journal.record_order(order_id, 'BUY', 'TEST', 1, 1, 10, 100.0, 1)
+    appended.set()
+    release.wait(60)
+    journal.close()
+
+
+class OrderJournalsTests(SimpleTestCase):
+
+    def test_one_locked_directory_per_simulation(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        journals = OrderJournals(directory.name, segment_size=4096)
+        self.addCleanup(journals.close)
+
+        journals.get(1).record_cancel(1)
+        journals.get(2).record_cancel(2)
+
+        self.assertIs(journals.get(1), journals.get(1))
+        self.assertEqual(sorted(os.listdir(directory.name)), ['simulation_1', 'simulation_2'])
+        with self.assertRaises(JournalLocked):
+            OrderJournals(directory.name).get(2)
+        journals.close()
+        reopened = OrderJournals(directory.name)
+        self.addCleanup(reopened.close)
+        self.assertEqual(list(reopened.get(2).read()), [[CANCEL_RECORD, 2]])
+
+
+class ReplayTests(SimpleTestCase):
+
+    def test_replay_applies_fills_and_cancels(self):
+        records = [
+            order_record(1), order_record(2, 'SELL', quantity=4), [FILL_RECORD, 1, 2, 4],
+            order_record(3), [CANCEL_RECORD, 3],
+        ]
+
+        orders, next_sequence = replay([], records)
+
+        self.assertEqual(orders, [order_record(1, quantity=6)])
+        self.assertEqual(next_sequence, 4)
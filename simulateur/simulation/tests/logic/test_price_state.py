@@ -0,0 +1,63 @@
+import numpy as np
+from django.test import TestCase
+from simulation.logic.price_state import PriceState
+from simulation.models import Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory
+
+
+class PriceStateTests(TestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(name="State Company")
+        self.stock1 = Stock.objects.create(company=self.company, ticker="ST1")
+        self.stock2 = Stock.objects.create(company=self.company, ticker="ST2")
+        self.stock3 = Stock.objects.create(company=self.company, ticker="ST3")
+        StockPriceHistory.objects.create(stock=self.stock1, open_price=9, high_price=11, low_price=8, close_price=10)
+        StockPriceHistory.objects.create(stock=self.stock1, open_price=10, high_price=13, low_price=9, close_price=12)
+        StockPriceHistory.objects.create(stock=self.stock2, open_price=20, high_price=22, low_price=19, close_price=21)
+        self.state = PriceState()
+
+    def test_ensure_seeds_latest_candle(self):
+        with self.assertNumQueries(2):
+            self.state.ensure([self.stock1.id, self.stock2.id, self.stock3.id])
+
+        self.assertEqual(len(self.state), 3)
+        self.assertEqual(self.state.get(self.stock1.id), {'open': 10, 'high': 13, 'low': 9, 'close': 12})
+        self.assertEqual(self.state.get(self.stock2.id)['close'], 21)
+        self.assertIsNone(self.state.get(self.stock3.id))
+
+    def test_ensure_skips_known_stocks(self):
+        self.state.ensure([self.stock1.id])
+        with self.assertNumQueries(0):
+            self.state.ensure([self.stock1.id])
+
+    def test_update_in_place(self):
+        self.state.ensure([self.stock1.id, self.stock3.id])
+        positions = self.state.positions([self.stock3.id, self.stock1.id])
+
+        self.state.update(positions, {
+            'Open': np.array([1.0, 12.0]),
+            'High': np.array([2.0, 14.0]),
+            'Low': np.array([0.5, 11.0]),
+            'Close': np.array([1.5, 13.0]),
+        })
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.state.get(self.stock3.id), {'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5})
+            self.assertEqual(self.state.get(self.stock1.id)['close'], 13.0)
+
+    def test_simulation_state_ignores_other_simulations(self):
+        simulation_managers = [
+            SimulationManager.objects.create(
+                scenario=Scenario.objects.create(name=f"State Scenario {i}"),
+                simulation_settings=SimulationSettings.objects.create(),
+            )
+            for i in range(2)
+        ]
+        StockPriceHistory.objects.create(simulation_manager=simulation_managers[1], stock=self.stock1, close_price=50)
+        StockPriceHistory.objects.create(simulation_manager=simulation_managers[0], stock=self.stock2, close_price=30)
+
+        state = PriceState(simulation_managers[0].id)
+        state.ensure([self.stock1.id, self.stock2.id])
+
+        self.assertEqual(state.get(self.stock1.id)['close'], 12)
+        self.assertEqual(state.get(self.stock2.id)['close'], 30)
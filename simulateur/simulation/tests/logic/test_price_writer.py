@@ -0,0 +1,161 @@
+import threading
+from unittest.mock import patch
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+from simulation.logic.price_writer import PriceHistoryWriter, StockQuoteWriter
+from simulation.models import (
+    Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory, StockQuote
+)
+
+
+class PriceHistoryWriterInlineTests(TestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Writer Company")
+        self.stock = Stock.objects.create(company=self.company, ticker="WRT")
+
+    def test_write_without_thread_persists_inline(self):
+        writer = PriceHistoryWriter()
+        writer.write([StockPriceHistory(stock=self.stock, close_price=1.0)])
+        self.assertEqual(StockPriceHistory.objects.count(), 1)
+
+    def test_write_ignores_empty_ticks(self):
+        writer = PriceHistoryWriter()
+        with self.assertNumQueries(0):
+            writer.write([])
+
+    def test_transient_error_is_retried(self):
+        writer = PriceHistoryWriter(retry_backoff_ms=0)
+        original_save = writer.save
+        attempts = []
+
+        def flaky_save(rows):
+            attempts.append(len(rows))
+            if len(attempts) == 1:
+                raise OperationalError("database is locked")
+            original_save(rows)
+
+        writer.save = flaky_save
+        writer.write([StockPriceHistory(stock=self.stock, close_price=1.0)])
+
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(StockPriceHistory.objects.count(), 1)
+
+    def test_inline_write_raises_once_retries_are_exhausted(self):
+        writer = PriceHistoryWriter(max_retries=2, retry_backoff_ms=0)
+        with patch.object(writer, 'save', side_effect=OperationalError("database is locked")) as mock_save:
+            with self.assertRaises(OperationalError):
+                writer.write([StockPriceHistory(stock=self.stock, close_price=1.0)])
+
+        self.assertEqual(mock_save.call_count, 3)
+        self.assertEqual(StockPriceHistory.objects.count(), 0)
+
+
+
+class StockQuoteWriterTests(TestCase):
+
+    def setUp(self):
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Quote Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        company = Company.objects.create(name="Writer Company")
+        self.stocks = [Stock.objects.create(company=company, ticker=f"WR{i}") for i in range(2)]
+
+    def quotes(self, close_price):
+        return [
+            StockQuote(simulation_manager=self.simulation_manager, stock=stock, close_price=close_price + i)
+            for i, stock in enumerate(self.stocks)
+        ]
+
+    def test_ticks_collapse_to_one_upsert_of_the_latest_quotes(self):
+        writer = StockQuoteWriter()
+        writer.write(self.quotes(1.0))
+
+        with self.assertNumQueries(1):
+            writer.persist(self.quotes(2.0) + self.quotes(3.0))
+
+        self.assertEqual(
+            list(StockQuote.objects.order_by('stock_id').values_list('stock_id', 'close_price')),
+            [(self.stocks[0].id, 3.0), (self.stocks[1].id, 4.0)],
+        )
+
+class PriceHistoryWriterBackgroundTests(TransactionTestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Writer Company")
+        self.stock = Stock.objects.create(company=self.company, ticker="WRT")
+
+    def test_close_flushes_pending_rows(self):
+        writer = PriceHistoryWriter(flush_ticks=100, flush_interval_ms=10000)
+        writer.start()
+        for i in range(5):
+            writer.write([StockPriceHistory(stock=self.stock, close_price=float(i))])
+        writer.close()
+
+        self.assertFalse(writer.running)
+        self.assertEqual(StockPriceHistory.objects.count(), 5)
+
+    def test_flushes_every_n_ticks_in_one_statement(self):
+        writer = PriceHistoryWriter(flush_ticks=3, flush_interval_ms=10000)
+        with patch.object(writer, 'persist', wraps=writer.persist) as mock_persist:
+            writer.start()
+            for i in range(3):
+                writer.write([StockPriceHistory(stock=self.stock, close_price=float(i))])
+            writer.flush()
+            writer.close()
+
+        mock_persist.assert_called_once()
+        self.assertEqual(len(mock_persist.call_args[0][0]), 3)
+
+    def test_rows_that_failed_are_written_with_the_next_flush(self):
+        writer = PriceHistoryWriter(flush_ticks=100, flush_interval_ms=10000, max_retries=0)
+        original_save = writer.save
+        failures = iter([OperationalError("database is locked")])
+
+        def failing_once(rows):
+            error = next(failures, None)
+            if error:
+                raise error
+            original_save(rows)
+
+        writer.save = failing_once
+        writer.start()
+        writer.write([StockPriceHistory(stock=self.stock, close_price=1.0)])
+        writer.flush()
+        self.assertEqual(StockPriceHistory.objects.count(), 0)
+        self.assertEqual(len(writer.unsaved), 1)
+
+        writer.write([StockPriceHistory(stock=self.stock, close_price=2.0)])
+        writer.close()
+
+        self.assertEqual(writer.unsaved, [])
+        self.assertEqual(
+            sorted(StockPriceHistory.objects.values_list('close_price', flat=True)), [1.0, 2.0]
+        )
+
+    def test_full_buffer_applies_backpressure(self):
+        release = threading.Event()
+        writer = PriceHistoryWriter(flush_ticks=1, flush_interval_ms=10, max_pending_ticks=1)
+        original_persist = writer.persist
+
+        def slow_persist(rows):
+            release.wait(5)
+            original_persist(rows)
+
+        writer.persist = slow_persist
+        writer.start()
+        writer.write([StockPriceHistory(stock=self.stock, close_price=1.0)])
+        writer.write([StockPriceHistory(stock=self.stock, close_price=2.0)])
+
+        blocked = threading.Thread(
+            target=writer.write, args=([StockPriceHistory(stock=self.stock, close_price=3.0)],)
+        )
+        blocked.start()
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+
+        release.set()
+        blocked.join(5)
+        writer.close()
+        self.assertEqual(StockPriceHistory.objects.count(), 3)
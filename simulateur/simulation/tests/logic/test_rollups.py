@@ -0,0 +1,218 @@
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from simulation.logic.archive import archive_simulation
+from simulation.logic.rollups import RAW, choose_resolution, get_candles, parse_resolution, rebuild_rollups, roll_up
+from simulation.models import (
+    Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory, StockPriceRollup
+)
+from simulation.tests.shared_database import run_in_processes
+
+START = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+
+
+class ResolutionTests(SimpleTestCase):
+
+    def test_parse_resolution(self):
+        self.assertIsNone(parse_resolution(None))
+        self.assertIsNone(parse_resolution("auto"))
+        self.assertEqual(parse_resolution("5m"), "5m")
+        self.assertEqual(parse_resolution(RAW), RAW)
+        with self.assertRaises(ValueError):
+            parse_resolution("2m")
+
+    def test_finest_resolution_that_fits_the_range(self):
+        self.assertEqual(choose_resolution(START, START + timedelta(seconds=1000)), RAW)
+        self.assertEqual(choose_resolution(START, START + timedelta(hours=10)), "1m")
+        self.assertEqual(choose_resolution(START, START + timedelta(days=1)), "5m")
+        self.assertEqual(choose_resolution(START, START + timedelta(days=30)), "1h")
+        self.assertEqual(choose_resolution(START, START + timedelta(days=3650)), "1d")
+
+
+class RollUpTests(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Rollup Company"), ticker="RLP")
+
+    def candle(self, seconds, open_price, high_price, low_price, close_price):
+        return StockPriceHistory(
+            stock=self.stock, timestamp=START + timedelta(seconds=seconds),
+            open_price=open_price, high_price=high_price, low_price=low_price, close_price=close_price,
+        )
+
+    def bars(self, resolution):
+        return list(StockPriceRollup.objects.filter(
+            stock=self.stock, resolution=resolution, simulation_manager=None
+        ).order_by(
+            "timestamp"
+        ).values_list("timestamp", "open_price", "high_price", "low_price", "close_price"))
+
+    def test_bars_aggregate_the_candles_of_their_period(self):
+        roll_up([
+            self.candle(70, 11, 15, 10, 14),
+            self.candle(10, 10, 12, 9, 11),  # Out of order within the batch
+            self.candle(130, 14, 14, 8, 9),
+        ])
+
+        self.assertEqual(self.bars("1m"), [
+            (START, 10, 12, 9, 11),
+            (START + timedelta(minutes=1), 11, 15, 10, 14),
+            (START + timedelta(minutes=2), 14, 14, 8, 9),
+        ])
+        self.assertEqual(self.bars("5m"), [(START, 10, 15, 8, 9)])
+        self.assertEqual(self.bars("1d"), [(START.replace(hour=0), 10, 15, 8, 9)])
+
+    def test_later_batches_extend_existing_bars(self):
+        roll_up([self.candle(0, 10, 12, 9, 11)])
+        roll_up([self.candle(30, 11, 20, 11, 18), self.candle(400, 18, 19, 5, 6)])
+
+        self.assertEqual(self.bars("1m")[0], (START, 10, 20, 9, 18))
+        self.assertEqual(self.bars("5m"), [
+            (START, 10, 20, 9, 18),
+            (START + timedelta(minutes=5), 18, 19, 5, 6),
+        ])
+        self.assertEqual(self.bars("1h"), [(START, 10, 20, 5, 6)])
+
+    def test_simulations_sharing_a_stock_get_their_own_bars(self):
+        simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Rollup Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        scoped = self.candle(30, 50, 60, 40, 55)
+        scoped.simulation_manager = simulation_manager
+        roll_up([self.candle(0, 10, 12, 9, 11), scoped])
+
+        self.assertEqual(self.bars("1m"), [(START, 10, 12, 9, 11)])
+        self.assertEqual(
+            list(simulation_manager.rollups.filter(resolution="1m").values_list("close_price", flat=True)), [55]
+        )
+        self.assertEqual(
+            [candle["close_price"] for candle in get_candles(self.stock, resolution="1m",
+                                                             simulation_manager=simulation_manager)],
+            [11, 55],  # Reference bars are shared by every simulation
+        )
+
+    def test_a_period_has_one_reference_bar(self):
+        roll_up([self.candle(0, 10, 12, 9, 11)])
+        bar = StockPriceRollup.objects.filter(simulation_manager=None).first()
+        bar.pk = None
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            bar.save()
+
+    def test_query_count_does_not_grow_with_the_candles(self):
+        roll_up([self.candle(0, 10, 10, 10, 10)])
+
+        # Both batches extend the current bars and open new ones, in one upsert
+        with self.assertNumQueries(3):
+            roll_up([self.candle(1, 10, 10, 10, 10), self.candle(60, 10, 10, 10, 10)])
+        with self.assertNumQueries(3):
+            roll_up([self.candle(second, 10, 10, 10, 10) for second in range(61, 4000)])
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        candles = [self.candle(seconds, 10 + i, 12 + i, 8 + i, 11 + i) for i, seconds in enumerate(range(0, 900, 45))]
+        roll_up(candles)
+        incremental = self.bars("1m") + self.bars("5m")
+
+        timestamps = [candle.timestamp for candle in candles]
+        StockPriceHistory.objects.bulk_create(candles)
+        for candle, timestamp in zip(candles, timestamps):
+            StockPriceHistory.objects.filter(id=candle.id).update(timestamp=timestamp)
+        self.assertEqual(rebuild_rollups(chunk_size=7), len(candles))
+
+        self.assertEqual(self.bars("1m") + self.bars("5m"), incremental)
+
+    def test_rebuild_keeps_the_rollups_of_archived_simulations(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archived, hot = (
+            SimulationManager.objects.create(
+                scenario=Scenario.objects.create(name=f"Rollup Scenario {i}"),
+                simulation_settings=SimulationSettings.objects.create(),
+                state=SimulationManager.ScenarioState.FINISHED,
+            )
+            for i in range(2)
+        )
+        for simulation_manager in (archived, hot):
+            candle = self.candle(0, 10, 12, 8, 11)
+            candle.simulation_manager = simulation_manager
+            candle.save()
+            roll_up([candle])
+        archive_simulation(archived.id, directory.name)
+        StockPriceRollup.objects.filter(simulation_manager=hot).update(high_price=99)
+
+        self.assertEqual(rebuild_rollups(archive_directory=directory.name), 1)
+
+        for simulation_manager in (archived, hot):
+            bars = StockPriceRollup.objects.filter(simulation_manager=simulation_manager)
+            self.assertEqual(bars.count(), 4)
+            self.assertEqual(set(bars.values_list("high_price", flat=True)), {12})
+
+
+def roll_up_minute(stock_id, simulation_manager_id, prices):
+    """Roll up one candle per price into the first minute, one batch each, like an engine tick."""
+    for second, price in enumerate(prices):
+        roll_up([StockPriceHistory(
+            stock_id=stock_id, simulation_manager_id=simulation_manager_id, timestamp=START + timedelta(seconds=second),
+            open_price=price, high_price=price, low_price=price, close_price=price,
+        )])
+    return len(prices)
+
+
+class ConcurrentRollUpTests(TransactionTestCase):
+
+    def test_writers_opening_the_same_bars_merge_them(self):
+        stock = Stock.objects.create(company=Company.objects.create(name="Concurrent Company"), ticker="CNC")
+        simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Concurrent Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+
+        for scope in (None, simulation_manager.id):
+            self.assertEqual(run_in_processes(
+                self, f"{__name__}.roll_up_minute",
+                (stock.id, scope, [10 + i for i in range(20)]), (stock.id, scope, [5 + i for i in range(20)]),
+            ), [20, 20])
+
+        for scope in (None, simulation_manager):
+            bars = StockPriceRollup.objects.filter(simulation_manager=scope, stock=stock)
+            self.assertEqual(bars.count(), 4)
+            self.assertEqual(
+                set(bars.values_list("high_price", "low_price")), {(29, 5)}
+            )
+
+
+class GetCandlesTests(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Candles Company"), ticker="CDL")
+        candles = StockPriceHistory.objects.bulk_create([
+            StockPriceHistory(stock=self.stock, close_price=float(minute)) for minute in range(0, 3000, 5)
+        ])
+        for candle, minute in zip(candles, range(0, 3000, 5)):
+            StockPriceHistory.objects.filter(id=candle.id).update(timestamp=START + timedelta(minutes=minute))
+        rebuild_rollups()
+
+    def test_whole_history_uses_the_resolution_that_fits(self):
+        candles = get_candles(self.stock)  # 50 hours: 1 minute bars would be 3000 points
+
+        self.assertEqual(len(candles), 600)
+        self.assertEqual(candles[0]["timestamp"], START)
+        self.assertEqual(candles[-1]["close_price"], 2995.0)
+
+    def test_range_and_explicit_resolution(self):
+        candles = get_candles(self.stock, START + timedelta(minutes=62), START + timedelta(hours=3), "1h")
+
+        self.assertEqual([candle["timestamp"] for candle in candles],
+                         [START + timedelta(hours=hour) for hour in (1, 2, 3)])
+        self.assertEqual(candles[0]["close_price"], 115.0)
+
+        raw = get_candles(self.stock, START, START + timedelta(minutes=10), RAW)
+        self.assertEqual([candle["close_price"] for candle in raw], [0.0, 5.0, 10.0])
+
+    def test_stock_without_history(self):
+        other = Stock.objects.create(company=self.stock.company, ticker="NONE")
+        self.assertEqual(get_candles(other), [])
@@ -0,0 +1,98 @@
+import unittest
+from simulation.logic.scheduler import TickScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+class TestTickScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_first_tick_is_immediate(self):
+        scheduler = TickScheduler(1.0, clock=self.clock)
+        scheduler.start()
+        self.assertEqual(scheduler.wait(self.clock.sleep), 1)
+        self.assertEqual(self.clock.now, 100.0)
+
+    def test_processing_time_does_not_drift(self):
+        scheduler = TickScheduler(1.0, clock=self.clock)
+        scheduler.start()
+        for _ in range(5):
+            scheduler.wait(self.clock.sleep)
+            self.clock.now += 0.3  # Work done during the tick
+
+        # Ticks stay on the 1 second grid instead of drifting by 0.3s each
+        scheduler.wait(self.clock.sleep)
+        self.assertAlmostEqual(self.clock.now, 105.0)
+
+    def test_skip_policy_drops_missed_ticks(self):
+        scheduler = TickScheduler(1.0, policy="skip", clock=self.clock)
+        scheduler.start()
+        scheduler.wait(self.clock.sleep)
+        self.clock.now += 3.5
+
+        self.assertEqual(scheduler.wait(self.clock.sleep), 1)
+        self.assertEqual(scheduler.skipped_ticks, 2)
+        self.assertAlmostEqual(scheduler.lateness[-1], 2.5)
+        self.assertAlmostEqual(scheduler.time_until_next_tick(), 0.5)
+
+    def test_catch_up_policy_runs_missed_ticks(self):
+        scheduler = TickScheduler(1.0, policy="catch_up", clock=self.clock)
+        scheduler.start()
+        scheduler.wait(self.clock.sleep)
+        self.clock.now += 3.5
+
+        self.assertEqual(scheduler.wait(self.clock.sleep), 3)
+        self.assertEqual(scheduler.skipped_ticks, 0)
+        self.assertAlmostEqual(scheduler.time_until_next_tick(), 0.5)
+
+    def test_catch_up_is_bounded(self):
+        scheduler = TickScheduler(1.0, policy="catch_up", max_catch_up=2, clock=self.clock)
+        scheduler.start()
+        scheduler.wait(self.clock.sleep)
+        self.clock.now += 10.5
+
+        self.assertEqual(scheduler.wait(self.clock.sleep), 2)
+        self.assertEqual(scheduler.skipped_ticks, 8)
+
+    def test_interrupted_wait_returns_no_tick(self):
+        scheduler = TickScheduler(1.0, clock=self.clock)
+        scheduler.start()
+        scheduler.wait(self.clock.sleep)
+
+        self.assertEqual(scheduler.wait(lambda delay: None), 0)
+        self.assertEqual(scheduler.ticks, 1)
+
+    def test_set_period_keeps_last_tick_anchor(self):
+        scheduler = TickScheduler(1.0, clock=self.clock)
+        scheduler.start()
+        scheduler.wait(self.clock.sleep)
+        scheduler.set_period(0.25)
+        self.assertAlmostEqual(scheduler.time_until_next_tick(), 0.25)
+
+    def test_lateness_stats(self):
+        scheduler = TickScheduler(1.0, clock=self.clock)
+        self.assertEqual(scheduler.lateness_stats()["max"], 0.0)
+        scheduler.start()
+        scheduler.wait(self.clock.sleep)
+        self.clock.now += 1.2
+        scheduler.wait(self.clock.sleep)
+        self.assertAlmostEqual(scheduler.lateness_stats()["max"], 0.2)
+
+    def test_unsupported_policy(self):
+        with self.assertRaises(ValueError):
+            TickScheduler(1.0, policy="unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
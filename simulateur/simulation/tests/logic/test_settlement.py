@@ -0,0 +1,141 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase
+from simulation.logic.order_book import OrderBook, BUY, SELL
+from simulation.logic.ledger import OrderRejected
+from simulation.logic.settlement import Execution, execute_trade, settle_executions, settle_fills
+from simulation.models import (
+    Company, Order, Portfolio, Scenario, SimulationManager, SimulationSettings, Stock, StockPortfolio,
+    StockPriceHistory, StockQuote, TransactionHistory, UserProfile
+)
+
+
+class SettleFillsTests(TestCase):
+
+    def setUp(self):
+        self.simulation_settings = SimulationSettings.objects.create(stock_trading_logic='dynamic')
+        self.scenario = Scenario.objects.create(name="Settlement Scenario")
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=self.scenario, simulation_settings=self.simulation_settings
+        )
+        self.company = Company.objects.create(name="Settlement Company")
+        self.stock = Stock.objects.create(company=self.company, ticker="SET")
+        self.buyer = UserProfile.objects.create(user=User.objects.create(username="buyer"))
+        self.seller = UserProfile.objects.create(user=User.objects.create(username="seller"))
+        self.buyer_portfolio = Portfolio.objects.create(
+            owner=self.buyer, simulation_manager=self.simulation_manager, balance=1000
+        )
+        self.seller_portfolio = Portfolio.objects.create(
+            owner=self.seller, simulation_manager=self.simulation_manager, balance=0
+        )
+        StockPortfolio.objects.create(portfolio=self.seller_portfolio, stock=self.stock, quantity=20)
+
+    def make_fills(self, count, quantity=1, price=10.0):
+        book = OrderBook()
+        fills = []
+        for i in range(count):
+            book.add(SELL, self.seller, self.stock, quantity, price + i, self.simulation_manager)
+            book.add(BUY, self.buyer, self.stock, quantity, price + i, self.simulation_manager)
+            fills.extend(book.match())
+        return fills
+
+    def test_fills_move_cash_and_shares(self):
+        transactions = settle_fills(self.make_fills(2, quantity=5))
+
+        self.assertEqual([t['amount'] for t in transactions], [5, 5])
+        self.assertEqual([t['price'] for t in transactions], [10.0, 11.0])
+        self.buyer_portfolio.refresh_from_db()
+        self.seller_portfolio.refresh_from_db()
+        self.assertEqual(self.buyer_portfolio.balance, Decimal('895.00'))
+        self.assertEqual(self.seller_portfolio.balance, Decimal('105.00'))
+        self.assertEqual(StockPortfolio.objects.get(portfolio=self.buyer_portfolio).quantity, 10)
+        self.assertEqual(StockPortfolio.objects.get(portfolio=self.seller_portfolio).quantity, 10)
+
+    def test_orders_are_logged_in_the_transaction_history(self):
+        settle_fills(self.make_fills(3))
+
+        self.assertEqual(Order.objects.filter(transaction_type='BUY', user=self.buyer).count(), 3)
+        self.assertEqual(Order.objects.filter(transaction_type='SELL', user=self.seller).count(), 3)
+        history = TransactionHistory.objects.get(simulation_manager=self.simulation_manager)
+        self.assertEqual(history.orders.count(), 6)
+
+    def test_dynamic_mode_records_trade_prices(self):
+        settle_fills(self.make_fills(3))
+
+        candle = StockPriceHistory.objects.get(stock=self.stock, simulation_manager=self.simulation_manager)
+        self.assertEqual((candle.open_price, candle.high_price, candle.low_price, candle.close_price),
+                         (10.0, 12.0, 10.0, 12.0))
+        quote = StockQuote.objects.get(simulation_manager=self.simulation_manager, stock=self.stock)
+        self.assertEqual((quote.open_price, quote.close_price), (10.0, 12.0))
+
+    def test_emptied_holding_is_deleted(self):
+        settle_fills(self.make_fills(1, quantity=20))
+        self.assertFalse(StockPortfolio.objects.filter(portfolio=self.seller_portfolio).exists())
+
+    def test_query_count_does_not_grow_with_fills(self):
+        settle_fills(self.make_fills(1))
+
+        fills = self.make_fills(1)
+        with self.assertNumQueries(14) as context:
+            settle_fills(fills)
+
+        fills = self.make_fills(15)
+        with self.assertNumQueries(len(context.captured_queries)):
+            settle_fills(fills)
+
+
+class ExecuteTradeTests(TestCase):
+
+    def setUp(self):
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Static Scenario"),
+            simulation_settings=SimulationSettings.objects.create(stock_trading_logic='static'),
+        )
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Static Company"), ticker="STA")
+        self.buyer = UserProfile.objects.create(user=User.objects.create(username="buyer"))
+        self.seller = UserProfile.objects.create(user=User.objects.create(username="seller"))
+        Portfolio.objects.create(owner=self.buyer, simulation_manager=self.simulation_manager, balance=1000)
+        seller_portfolio = Portfolio.objects.create(
+            owner=self.seller, simulation_manager=self.simulation_manager, balance=0
+        )
+        StockPortfolio.objects.create(portfolio=seller_portfolio, stock=self.stock, quantity=10)
+
+    def execution(self, side, user, quantity, price=25, price_history=None):
+        return Execution(side, user, self.stock, quantity, Decimal(price), self.simulation_manager, price_history)
+
+    def test_settles_executions_in_one_batch(self):
+        price_history = StockPriceHistory.objects.create(stock=self.stock, close_price=25)
+        executions = [
+            self.execution(BUY, self.buyer, 4, price_history=price_history), self.execution(SELL, self.seller, 10)
+        ]
+
+        with self.assertNumQueries(14):
+            settle_executions(executions)
+
+        buyer_portfolio = Portfolio.objects.get(owner=self.buyer)
+        self.assertEqual(buyer_portfolio.balance, Decimal(900))
+        holding = StockPortfolio.objects.get(portfolio=buyer_portfolio)
+        self.assertEqual((holding.quantity, holding.latest_price_history), (4, price_history))
+        self.assertEqual(Portfolio.objects.get(owner=self.seller).balance, Decimal(250))
+        self.assertFalse(StockPortfolio.objects.filter(portfolio__owner=self.seller).exists())
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list('transaction_type', 'quantity')),
+            [('BUY', 4), ('SELL', 10)],
+        )
+        self.assertEqual(self.simulation_manager.transactions.get().orders.count(), 2)
+
+    def test_trades_are_checked_against_what_previous_trades_left(self):
+        order = execute_trade(self.execution(BUY, self.buyer, 30))
+        self.assertEqual(Order.objects.get(), order)
+
+        with self.assertRaisesMessage(OrderRejected, "Insufficient funds"):
+            execute_trade(self.execution(BUY, self.buyer, 11))
+        execute_trade(self.execution(SELL, self.seller, 6))
+        with self.assertRaisesMessage(OrderRejected, "Insufficient stock holdings"):
+            execute_trade(self.execution(SELL, self.seller, 5))
+        with self.assertRaisesMessage(OrderRejected, "Insufficient funds"):
+            execute_trade(self.execution(BUY, UserProfile.objects.create(user=User.objects.create(username="new")), 1))
+
+        self.assertEqual(Portfolio.objects.get(owner=self.buyer).balance, Decimal(250))
+        self.assertEqual(Portfolio.objects.get(owner=self.seller).balance, Decimal(150))
+        self.assertEqual(Order.objects.count(), 2)
@@ -1,6 +1,12 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
-from simulation.models import Scenario, Stock, StockPriceHistory, SimulationSettings
+from simulation.models import (
+    Scenario, Stock, StockPriceHistory, StockQuote, SimulationSettings, SimulationManager as SM
+)
+from simulation.logic.broker import Broker
+from simulation.logic.order_book import BUY, SELL
 from simulation.logic.simulation_manager import SimulationManager
 from simulation.models import Company
 
@@ -89,19 +95,6 @@ class SimulationManagerTests(TestCase):
         stocks = self.simulation_manager1.get_stocks()
         self.assertEqual(stocks, [self.stock1])
 
-    def test_broadcast_update(self):
-        current_time = timezone.now()
-        self.simulation_manager1.broadcast_update(self.stock1, current_time)
-
-    def test_apply_changes(self):
-        current_time = timezone.now()
-        change = self.simulation_manager1.apply_changes(self.stock1, current_time)
-
-        self.assertTrue(change["open"] >= 0)
-        self.assertTrue(change["close"] >= 0)
-        self.stock1.refresh_from_db()
-        self.assertEqual(self.stock1.price, change["close"])
-
     def test_pause_simulation(self):
         self.simulation_manager1.pause_simulation()
         self.assertFalse(self.simulation_manager1.running)
@@ -124,3 +117,139 @@ class SimulationManagerTests(TestCase):
         self.assertTrue(self.stock1.price > 0)
         self.assertTrue(self.stock2.price > 0)
         self.assertNotEqual(self.stock1.price, self.stock2.price)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class SimulationManagerBatchTickTests(TestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Batch Company", backstory="Batch tick company.")
+        self.simulation_settings = SimulationSettings.objects.create(
+            timer_step=1,
+            timer_step_unit='second',
+            fluctuation_rate=0.1,
+            close_stock_market_at_night=False,
+            noise_function='brownian',
+            stock_trading_logic='static'
+        )
+        self.scenario = Scenario.objects.create(name="Batch Scenario", duration=10)
+        self.simulation_manager_model = SM.objects.create(
+            scenario=self.scenario,
+            simulation_settings=self.simulation_settings
+        )
+        self.stocks = [
+            Stock.objects.create(company=self.company, ticker=f"BAT{i}") for i in range(5)
+        ]
+        self.simulation_manager_model.stocks.add(*self.stocks)
+        for i, stock in enumerate(self.stocks):
+            StockPriceHistory.objects.create(stock=stock, close_price=100.0 + i)
+
+        self.simulation_manager = SimulationManager(self.simulation_manager_model)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_get_last_prices_is_aligned_with_stocks(self):
+        prices = self.simulation_manager.get_last_prices(self.stocks)
+        self.assertEqual(list(prices), [100.0, 101.0, 102.0, 103.0, 104.0])
+
+    def test_update_prices_writes_one_candle_per_stock(self):
+        self.simulation_manager.update_prices(timezone.now())
+
+        for i, stock in enumerate(self.stocks):
+            self.assertEqual(stock.price_history.count(), 2)
+            candle = stock.price_history.order_by('-id').first()
+            self.assertEqual(candle.simulation_manager_id, self.simulation_manager_model.id)
+            self.assertEqual(candle.open_price, 100.0 + i)
+            self.assertGreaterEqual(candle.high_price, max(candle.open_price, candle.close_price))
+            self.assertLessEqual(candle.low_price, min(candle.open_price, candle.close_price))
+
+    def test_update_prices_uses_single_insert(self):
+        self.simulation_manager.get_stocks()
+        with patch.object(StockPriceHistory.objects, 'create') as mock_create, \
+                patch.object(self.simulation_manager, 'broadcast_snapshot'):
+            self.simulation_manager.update_prices(timezone.now())
+
+        mock_create.assert_not_called()
+        self.assertEqual(StockPriceHistory.objects.count(), 10)
+
+    def test_tick_reads_prices_from_memory(self):
+        self.simulation_manager.update_prices(timezone.now())
+
+        # After the first tick only the candle insert and its rollup (in one transaction) and the quote upsert
+        # touch the database
+        with self.assertNumQueries(7):
+            self.simulation_manager.update_prices(timezone.now())
+
+        for stock in self.stocks:
+            latest = stock.price_history.order_by('-id').first()
+            self.assertEqual(self.simulation_manager.price_state.get(stock.id)['close'], latest.close_price)
+
+    def test_update_prices_upserts_one_quote_per_stock(self):
+        self.simulation_manager.update_prices(timezone.now())
+        self.simulation_manager.update_prices(timezone.now())
+
+        quotes = StockQuote.objects.filter(simulation_manager=self.simulation_manager_model)
+        self.assertEqual(quotes.count(), 5)
+        for quote in quotes:
+            self.assertEqual(quote.close_price, self.simulation_manager.price_state.get(quote.stock_id)['close'])
+
+    def test_update_prices_broadcasts_one_snapshot_per_tick(self):
+        with patch('simulation.logic.utils.async_to_sync') as mock_async_to_sync:
+            self.simulation_manager.update_prices(timezone.now())
+
+        mock_async_to_sync.assert_called_once()
+        group, event = mock_async_to_sync.return_value.call_args[0]
+        self.assertEqual(group, f'simulation_{self.simulation_manager_model.id}')
+        self.assertEqual(event['type'], 'stock_snapshot')
+        self.assertEqual([stock['ticker'] for stock in event['message']['stocks']],
+                         [stock.ticker for stock in self.stocks])
+        for stock in event['message']['stocks']:
+            self.assertEqual(stock['close'], self.simulation_manager.price_state.get(stock['id'])['close'])
+
+    def test_broadcast_depth_is_throttled_and_skips_unchanged_books(self):
+        self.simulation_manager.broker = Broker("Depth")
+        book = self.simulation_manager.broker.get_queue("BAT0")
+        book.add(BUY, 'a', 'BAT0', 5, 99.0)
+        book.add(BUY, 'b', 'BAT0', 5, 99.0)
+        book.add(SELL, 'c', 'BAT0', 3, 101.0)
+
+        with patch('simulation.logic.utils.async_to_sync') as mock_async_to_sync:
+            self.simulation_manager.broadcast_depth()
+            book.add(SELL, 'd', 'BAT0', 3, 102.0)
+            self.simulation_manager.broadcast_depth()  # Within the interval
+            self.simulation_manager.next_depth_publish = 0
+            self.simulation_manager.broadcast_depth()
+            self.simulation_manager.next_depth_publish = 0
+            self.simulation_manager.broadcast_depth()  # Nothing changed
+
+        calls = mock_async_to_sync.return_value.call_args_list
+        self.assertEqual(len(calls), 2)
+        group, event = calls[0][0]
+        self.assertEqual(group, f'simulation_{self.simulation_manager_model.id}')
+        self.assertEqual(event['type'], 'depth_update')
+        self.assertEqual(event['message']['books'], [
+            {'ticker': 'BAT0', 'bids': [[99.0, 10]], 'asks': [[101.0, 3]]}
+        ])
+        self.assertEqual(calls[1][0][1]['message']['books'][0]['asks'], [[101.0, 3], [102.0, 3]])
+
+    def test_start_simulation_ticks_until_run_duration(self):
+        self.simulation_manager.scheduler.period = 0.01
+        self.simulation_manager.run_duration = 0.05
+        self.simulation_manager_model.state = SM.ScenarioState.ONGOING
+        self.simulation_manager_model.save()
+
+        # Keep the writers inline so the candles and quotes are written inside the test transaction
+        with patch.object(self.simulation_manager, 'broadcast_snapshot'), \
+                patch.object(self.simulation_manager.price_writer, 'start'), \
+                patch.object(self.simulation_manager.quote_writer, 'start'):
+            self.simulation_manager.start_simulation()
+
+        self.simulation_manager_model.refresh_from_db()
+        self.assertEqual(self.simulation_manager_model.state, SM.ScenarioState.FINISHED)
+        self.assertFalse(self.simulation_manager.running)
+        self.assertGreater(StockPriceHistory.objects.count(), len(self.stocks))
+        self.assertGreater(self.simulation_manager.scheduler.ticks, 1)
@@ -0,0 +1,151 @@
+import queue
+from unittest.mock import Mock, patch
+from django.test import SimpleTestCase
+from simulation.logic.supervisor import (
+    SimulationSupervisor, shard_simulations, run_worker, STOP_COMMAND, NOTIFY_COMMAND
+)
+from simulation.models import SimulationManager as SM
+
+
+class FakeProcess:
+    def __init__(self, target, args, name, daemon):
+        self.target = target
+        self.args = args
+        self.name = name
+        self.pid = None
+        self.exitcode = None
+        self.alive = False
+        self.closed = False
+
+    def start(self):
+        self.alive = True
+        self.pid = 1000
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def terminate(self):
+        self.alive = False
+        self.exitcode = -15
+
+    def crash(self, exitcode=1):
+        self.alive = False
+        self.exitcode = exitcode
+
+
+class FakeContext:
+    Process = FakeProcess
+    Queue = queue.Queue
+
+
+class ShardSimulationsTests(SimpleTestCase):
+
+    def test_round_robin_shards(self):
+        self.assertEqual(shard_simulations([1, 2, 3, 4, 5], 2), [[1, 3, 5], [2, 4]])
+
+    def test_never_more_shards_than_simulations(self):
+        self.assertEqual(shard_simulations([1, 2], 8), [[1], [2]])
+
+
+class SimulationSupervisorTests(SimpleTestCase):
+
+    def setUp(self):
+        with patch('simulation.logic.supervisor.available_cpus', return_value=[0, 1]):
+            self.supervisor = SimulationSupervisor(
+                [1, 2, 3, 4, 5], workers=3, max_restarts=2, context=FakeContext()
+            )
+        self.supervisor.start()
+
+    def test_workers_are_pinned_round_robin(self):
+        self.assertEqual([worker.cpus for worker in self.supervisor.workers], [[0], [1], [0]])
+        self.assertEqual(self.supervisor.workers[0].process.args[:3], (0, [1, 4], [0]))
+
+    def test_crashed_worker_is_restarted(self):
+        crashed = self.supervisor.workers[1].process
+        crashed.crash()
+
+        self.assertEqual(self.supervisor.check(), 3)
+        self.assertIsNot(self.supervisor.workers[1].process, crashed)
+        self.assertTrue(crashed.closed)
+        self.assertEqual(self.supervisor.workers[1].restarts, 1)
+
+    def test_restarts_are_bounded(self):
+        for _ in range(3):
+            self.supervisor.workers[0].process.crash()
+            self.supervisor.check()
+
+        self.assertEqual(self.supervisor.workers[0].restarts, 2)
+        self.assertEqual(self.supervisor.check(), 2)
+        self.assertTrue(self.supervisor.workers[0].exited)
+
+    def test_clean_exit_is_reaped_not_restarted(self):
+        finished = self.supervisor.workers[2].process
+        finished.crash(exitcode=0)
+        self.assertEqual(self.supervisor.check(), 2)
+        self.assertEqual(self.supervisor.workers[2].restarts, 0)
+        self.assertTrue(finished.closed)
+        self.assertTrue(self.supervisor.workers[2].exited)
+
+        self.supervisor.notify(2)
+        self.assertTrue(self.supervisor.workers[2].commands.empty())
+
+    def test_check_reports_no_worker_once_all_exited(self):
+        for worker in self.supervisor.workers:
+            worker.process.crash(exitcode=0)
+
+        self.assertEqual(self.supervisor.check(), 0)
+        self.supervisor.stop(timeout=0)
+        self.assertTrue(all(worker.commands.empty() for worker in self.supervisor.workers))
+
+    def test_notify_routes_to_owning_worker(self):
+        self.supervisor.notify(5, state='stopped')
+
+        self.assertEqual(self.supervisor.workers[1].commands.get_nowait(), (NOTIFY_COMMAND, 5, 'stopped', False))
+        self.assertTrue(self.supervisor.workers[0].commands.empty())
+
+    def test_stop_sends_stop_and_does_not_restart(self):
+        self.supervisor.stop(timeout=0)
+
+        for worker in self.supervisor.workers:
+            self.assertEqual(worker.commands.get_nowait(), (STOP_COMMAND,))
+            self.assertFalse(worker.process.is_alive())
+            self.assertTrue(worker.process.closed)
+        self.assertEqual(self.supervisor.check(), 0)
+
+
+class RunWorkerTests(SimpleTestCase):
+
+    def test_worker_runs_shard_until_stopped(self):
+        commands = queue.Queue()
+        commands.put((NOTIFY_COMMAND, 7, 'paused', False))
+        commands.put((STOP_COMMAND,))
+
+        with patch('simulation.logic.simulation_manager.SimulationManagerSingleton.get_instance') as mock_get_instance, \
+                patch('simulation.logic.control.notify_simulation_change') as mock_notify, \
+                patch('simulation.logic.supervisor.signal.signal'), \
+                patch('simulation.logic.supervisor.os.sched_setaffinity', create=True) as mock_affinity:
+            run_worker(0, [7], [0], commands)
+
+        mock_get_instance.assert_called_once_with(7)
+        mock_affinity.assert_called_once_with(0, [0])
+        mock_notify.assert_called_once_with(7, state='paused', settings_changed=False)
+        mock_get_instance.return_value.stop_simulation.assert_called_once()
+
+    def test_worker_exits_once_its_simulations_finished(self):
+        finished_thread = Mock(**{'is_alive.return_value': False})
+
+        with patch('simulation.logic.simulation_manager.SimulationManagerSingleton.get_instance') as mock_get_instance, \
+                patch.dict('simulation.logic.simulation_manager.SimulationManagerSingleton._threads', {7: finished_thread}), \
+                patch('simulation.logic.supervisor.queue.Queue.get', side_effect=queue.Empty), \
+                patch('simulation.logic.supervisor.signal.signal'), \
+                patch('simulation.logic.supervisor.os._exit') as mock_exit:
+            mock_get_instance.return_value.simulation_manager.state = SM.ScenarioState.FINISHED
+            run_worker(0, [7], None, queue.Queue())
+
+        mock_exit.assert_not_called()
@@ -0,0 +1,52 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from simulation.models import Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory
+
+
+class ArchivePriceHistoryCommandTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Archive Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+            state=SimulationManager.ScenarioState.FINISHED,
+        )
+        stock = Stock.objects.create(company=Company.objects.create(name="Archive Company"), ticker="ARC")
+        StockPriceHistory.objects.create(simulation_manager=self.simulation_manager, stock=stock, close_price=10.0)
+
+    def test_archives_and_restores_the_finished_simulations(self):
+        out = StringIO()
+        call_command('archive_price_history', '--directory', self.directory, stdout=out)
+        self.assertIn(f'Archived 1 price history rows of simulation {self.simulation_manager.id}', out.getvalue())
+        self.assertFalse(StockPriceHistory.objects.exists())
+
+        call_command(
+            'archive_price_history', '--restore', '--simulation', str(self.simulation_manager.id),
+            '--directory', self.directory, stdout=out
+        )
+        self.assertIn(f'Restored 1 price history rows of simulation {self.simulation_manager.id}', out.getvalue())
+        self.assertEqual(self.simulation_manager.price_history.count(), 1)
+
+    def test_refuses_a_running_simulation(self):
+        SimulationManager.objects.filter(id=self.simulation_manager.id).update(
+            state=SimulationManager.ScenarioState.ONGOING
+        )
+
+        with self.assertRaisesMessage(CommandError, "is not finished"):
+            call_command(
+                'archive_price_history', '--simulation', str(self.simulation_manager.id),
+                '--directory', self.directory, stdout=StringIO()
+            )
+        self.assertEqual(StockPriceHistory.objects.count(), 1)
+
+    def test_restore_needs_a_simulation(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_price_history', '--restore', '--directory', self.directory)
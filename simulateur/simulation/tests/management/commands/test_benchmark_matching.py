@@ -0,0 +1,28 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from simulation.logic.benchmark import FLOWS
+
+
+class BenchmarkMatchingCommandTest(TestCase):
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('benchmark_matching', '--ticks', '2', *args, stdout=out)
+        return out.getvalue().splitlines()
+
+    def test_reports_every_flow_and_backend(self):
+        lines = self.run_command()
+
+        self.assertIn('orders/s', lines[0])
+        self.assertEqual(
+            [tuple(line.split()[:2]) for line in lines[1:]],
+            [(flow, backend) for flow in FLOWS for backend in ('memory', 'database')],
+        )
+
+    def test_selects_flows_and_backends(self):
+        lines = self.run_command('--flow', 'crossing', '--backend', 'memory')
+
+        self.assertEqual([line.split()[:2] for line in lines[1:]], [['crossing', 'memory']])
@@ -0,0 +1,41 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from simulation.logic.columnar import pa
+from simulation.models import Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory
+
+
+@skipUnless(pa, "pyarrow is not installed")
+class ExportSimulationHistoryCommandTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.scenario = Scenario.objects.create(name="Export Scenario")
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=self.scenario, simulation_settings=SimulationSettings.objects.create()
+        )
+        stock = Stock.objects.create(company=Company.objects.create(name="Export Company"), ticker="EXP")
+        StockPriceHistory.objects.create(simulation_manager=self.simulation_manager, stock=stock, close_price=10.0)
+
+    def test_exports_every_table(self):
+        out = StringIO()
+        call_command(
+            'export_simulation_history', '--simulation', str(self.simulation_manager.id),
+            '--directory', self.directory, stdout=out
+        )
+
+        self.assertIn(f'Exported 1 candles of simulation {self.simulation_manager.id}', out.getvalue())
+        self.assertIn(f'Exported 0 orders of simulation {self.simulation_manager.id}', out.getvalue())
+        self.assertIn(f'Exported 0 fills of simulation {self.simulation_manager.id}', out.getvalue())
+        self.assertEqual(sorted(os.listdir(self.directory)), [
+            f'simulation_{self.simulation_manager.id}_candles.parquet',
+            f'simulation_{self.simulation_manager.id}_fills.parquet',
+            f'simulation_{self.simulation_manager.id}_orders.parquet',
+        ])
@@ -0,0 +1,41 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from simulation.logic.columnar import pa
+from simulation.models import Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory
+
+
+@skipUnless(pa, "pyarrow is not installed")
+class ImportSimulationHistoryCommandTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.scenario = Scenario.objects.create(name="Import Scenario")
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=self.scenario, simulation_settings=SimulationSettings.objects.create()
+        )
+        stock = Stock.objects.create(company=Company.objects.create(name="Import Company"), ticker="IMP")
+        StockPriceHistory.objects.create(simulation_manager=self.simulation_manager, stock=stock, close_price=10.0)
+
+    def test_seeds_a_new_simulation(self):
+        call_command(
+            'export_simulation_history', '--simulation', str(self.simulation_manager.id), '--table', 'candles',
+            '--format', 'arrow', '--directory', self.directory, stdout=StringIO()
+        )
+        out = StringIO()
+        call_command(
+            'import_simulation_history',
+            os.path.join(self.directory, f'simulation_{self.simulation_manager.id}_candles.arrow'),
+            '--scenario', str(self.scenario.id), stdout=out
+        )
+
+        seeded = SimulationManager.objects.exclude(id=self.simulation_manager.id).get()
+        self.assertIn(f'Imported 1 candles into simulation {seeded.id}', out.getvalue())
+        self.assertEqual(list(seeded.price_history.values_list('close_price', flat=True)), [10.0])
@@ -0,0 +1,25 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from simulation.models import Company, Stock, StockPriceHistory, StockPriceRollup
+
+
+class RebuildPriceRollupsCommandTest(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name="Rollup Company")
+        self.stocks = [Stock.objects.create(company=company, ticker=f"RB{i}") for i in range(2)]
+        for stock in self.stocks:
+            StockPriceHistory.objects.create(stock=stock, close_price=10.0)
+
+    def test_rebuilds_the_selected_stocks(self):
+        out = StringIO()
+        call_command('rebuild_price_rollups', '--stock', str(self.stocks[0].id), stdout=out)
+
+        self.assertIn('Rolled up 1 candles', out.getvalue())
+        self.assertEqual(
+            set(StockPriceRollup.objects.values_list('stock_id', 'resolution')),
+            {(self.stocks[0].id, resolution) for resolution in ('1m', '5m', '1h', '1d')},
+        )
@@ -1,5 +1,10 @@
-from django.test import TestCase
-from simulation.models import Stock, StockPriceHistory, Company
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from simulation.models import Stock, StockPriceHistory, Company, Scenario, SimulationManager, SimulationSettings
 
 
 class StockModelTest(TestCase):
@@ -84,3 +89,83 @@ class StockPriceHistoryModelTest(TestCase):
         # Test the __str__ method of StockPriceHistory
         expected_str = f"Test Company Price at {self.stock_price_history.timestamp}"
         self.assertEqual(str(self.stock_price_history), expected_str)
+
+    def test_latest_prefers_the_simulation_history(self):
+        simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Latest Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        self.assertEqual(StockPriceHistory.latest(simulation_manager, self.stock), self.stock_price_history)
+
+        own = StockPriceHistory.objects.create(
+            stock=self.stock, simulation_manager=simulation_manager,
+            timestamp=self.stock_price_history.timestamp,
+        )
+        self.assertEqual(StockPriceHistory.latest(simulation_manager, self.stock), own)
+        self.assertEqual(StockPriceHistory.latest(None, self.stock), self.stock_price_history)
+
+    def test_visible_to_adds_the_simulation_rows_to_the_reference_history(self):
+        simulation_managers = [
+            SimulationManager.objects.create(
+                scenario=Scenario.objects.create(name=f"Visible Scenario {i}"),
+                simulation_settings=SimulationSettings.objects.create(),
+            )
+            for i in range(2)
+        ]
+        own = StockPriceHistory.objects.create(stock=self.stock, simulation_manager=simulation_managers[0])
+        StockPriceHistory.objects.create(stock=self.stock, simulation_manager=simulation_managers[1])
+
+        self.assertEqual(
+            set(StockPriceHistory.visible_to(simulation_managers[0]).values_list('id', flat=True)),
+            {self.stock_price_history.id, own.id},
+        )
+
+
+@skipUnless(connection.vendor == "sqlite", "Reads the SQLite query plan")
+class StockPriceHistoryIndexTest(TestCase):
+
+    def setUp(self):
+        self.stock = Stock.objects.create(company=Company.objects.create(name="Index Company"), ticker="IDX")
+
+    def test_latest_price_lookup_is_an_index_seek(self):
+        for simulation_manager in (None, 1):
+            plan = StockPriceHistory.objects.filter(
+                simulation_manager=simulation_manager, stock=self.stock
+            ).order_by('-timestamp', '-id')[:1].explain()
+
+            self.assertIn("price_history_latest_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+
+class PriceHistoryScopingMigrationTest(TransactionTestCase):
+    """Rows written before price history was scoped become the reference history."""
+
+    before = [("simulation", "0004_stock_price_rollup")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.after = executor.loader.graph.leaf_nodes("simulation")
+        executor.migrate(self.before)
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(self.after))
+
+    def test_existing_rows_are_kept_as_reference_history(self):
+        apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        stock = apps.get_model("simulation", "Stock").objects.create(
+            company=apps.get_model("simulation", "Company").objects.create(name="Legacy Company"), ticker="OLD"
+        )
+        legacy = apps.get_model("simulation", "StockPriceHistory").objects.create(
+            stock=stock, close_price=42.0, timestamp=timezone.now()
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+
+        row = StockPriceHistory.objects.get(id=legacy.id)
+        self.assertIsNone(row.simulation_manager)
+        simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Post-migration Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        self.assertEqual(StockPriceHistory.latest(simulation_manager, row.stock), row)
+        self.assertIn(row, StockPriceHistory.visible_to(simulation_manager))
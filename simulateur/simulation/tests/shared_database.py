@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+def share_test_database(test_case):
+    """
+    Let the processes spawned by ``test_case`` see its database and return the database name
+    to give them. An in-memory SQLite test database only exists in this process, so it is
+    copied to a temporary file that the default connection uses until the test ends.
+    """
+    connection = connections["default"]
+    if connection.vendor != "sqlite" or not connection.is_in_memory_db():
+        return connection.settings_dict["NAME"]
+
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    path = os.path.join(directory.name, "shared.sqlite3")
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    connection.connection.backup(target)
+    target.close()
+
+    memory, name = connection.connection, connection.settings_dict["NAME"]
+    connection.connection = None
+    connection.settings_dict["NAME"] = path
+
+    def restore():
+        connection.close()
+        connection.settings_dict["NAME"] = name
+        connection.connection = memory
+
+    test_case.addCleanup(restore)
+    return path
+
+
+def call_in_process(database_name, function, args, results):
+    """
+    Process target that sets up Django on the database of the test that spawned it, then puts
+    the result of ``function``, a dotted path imported once the apps are ready, on ``results``.
+    """
+    import django
+    django.setup()
+    connections["default"].settings_dict["NAME"] = database_name
+    results.put(import_string(function)(*args))
+
+
+def run_in_processes(test_case, function, *calls, timeout=60):
+    """
+    Call ``function`` once per tuple of arguments in ``calls``, each in its own spawned process
+    sharing the database of ``test_case``, all at the same time. Returns the results in order.
+    """
+    database_name = share_test_database(test_case)
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in calls]
+    processes = [
+        context.Process(target=call_in_process, args=(database_name, function, args, results))
+        for args, results in zip(calls, queues)
+    ]
+    for process in processes:
+        process.start()
+    results = [results.get(timeout=timeout) for results in queues]
+    for process in processes:
+        process.join(timeout)
+        test_case.assertEqual(process.exitcode, 0)
+    return results
+
+
+def run_in_process(test_case, function, *args, timeout=60):
+    """Call ``function`` in a spawned process sharing the database of ``test_case`` and return its result."""
+    return run_in_processes(test_case, function, args, timeout=timeout)[0]
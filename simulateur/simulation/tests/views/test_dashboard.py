@@ -0,0 +1,56 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from simulation.models import (
+    Company, Scenario, SimulationManager, SimulationSettings, Stock, StockPriceHistory, StockQuote
+)
+
+
+class MarketOverviewViewTests(TestCase):
+
+    def setUp(self):
+        self.simulation_manager = SimulationManager.objects.create(
+            scenario=Scenario.objects.create(name="Overview Scenario"),
+            simulation_settings=SimulationSettings.objects.create(),
+        )
+        self.company = Company.objects.create(name="Overview Company")
+
+    def add_stock(self, ticker):
+        stock = Stock.objects.create(company=self.company, ticker=ticker)
+        self.simulation_manager.stocks.add(stock)
+        StockPriceHistory.objects.create(stock=stock, close_price=100.0)
+        StockPriceHistory.objects.create(stock=stock, close_price=110.0)
+        return stock
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('market_overview'), {'simulation_manager_id': self.simulation_manager.id})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_latest_prices_take_one_query_for_every_stock(self):
+        self.add_stock("OVR0")
+        _, queries = self.get()
+
+        for i in range(1, 4):
+            self.add_stock(f"OVR{i}")
+        response, more_queries = self.get()
+
+        self.assertEqual(more_queries, queries)
+        latest_prices = response.context["latest_prices"]
+        self.assertEqual(len(latest_prices), 4)
+        self.assertEqual({prices["close_price"] for prices in latest_prices.values()}, {110.0})
+
+    def test_latest_prices_are_read_from_the_quotes(self):
+        quoted = self.add_stock("OVR0")
+        unquoted = self.add_stock("OVR1")
+        StockQuote.objects.create(simulation_manager=self.simulation_manager, stock=quoted, close_price=120.0)
+
+        response, _ = self.get()
+
+        self.assertEqual(
+            {stock_id: prices["close_price"] for stock_id, prices in response.context["latest_prices"].items()},
+            {str(quoted.id): 120.0, str(unquoted.id): 110.0},
+        )
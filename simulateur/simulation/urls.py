@@ -17,6 +17,7 @@ from simulation.api.portfolio import (
     PortfolioView,
     SellStock,
     BuyStock,
+    CancelOrder,
     StockPrice,
     StockHoldings,
     GroupedPerformanceView,
@@ -48,7 +49,8 @@ from simulation.api.company import CompanyManagement
 from simulation.api.scenario import ScenarioManagement
 from simulation.api.simulation_manager import (
     SimulationManagerManagement, ChangeSimulationManagerState, SimulationManagerNews,
-    SimulationManagerTriggers, SimulationManagerEvents, SimulationManagerStocks, SimulationManagerTeams
+    SimulationManagerTriggers, SimulationManagerEvents, SimulationManagerStocks, SimulationManagerTeams,
+    SimulationManagerHistoryExport
 )
 from simulation.api.event import EventManagement
 from simulation.api.news import NewsManagement
@@ -109,6 +111,7 @@ api_patterns = [
 
     path('stock/buy/', BuyStock.as_view(), name='buy_stock'),
     path('stock/sell/', SellStock.as_view(), name='sell_stock'),
+    path('stock/cancel/', CancelOrder.as_view(), name='cancel_order'),
     path('stock/price/<stock_id>/', StockPrice.as_view(), name='stock_price'),
 
     path('user/orders/', UserOrders.as_view(), name='user_orders'),
@@ -149,6 +152,8 @@ api_patterns = [
          name='simulation_manager_triggers'),
     path('scenario-manager/<int:simulation_manager_id>/news/', SimulationManagerNews.as_view(),
          name='simulation_manager_news'),
+    path('scenario-manager/<int:simulation_manager_id>/export/<str:table>/', SimulationManagerHistoryExport.as_view(),
+         name='simulation_manager_history_export'),
     path('scenario-manager/<int:simulation_manager_id>/change-state/', ChangeSimulationManagerState.as_view(), name='change_state'),
 
     path('news/', NewsManagement.as_view(), name='create_news'),
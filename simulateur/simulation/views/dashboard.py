@@ -2,7 +2,7 @@ import logging
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import UserPassesTestMixin
-from django.db.models import Sum, F, Subquery, OuterRef
+from django.db.models import Sum, F, OuterRef
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
@@ -12,10 +12,11 @@ from django.views.decorators.cache import cache_page
 from django.views.decorators.csrf import csrf_exempt
 from simulation.models import (
     UserProfile, Stock, Portfolio, TransactionHistory, StockPortfolio, Team,
-    News, Company, Event, SimulationManager, Trigger, StockPriceHistory
+    News, Company, Event, SimulationManager, Trigger, StockPriceHistory, StockQuote
 )
 
 from simulation.channels.consumers import SimulationConsumer
+from simulation.logic.rollups import get_candles, parse_resolution
 
 logger = logging.getLogger(__name__)
 CACHE_TTL = getattr(settings, 'CACHE_TTL', 30)  # 30 seconds
@@ -66,14 +67,10 @@ def get_transactions(simulation_manager):
 def get_portfolio_data(portfolio, simulation_manager):
     stocks = Stock.objects.filter(scenarios_stocks__id=simulation_manager.id).select_related('company')
 
-    latest_price = StockPriceHistory.objects.filter(
-        stock=OuterRef('stock_id')
-    ).order_by('-timestamp').values('close_price')[:1]
-
     stocks_data = StockPortfolio.objects.filter(
         portfolio=portfolio, stock__in=stocks
     ).annotate(
-        current_price=Subquery(latest_price)
+        current_price=StockQuote.latest_close(simulation_manager, OuterRef('stock_id'))
     )
 
     balance = portfolio.balance
@@ -84,11 +81,11 @@ def get_portfolio_data(portfolio, simulation_manager):
     return stocks, stocks_data, total_stock_value, balance
 
 
-def get_price_history(stocks_data):
+def get_price_history(stocks_data, simulation_manager):
     stock_ids = [stock_data.stock.id for stock_data in stocks_data]
-    return StockPriceHistory.objects.filter(
+    return StockPriceHistory.visible_to(simulation_manager).filter(
         stock__in=stock_ids
-    ).order_by('timestamp')
+    ).order_by('timestamp', 'id')
 
 
 def get_user_team(user_profile):
@@ -124,7 +121,7 @@ class UserDashboardView(View):
         portfolio = get_or_create_portfolio(user_profile, current_simulation_manager)
         transactions, orders = get_transactions(current_simulation_manager)
         stocks, stocks_data, total_stock_value, balance = get_portfolio_data(portfolio, current_simulation_manager)
-        price_history = get_price_history(stocks_data)
+        price_history = get_price_history(stocks_data, current_simulation_manager)
 
         context = {
             "title": "User Dashboard",
@@ -230,7 +227,13 @@ class GameDashboardView(View):
             messages.error(request, "No active simulation manager found.")
             return redirect(reverse("home"))
 
-        context = self.get_dashboard_context(team, simulation_manager)
+        try:
+            resolution = parse_resolution(request.GET.get('resolution'))
+        except ValueError as e:
+            messages.error(request, str(e))
+            resolution = None
+
+        context = self.get_dashboard_context(team, simulation_manager, resolution)
         context['simulation_manager_id'] = simulation_manager.id  # Pass the simulation_manager_id
         response = render(request, "dashboard/game_dashboard.html", context)
         response['Cache-Control'] = f'public, max-age={CACHE_TTL}'
@@ -247,7 +250,7 @@ class GameDashboardView(View):
         # Default to fetching the first active simulation manager if none is provided
         return SimulationManager.objects.all().first()
 
-    def get_dashboard_context(self, team, simulation_manager):
+    def get_dashboard_context(self, team, simulation_manager, resolution=None):
         # Retrieve all team members
         user_profiles_in_team = team.members.all()
 
@@ -262,7 +265,7 @@ class GameDashboardView(View):
 
         # Fetch only the stocks related to the active simulation manager
         stocks = simulation_manager.stocks.all()
-        stocks_data = self.get_stocks_data(stocks)
+        stocks_data = self.get_stocks_data(stocks, simulation_manager, resolution)
 
         return {
             "title": "Game Dashboard",
@@ -274,12 +277,11 @@ class GameDashboardView(View):
             "simulation_managers": [simulation_manager],
         }
 
-    def get_stocks_data(self, stocks):
+    def get_stocks_data(self, stocks, simulation_manager, resolution=None):
         stocks_data = []
         for stock in stocks:
-            stock_prices = stock.price_history.order_by("timestamp").values(
-                "timestamp", "open_price", "high_price", "low_price", "close_price"
-            )
+            # Bars of the resolution that fits the whole history, unless one is requested
+            stock_prices = get_candles(stock, resolution=resolution, simulation_manager=simulation_manager)
             stock_prices = [
                 {**x, "timestamp": x["timestamp"].strftime("%Y-%m-%d %H:%M:%S")} for x in stock_prices
             ]
@@ -303,16 +305,24 @@ class MarketOverviewView(View):
 
         stocks = simulation_manager.stocks.select_related('company').all()
 
-        # Prepare the latest prices for each stock in a dictionary
+        # Prepare the latest prices for each stock in a dictionary, read from the quotes of the simulation
+        latest_rows = list(StockQuote.objects.filter(simulation_manager=simulation_manager))
+        quoted = {quote.stock_id for quote in latest_rows}
+        unquoted = [stock.id for stock in stocks if stock.id not in quoted]
+        if unquoted:
+            # Stocks the engine has not quoted yet fall back to their latest price history row
+            latest_rows += StockPriceHistory.objects.filter(
+                stock__in=unquoted, id=StockPriceHistory.latest_value(simulation_manager, OuterRef('stock_id'), 'id')
+            )
+
         latest_prices = {
-            str(stock.id): {
+            str(latest_price.stock_id): {
                 "close_price": latest_price.close_price,
                 "open_price": latest_price.open_price,
                 "low_price": latest_price.low_price,
                 "high_price": latest_price.high_price,
             }
-            for stock in stocks
-            if (latest_price := StockPriceHistory.objects.filter(stock=stock).order_by('-timestamp').first())
+            for latest_price in latest_rows
         }
 
         portfolio = Portfolio.objects.filter(simulation_manager=simulation_manager).all()